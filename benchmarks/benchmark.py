@@ -0,0 +1,252 @@
+"""
+Offline benchmarks of the main application paths on synthetic image directories.
+Runs headless (offscreen Qt platform) with the mock chatbot, reports wall time and peak memory
+of each case (Linux, or peak Python allocations with --trace-memory) and compares them with a stored baseline.
+
+    python benchmarks/benchmark.py --sizes 1000,10000
+    python benchmarks/benchmark.py --sizes 1000,10000 --save-baseline
+"""
+import os
+import sys
+import gc
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import tracemalloc
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+from PySide6.QtCore import QEventLoop
+from PySide6.QtGui import QImage, QColor
+from PySide6.QtWidgets import QApplication
+
+from gui.imagedetails import ImageDetailsWidget
+from gui.jobqueue import JobQueue
+from gui.mainwindow import MainWindow
+from gui.queueworker import QueueWorker
+from gui.schemas.config import ChatbotName, ImgDescGenConfig
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+MB = 1024 * 1024
+
+def reset_peak_rss() -> bool:
+    """
+    Reset the peak resident set size of the process (Linux), so it can be measured per case.
+    """
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+def peak_rss_mb() -> float | None:
+    # peak since the last reset_peak_rss()
+    try:
+        with open("/proc/self/status", "r") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+def wait_for(condition, timeout: float = 600):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise TimeoutError("benchmark step timed out")
+        QApplication.processEvents(QEventLoop.ProcessEventsFlag.AllEvents, 50)
+
+def make_images(directory: str, count: int) -> list[str]:
+    os.makedirs(directory)
+    template = os.path.join(directory, "template.jpg")
+    image = QImage(160, 120, QImage.Format.Format_RGB32)
+    image.fill(QColor(90, 140, 200))
+    image.save(template, "JPG", 85)
+
+    paths = []
+    for i in range(count):
+        path = f"{directory}/img{i:06}.jpg"
+        shutil.copyfile(template, path)
+        paths.append(path)
+    os.remove(template)
+    return paths
+
+class Benchmark():
+    def __init__(self, trace_memory: bool, generation_images: int):
+        self._trace_memory = trace_memory
+        self._generation_images = generation_images
+        self.results: dict[str, dict] = {}
+
+    def measure(self, name: str, count: int, func):
+        gc.collect()
+        peak_reset = reset_peak_rss()
+        if self._trace_memory:
+            tracemalloc.start()
+
+        start = time.perf_counter()
+        func()
+        seconds = time.perf_counter() - start
+
+        # without the reset the peak would be the one of the whole process, None where it's not supported
+        result = {"seconds": seconds, "peak_rss_mb": peak_rss_mb() if peak_reset else None}
+        if self._trace_memory:
+            result["peak_python_mb"] = tracemalloc.get_traced_memory()[1] / MB
+            tracemalloc.stop()
+
+        self.results[f"{name}[{count}]"] = result
+        print(f"{name}[{count}]: {seconds:.3f} s" + (f", peak RSS {result['peak_rss_mb']:.0f} MB" if result["peak_rss_mb"] else ""), flush=True)
+
+    def run(self, count: int, work_dir: str):
+        image_dir = os.path.join(work_dir, f"images-{count}")
+        print(f"Generating {count} images...", flush=True)
+        images = make_images(image_dir, count)
+
+        window = MainWindow()
+        try:
+            def fill_image_list():
+                finished = []
+                window._directory_scanner.scanFinished.connect(lambda *args: finished.append(True))
+                window.fillImageList(image_dir)
+                wait_for(lambda: finished)
+            self.measure("fill_image_list", count, fill_image_list)
+
+            window._selection.clear()
+            window._config.getSchema().selected_images = images
+            def restore_selected_images():
+                window.restoreSelectedImages()
+                QApplication.processEvents()
+            self.measure("restore_selected_images", count, restore_selected_images)
+
+            window._selection.clear()
+            def check_images():
+                for image in images:
+                    window.imageChanged(image, True)
+                QApplication.processEvents()
+            self.measure("check_images", count, check_images)
+
+            details = ImageDetailsWidget(window._thumbnail_loader, window._exiftool)
+            sample = images[:min(count, 200)]
+            def set_details_image():
+                shown = set()
+                window._thumbnail_loader.thumbnailReady.connect(lambda path, *args: shown.add(path))
+                for image in sample:
+                    details.setImage(os.path.basename(image), image)
+                    # thumbnails already in memory are shown without the signal
+                    wait_for(lambda: image in shown or window._thumbnail_loader.thumbnail(image, details.thumbnailSize()), timeout=60)
+            self.measure("details_set_image", len(sample), set_details_image)
+            details.deleteLater()
+        finally:
+            window.close()
+
+        config_path = os.path.join(work_dir, f"config-{count}.json")
+        def save_load_config():
+            config = ImgDescGenConfig(config_path)
+            config.getSchema().selected_images = images
+            config.markDirty()
+            config.saveConfig()
+            ImgDescGenConfig(config_path)
+        self.measure("config_save_load", count, save_load_config)
+
+        generation_images = images[:min(count, self._generation_images)]
+        config = ImgDescGenConfig(config_path)
+        schema = config.getSchema()
+        schema.output_dir = os.path.join(work_dir, f"output-{count}")
+        schema.response_cache_enabled = False
+        schema.concurrency = 4
+        # fixed latency and no failures, so runs are comparable
+        schema.chatbot = ChatbotName.MOCK
+        mock_config = schema.chatbots[ChatbotName.MOCK]
+        mock_config.latency_distribution = "fixed"
+        mock_config.latency_ms = 50
+        mock_config.per_image_latency_ms = 0
+        mock_config.rate_limit_probability = 0.0
+        mock_config.error_probability = 0.0
+        mock_config.max_requests_per_minute = 0
+        mock_config.write_metadata = shutil.which(schema.exiftool_path or "exiftool") is not None
+        os.makedirs(schema.output_dir)
+        queue_path = os.path.join(work_dir, f"jobs-{count}.sqlite3")
+        def generate():
+            # through the job queue like in the GUI, with the worker in this process
+            job_queue = JobQueue(queue_path)
+            try:
+                batch_id = job_queue.submit(generation_images, schema.model_dump_json(), mock_config.max_image_count * schema.concurrency)
+                QueueWorker(job_queue, exiftool_path=schema.exiftool_path or None).run(exit_when_idle=True)
+                counts = job_queue.counts(batch_id)
+            finally:
+                job_queue.close()
+            if counts[JobQueue.STATE_DONE] + counts[JobQueue.STATE_SKIPPED] != len(generation_images):
+                raise RuntimeError(f"generation failed: {counts}")
+        self.measure("generation", len(generation_images), generate)
+
+# compared metrics: key, unit, absolute difference that is noise
+COMPARED_METRICS = [("seconds", "s", 0.05), ("peak_rss_mb", "MB", 5.0), ("peak_python_mb", "MB", 1.0)]
+
+def compare(results: dict[str, dict], baseline: dict[str, dict], tolerance: float) -> list[str]:
+    """
+    Time and memory regressions against the baseline, memory is compared only where both runs have it.
+    """
+    regressions = []
+    for key, result in results.items():
+        base = baseline.get(key)
+        if base is None:
+            continue
+        for metric, unit, noise in COMPARED_METRICS:
+            value, base_value = result.get(metric), base.get(metric)
+            if value is None or base_value is None:
+                continue
+            if value > base_value * (1 + tolerance) and value - base_value > noise:
+                regressions.append(f"{key}: {metric} {value:.3f} {unit}, baseline {base_value:.3f} {unit}")
+    return regressions
+
+def main(argv: list[str]) -> int:
+    parser = argparse.ArgumentParser(description="Run offline benchmarks.")
+    parser.add_argument("--sizes", default="1000", help="comma separated image counts (default: 1000)")
+    parser.add_argument("--generation-images", type=int, default=1000, help="max images sent to the mock chatbot")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="baseline file")
+    parser.add_argument("--save-baseline", action="store_true", help="store the results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed slowdown and memory growth against the baseline (default: 0.2)")
+    parser.add_argument("--trace-memory", action="store_true", help="also report peak Python allocations (slows the run down)")
+    args = parser.parse_args(argv)
+
+    app = QApplication([])
+
+    benchmark = Benchmark(args.trace_memory, args.generation_images)
+    work_dir = tempfile.mkdtemp(prefix="imgdescgen-benchmark-")
+    cwd = os.getcwd()
+    # config.json and caches of the application are created in the working directory
+    os.chdir(work_dir)
+    try:
+        for size in (int(size) for size in args.sizes.split(",")):
+            benchmark.run(size, work_dir)
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(work_dir, ignore_errors=True)
+        app.quit()
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(benchmark.results, f, indent=4)
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+
+    try:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    except FileNotFoundError:
+        print("No baseline to compare with, run with --save-baseline to create one")
+        return 0
+
+    regressions = compare(benchmark.results, baseline, args.tolerance)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    return 1 if regressions else 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,126 @@
+"""
+Headless image description generation, runs the GUI's generation pipeline with the same config.json.
+Progress is printed to stdout as JSON lines, logs go to stderr.
+
+    python cli.py "photos/**/*.jpg" --output-dir described
+    find photos -name "*.jpg" | python cli.py --list -
+"""
+import os
+import sys
+import json
+import glob
+import time
+import signal
+import logging
+import argparse
+import threading
+
+from gui.generationpipeline import GenerationPipeline
+from gui.schemas.config import ImgDescGenConfig, OutputMode
+
+CONFIG_FILENAME = "config.json"
+
+def normalize_path(path: str) -> str:
+    # same form as paths listed by the GUI, so manifest records are shared
+    return os.path.abspath(path).replace(os.sep, "/")
+
+def expand_inputs(patterns: list[str], lists: list[str]) -> list[str]:
+    """
+    Images matched by glob patterns (** matches subdirectories) and listed in files (one path per line, - is stdin).
+    Duplicates are dropped, order is kept.
+    """
+    paths = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern, recursive=True))
+        if not matches and not glob.has_magic(pattern):
+            matches = [pattern] # plain path, missing files are reported by the pipeline
+        paths.extend(path for path in matches if not os.path.isdir(path))
+
+    for list_file in lists:
+        f = sys.stdin if list_file == "-" else open(list_file, "r", encoding="utf-8")
+        try:
+            paths.extend(line.strip() for line in f if line.strip())
+        finally:
+            if f is not sys.stdin:
+                f.close()
+
+    return list(dict.fromkeys(normalize_path(path) for path in paths))
+
+class ProgressWriter():
+    """
+    Writes progress events as JSON lines, called from generation threads.
+    """
+    def __init__(self, stream):
+        self._stream = stream
+        self._lock = threading.Lock()
+
+    def write(self, record: dict):
+        line = json.dumps(record, ensure_ascii=False)
+        with self._lock:
+            self._stream.write(line + "\n")
+            self._stream.flush()
+
+    def onProgress(self, event: str, image: str):
+        self.write({"event": event, "path": image, "time": time.time()})
+
+def parse_args(argv: list[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Generate image descriptions without the GUI.")
+    parser.add_argument("patterns", nargs="*", help="image paths or glob patterns, quote them to use ** for subdirectories")
+    parser.add_argument("--list", dest="lists", action="append", default=[], metavar="FILE",
+                        help="file with image paths, one per line, - reads stdin (can be repeated)")
+    parser.add_argument("--config", default=CONFIG_FILENAME, help=f"config file (default: {CONFIG_FILENAME})")
+    parser.add_argument("--output-dir", help="output directory, overrides the config")
+    parser.add_argument("--concurrency", type=int, help="requests in parallel, overrides the config")
+    parser.add_argument("--output-mode", choices=[mode.value for mode in OutputMode], help="output mode, overrides the config")
+    parser.add_argument("--no-cache", action="store_true", help="don't use the response cache")
+    parser.add_argument("--log-level", default="INFO", choices=["DEBUG", "INFO", "WARNING", "ERROR"], help="stderr log level")
+    return parser.parse_args(argv)
+
+def main(argv: list[str]) -> int:
+    args = parse_args(argv)
+    logging.basicConfig(level=args.log_level, stream=sys.stderr, format="%(asctime)s %(name)s %(levelname)s: %(message)s")
+
+    # overrides are applied to this run only, the config file is not saved
+    config = ImgDescGenConfig(args.config)
+    schema = config.getSchema()
+    if args.output_dir:
+        schema.output_dir = args.output_dir
+    if args.concurrency:
+        schema.concurrency = args.concurrency
+    if args.output_mode:
+        schema.output_mode = OutputMode(args.output_mode)
+    if args.no_cache:
+        schema.response_cache_enabled = False
+
+    if not schema.output_dir:
+        print("Output directory is not set, use --output-dir or set it in the GUI", file=sys.stderr)
+        return 2
+
+    images = expand_inputs(args.patterns, args.lists)
+    if not images:
+        print("No images given", file=sys.stderr)
+        return 2
+
+    writer = ProgressWriter(sys.stdout)
+    pipeline = GenerationPipeline(config, progress_callback=writer.onProgress)
+
+    # first Ctrl+C stops after requests in flight, like Cancel in the generation window
+    signal.signal(signal.SIGINT, lambda signum, frame: pipeline.cancel())
+
+    summary = pipeline.run(images)
+    writer.write({
+        "event": "summary",
+        "done": summary.done,
+        "failed": summary.failed,
+        "skipped": summary.skipped,
+        "cached": summary.cached,
+        "cancelled": summary.cancelled,
+        "time": time.time(),
+    })
+
+    if summary.cancelled:
+        return 130
+    return 1 if summary.failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -1,6 +1,9 @@
+from gui.exiftool import ExifTool
+from gui.mockchatbot import MockImgDescGen
 from gui.schemas.config import ChatbotName
 from imgdescgenlib.chatbot.client_base import ChatbotClientBase
 from imgdescgenlib.chatbot.gemini.gemini import GeminiClient, GeminiConfig
+from imgdescgenlib.imgdescgen import ImgDescGen
 
 def create_chatbot(chatbot_name: str, config) -> ChatbotClientBase:
     """
@@ -9,4 +12,14 @@ def create_chatbot(chatbot_name: str, config) -> ChatbotClientBase:
     if chatbot_name == ChatbotName.GEMINI:
         return GeminiClient(config)
     
-    raise ValueError(f"Unknown chatbot name: {chatbot_name}")
\ No newline at end of file
+    raise ValueError(f"Unknown chatbot name: {chatbot_name}")
+
+def create_generator(chatbot_name: str, config, exiftool: ExifTool):
+    """
+    Create the description generator for the chatbot: ImgDescGen with the chatbot client,
+    or the built-in mock that works without network.
+    """
+    if chatbot_name == ChatbotName.MOCK:
+        return MockImgDescGen(config, exiftool)
+
+    return ImgDescGen(create_chatbot(chatbot_name, config))
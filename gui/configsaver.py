@@ -0,0 +1,40 @@
+from PySide6.QtCore import QObject, QTimer, QCoreApplication, Signal
+
+from gui.schemas.config import ImgDescGenConfig
+
+class ConfigSaver(QObject):
+    """
+    Coalesces configuration saves.
+    Changes only mark the config dirty, it's written once when the timer fires,
+    on flush() or when the application quits.
+    """
+    # emitted right before writing, so owners can put their pending state into the schema
+    aboutToSave = Signal()
+    saveFailed = Signal()
+
+    SAVE_DELAY_MS = 1000
+
+    def __init__(self, config: ImgDescGenConfig, parent=None):
+        super().__init__(parent)
+
+        self._config = config
+
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(ConfigSaver.SAVE_DELAY_MS)
+        self._timer.timeout.connect(self.flush)
+
+        QCoreApplication.instance().aboutToQuit.connect(self.flush)
+
+    def scheduleSave(self):
+        self._config.markDirty()
+        # don't restart running timer, so constant changes can't postpone the write forever
+        if not self._timer.isActive():
+            self._timer.start()
+
+    def flush(self):
+        self._timer.stop()
+        self.aboutToSave.emit()
+
+        if self._config.isDirty() and not self._config.saveConfig():
+            self.saveFailed.emit()
@@ -0,0 +1,68 @@
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, Signal
+
+from gui.exiftool import ExifTool, ExifToolError
+from gui.tracing import tracer
+
+class DescriptionStatusLoader(QObject):
+    """
+    Finds out which images already have EXIF:ImageDescription.
+    Paths are read in batches, one ExifTool command per batch, in a single background thread
+    so the other ExifTool process stays free for the image details.
+    """
+    BATCH_SIZE = 250
+    TAG = "EXIF:ImageDescription"
+
+    # path -> True if the image has a description, images that couldn't be read are left out
+    statusesReady = Signal(dict)
+
+    class Emitter(QObject):
+        finished = Signal(int, dict)
+
+    class Task(QRunnable):
+        def __init__(self, emitter, exiftool: ExifTool, generation: int, paths: list[str]):
+            super().__init__()
+            self._emitter = emitter
+            self._exiftool = exiftool
+            self._generation = generation
+            self._paths = paths
+
+        def run(self):
+            statuses = {}
+            try:
+                with tracer.span("description_status.batch", count=len(self._paths)):
+                    for metadata in self._exiftool.readMetadata(self._paths, [DescriptionStatusLoader.TAG], fast=True):
+                        statuses[metadata["SourceFile"]] = bool(metadata.get(DescriptionStatusLoader.TAG))
+            except (ExifToolError, ValueError):
+                pass
+            self._emitter.finished.emit(self._generation, statuses)
+
+    def __init__(self, exiftool: ExifTool, parent=None):
+        super().__init__(parent)
+
+        self._exiftool = exiftool
+        self._generation = 0
+
+        self._pool = QThreadPool(self)
+        self._pool.setMaxThreadCount(1)
+        self._emitter = DescriptionStatusLoader.Emitter()
+        self._emitter.finished.connect(self.onTaskFinished)
+
+    def request(self, paths: list[str]):
+        for i in range(0, len(paths), DescriptionStatusLoader.BATCH_SIZE):
+            batch = paths[i:i + DescriptionStatusLoader.BATCH_SIZE]
+            self._pool.start(DescriptionStatusLoader.Task(self._emitter, self._exiftool, self._generation, batch))
+
+    def reset(self):
+        """
+        Drop queued batches, results of running ones are ignored.
+        """
+        self._generation += 1
+        self._pool.clear()
+
+    def stop(self):
+        self.reset()
+        self._pool.waitForDone()
+
+    def onTaskFinished(self, generation: int, statuses: dict):
+        if generation == self._generation and statuses:
+            self.statusesReady.emit(statuses)
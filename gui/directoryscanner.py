@@ -0,0 +1,235 @@
+import os
+import time
+from PySide6.QtCore import QObject, QThread, QTimer, QFileSystemWatcher, Signal, Slot
+
+from gui.tracing import tracer
+
+IMAGE_EXTENSIONS = (".jpg",)
+
+def join_path(directory: str, name: str) -> str:
+    # keep Qt style separators, like QDir.absoluteFilePath() does
+    return directory.rstrip("/") + "/" + name
+
+def list_directory(directory: str) -> tuple[list[str], list[str]]:
+    """
+    Return (subdirectory names, image filenames) of the directory, both sorted.
+    """
+    subdirs = []
+    images = []
+    try:
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append(entry.name)
+                    elif os.path.splitext(entry.name)[1].lower() in IMAGE_EXTENSIONS and entry.is_file():
+                        images.append(entry.name)
+                except OSError:
+                    continue
+    except OSError:
+        pass
+
+    subdirs.sort()
+    images.sort()
+    return subdirs, images
+
+class DirectoryScanner(QObject):
+    """
+    Scans the input directory for images in a background thread and keeps watching it.
+    Images found during the scan are streamed in batches, later changes are reported as deltas.
+    """
+    imagesAdded = Signal(list)
+    imagesRemoved = Signal(list)
+    scanFinished = Signal()
+
+    # requests to the worker, delivered as queued calls into the worker thread
+    _scanRequested = Signal(int, str, bool)
+    _rescanRequested = Signal(int, list)
+
+    RESCAN_DELAY_MS = 300
+
+    class Worker(QObject):
+        BATCH_SIZE = 1000
+        BATCH_INTERVAL = 0.1 # seconds
+
+        batchFound = Signal(int, list)
+        filesRemoved = Signal(int, list)
+        directoriesFound = Signal(int, list)
+        directoriesRemoved = Signal(int, list)
+        scanFinished = Signal(int)
+
+        def __init__(self):
+            super().__init__()
+
+            # set from the GUI thread, a scan with other generation is stale and stops
+            self.generation = 0
+
+            self._recursive = False
+            self._known: dict[str, set[str]] = {} # directory -> image filenames
+
+        @Slot(int, str, bool)
+        def scan(self, generation: int, root: str, recursive: bool):
+            if generation != self.generation:
+                return
+
+            self._recursive = recursive
+            self._known = {}
+            with tracer.span("scanner.scan", recursive=recursive):
+                completed = self.walk(generation, [root])
+            if completed:
+                self.scanFinished.emit(generation)
+
+        @Slot(int, list)
+        def rescan(self, generation: int, directories: list[str]):
+            if generation != self.generation:
+                return
+
+            with tracer.span("scanner.rescan", directories=len(directories)):
+                self.applyChanges(generation, directories)
+
+        def applyChanges(self, generation: int, directories: list[str]):
+            added = []
+            removed = []
+            new_directories = []
+            removed_directories = []
+            for directory in directories:
+                known_images = self._known.get(directory)
+                if known_images is None:
+                    continue
+
+                if not os.path.isdir(directory):
+                    # directory is gone, forget it together with its subdirectories
+                    prefix = join_path(directory, "")
+                    for known_directory in [d for d in self._known if d == directory or d.startswith(prefix)]:
+                        removed.extend(join_path(known_directory, name) for name in self._known.pop(known_directory))
+                        removed_directories.append(known_directory)
+                    continue
+
+                subdirs, images = list_directory(directory)
+                images = set(images)
+                added.extend(join_path(directory, name) for name in sorted(images - known_images))
+                removed.extend(join_path(directory, name) for name in sorted(known_images - images))
+                self._known[directory] = images
+
+                if self._recursive:
+                    new_directories.extend(
+                        join_path(directory, name) for name in subdirs if join_path(directory, name) not in self._known
+                    )
+
+            if removed:
+                self.filesRemoved.emit(generation, removed)
+            if removed_directories:
+                self.directoriesRemoved.emit(generation, removed_directories)
+            if added:
+                self.batchFound.emit(generation, added)
+            if new_directories:
+                self.walk(generation, new_directories)
+
+        def walk(self, generation: int, roots: list[str]) -> bool:
+            batch = []
+            directories = []
+            last_emit = time.monotonic()
+            stack = list(reversed(roots))
+            while stack:
+                if generation != self.generation:
+                    return False
+
+                directory = stack.pop()
+                subdirs, images = list_directory(directory)
+                self._known[directory] = set(images)
+                directories.append(directory)
+                batch.extend(join_path(directory, name) for name in images)
+                if self._recursive:
+                    stack.extend(join_path(directory, name) for name in reversed(subdirs))
+
+                if len(batch) >= self.BATCH_SIZE or (batch and time.monotonic() - last_emit >= self.BATCH_INTERVAL):
+                    self.batchFound.emit(generation, batch)
+                    batch = []
+                    last_emit = time.monotonic()
+
+            if batch:
+                self.batchFound.emit(generation, batch)
+            self.directoriesFound.emit(generation, directories)
+            return True
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+
+        self._generation = 0
+        self._dirty_directories = set()
+
+        self._watcher = QFileSystemWatcher(self)
+        self._watcher.directoryChanged.connect(self.onDirectoryChanged)
+
+        # coalesce bursts of change notifications into one rescan
+        self._rescan_timer = QTimer(self)
+        self._rescan_timer.setSingleShot(True)
+        self._rescan_timer.setInterval(DirectoryScanner.RESCAN_DELAY_MS)
+        self._rescan_timer.timeout.connect(self.rescanDirtyDirectories)
+
+        self._worker = DirectoryScanner.Worker()
+        self._thread = QThread()
+        self._worker.moveToThread(self._thread)
+        self._thread.finished.connect(self._worker.deleteLater)
+
+        self._scanRequested.connect(self._worker.scan)
+        self._rescanRequested.connect(self._worker.rescan)
+        self._worker.batchFound.connect(self.onBatchFound)
+        self._worker.filesRemoved.connect(self.onFilesRemoved)
+        self._worker.directoriesFound.connect(self.onDirectoriesFound)
+        self._worker.directoriesRemoved.connect(self.onDirectoriesRemoved)
+        self._worker.scanFinished.connect(self.onScanFinished)
+
+        self._thread.start()
+
+    def scan(self, directory: str, recursive: bool = False):
+        """
+        Start scanning the directory, previous scan (if any) is cancelled.
+        """
+        self._generation += 1
+        self._worker.generation = self._generation
+        self._dirty_directories.clear()
+        self._rescan_timer.stop()
+
+        watched = self._watcher.directories()
+        if watched:
+            self._watcher.removePaths(watched)
+
+        self._scanRequested.emit(self._generation, directory, recursive)
+
+    def stop(self):
+        self._generation += 1
+        self._worker.generation = self._generation
+        self._rescan_timer.stop()
+
+        self._thread.quit()
+        self._thread.wait()
+
+    def onDirectoryChanged(self, directory: str):
+        self._dirty_directories.add(directory)
+        self._rescan_timer.start()
+
+    def rescanDirtyDirectories(self):
+        if self._dirty_directories:
+            self._rescanRequested.emit(self._generation, sorted(self._dirty_directories))
+            self._dirty_directories.clear()
+
+    def onBatchFound(self, generation: int, paths: list[str]):
+        if generation == self._generation:
+            self.imagesAdded.emit(paths)
+
+    def onFilesRemoved(self, generation: int, paths: list[str]):
+        if generation == self._generation:
+            self.imagesRemoved.emit(paths)
+
+    def onDirectoriesFound(self, generation: int, directories: list[str]):
+        if generation == self._generation:
+            self._watcher.addPaths(directories)
+
+    def onDirectoriesRemoved(self, generation: int, directories: list[str]):
+        if generation == self._generation:
+            self._watcher.removePaths(directories)
+
+    def onScanFinished(self, generation: int):
+        if generation == self._generation:
+            self.scanFinished.emit()
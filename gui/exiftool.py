@@ -0,0 +1,231 @@
+import os
+import json
+import queue
+import tempfile
+import itertools
+import subprocess
+import threading
+
+from gui.tracing import tracer
+
+class ExifToolError(Exception):
+    pass
+
+class ExifToolProcess():
+    """
+    One ExifTool process running in -stay_open mode.
+    Arguments of a command are written to its stdin, the command is terminated by -execute{N}
+    and its output is collected up to the {readyN} marker (stderr is marked with -echo4).
+    """
+    def __init__(self, executable: str):
+        self._executable = executable
+        self._counter = itertools.count(1)
+        self._process = None
+        self._stderr_buffer = b""
+        self._stderr_condition = threading.Condition()
+
+    def isRunning(self) -> bool:
+        return self._process is not None and self._process.poll() is None
+
+    def start(self):
+        self._stderr_buffer = b""
+        self._process = subprocess.Popen(
+            [self._executable, "-stay_open", "True", "-@", "-", "-common_args", "-charset", "filename=utf8"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            creationflags=subprocess.CREATE_NO_WINDOW if os.name == "nt" else 0,
+        )
+
+        # stderr is drained in its own thread, so a chatty command can't fill the pipe and block stdout
+        threading.Thread(target=self.readStderr, args=(self._process,), daemon=True).start()
+
+    def readStderr(self, process):
+        while True:
+            chunk = os.read(process.stderr.fileno(), 65536)
+            with self._stderr_condition:
+                if process is not self._process:
+                    return
+                if not chunk:
+                    self._stderr_condition.notify_all()
+                    return
+                self._stderr_buffer += chunk
+                self._stderr_condition.notify_all()
+
+    def execute(self, args: list[str]) -> tuple[str, str]:
+        """
+        Run one command, return its (stdout, stderr).
+        Raises ExifToolError if the process died, it's restarted on the next call.
+        """
+        if any("\n" in arg for arg in args):
+            raise ValueError("ExifTool arguments can't contain newlines")
+
+        if not self.isRunning():
+            self.start()
+
+        number = next(self._counter)
+        marker = f"{{ready{number}}}".encode("utf-8")
+        command = "\n".join(args + ["-echo4", f"{{ready{number}}}", f"-execute{number}", ""])
+        try:
+            self._process.stdin.write(command.encode("utf-8"))
+            self._process.stdin.flush()
+
+            stdout = b""
+            while not stdout.rstrip().endswith(marker):
+                chunk = os.read(self._process.stdout.fileno(), 65536)
+                if not chunk:
+                    raise ExifToolError("ExifTool process exited unexpectedly")
+                stdout += chunk
+        except OSError as e:
+            self.kill()
+            raise ExifToolError(f"ExifTool process failed: {e}") from e
+        except ExifToolError:
+            self.kill()
+            raise
+
+        with self._stderr_condition:
+            while marker not in self._stderr_buffer:
+                if not self.isRunning():
+                    break
+                self._stderr_condition.wait(1)
+            stderr, _, self._stderr_buffer = self._stderr_buffer.partition(marker)
+
+        stdout = stdout.rstrip()[:-len(marker)]
+        return stdout.decode("utf-8", errors="replace"), stderr.decode("utf-8", errors="replace").strip()
+
+    def kill(self):
+        if self._process is None:
+            return
+
+        process, self._process = self._process, None
+        process.kill()
+        process.wait()
+
+    def close(self):
+        if self._process is None:
+            return
+
+        process, self._process = self._process, None
+        try:
+            process.stdin.write(b"-stay_open\nFalse\n")
+            process.stdin.flush()
+            process.wait(timeout=5)
+        except (OSError, subprocess.TimeoutExpired):
+            process.kill()
+            process.wait()
+
+class ExifTool():
+    """
+    Small pool of persistent ExifTool processes shared by the whole application.
+    Processes are started on first use, restarted if they crash and stopped by close().
+    Safe to use from several threads, each command takes one idle process.
+    """
+    DEFAULT_POOL_SIZE = 2
+
+    def __init__(self, executable: str = "", pool_size: int = DEFAULT_POOL_SIZE):
+        self._executable = executable or "exiftool"
+        self._pool_size = pool_size
+        self._lock = threading.Lock()
+        self._idle = queue.LifoQueue()
+        self._processes: list[ExifToolProcess] = []
+
+    def setExecutable(self, executable: str):
+        executable = executable or "exiftool"
+        if executable != self._executable:
+            self.close()
+            self._executable = executable
+
+    def acquire(self) -> ExifToolProcess:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            if len(self._processes) < self._pool_size:
+                process = ExifToolProcess(self._executable)
+                self._processes.append(process)
+                return process
+
+        return self._idle.get()
+
+    def execute(self, args: list[str]) -> tuple[str, str]:
+        with tracer.span("exiftool.wait"):
+            process = self.acquire()
+        try:
+            with tracer.span("exiftool.execute"):
+                return self.executeWith(process, args)
+        finally:
+            self.release(process)
+
+    def executeWith(self, process: ExifToolProcess, args: list[str]) -> tuple[str, str]:
+        try:
+            try:
+                return process.execute(args)
+            except ExifToolError:
+                # process crashed, it's started again by the retry
+                return process.execute(args)
+        except FileNotFoundError as e:
+            raise ExifToolError(f"ExifTool executable not found: {self._executable}") from e
+
+    def release(self, process: ExifToolProcess):
+        with self._lock:
+            if process in self._processes:
+                self._idle.put(process)
+                return
+
+        # pool was closed while the process was busy
+        process.close()
+
+    def readMetadata(self, paths: list[str], tags: list[str] | None = None, fast: bool = False) -> list[dict]:
+        """
+        Read metadata of the files in one command, keys are prefixed with group name (EXIF:ImageDescription).
+        fast skips scanning the rest of the file after the header (-fast2), enough for EXIF tags.
+        """
+        if not paths:
+            return []
+
+        args = ["-json", "-G"] + (["-fast2"] if fast else []) + [f"-{tag}" for tag in tags or []] + list(paths)
+        stdout, stderr = self.execute(args)
+        if not stdout.strip():
+            if stderr:
+                raise ExifToolError(stderr)
+            return []
+        return json.loads(stdout)
+
+    def writeTags(self, tags: dict[str, dict[str, str]]) -> dict[str, str]:
+        """
+        Write tags (path -> {"EXIF:ImageDescription": ...}) to the files in place with one command.
+        Values are passed through a JSON import file, so they may contain any characters.
+        Returns error message for every file that failed.
+        """
+        if not tags:
+            return {}
+
+        fd, import_path = tempfile.mkstemp(prefix="exiftool-", suffix=".json")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump([{"SourceFile": path, **values} for path, values in tags.items()], f, ensure_ascii=False)
+
+            _, stderr = self.execute([f"-json={import_path}", "-overwrite_original"] + list(tags))
+        finally:
+            os.remove(import_path)
+
+        # error lines look like "Error: <message> - <path>", path separators may be changed by ExifTool
+        paths = {os.path.normpath(path): path for path in tags}
+        errors = {}
+        for line in stderr.splitlines():
+            if not line.startswith("Error"):
+                continue
+            message, _, path = line.rpartition(" - ")
+            if os.path.normpath(path) in paths:
+                errors[paths[os.path.normpath(path)]] = message
+        return errors
+
+    def close(self):
+        with self._lock:
+            processes, self._processes = self._processes, []
+            self._idle = queue.LifoQueue()
+
+        for process in processes:
+            process.close()
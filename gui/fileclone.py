@@ -0,0 +1,44 @@
+import os
+import shutil
+
+try:
+    import fcntl
+except ImportError: # Windows
+    fcntl = None
+
+FICLONE = 0x40049409 # from linux/fs.h
+
+def clone_file(source: str, destination: str):
+    """
+    Copy the file as a reflink (copy-on-write clone sharing the data blocks) where the filesystem supports it
+    (Btrfs, XFS, ...), otherwise make a regular copy. Metadata is copied like shutil.copy2.
+    """
+    if fcntl is not None:
+        with open(source, "rb") as src, open(destination, "wb") as dst:
+            try:
+                fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+                cloned = True
+            except OSError:
+                cloned = False # not supported or different filesystems
+
+        if cloned:
+            shutil.copystat(source, destination)
+            return
+
+    shutil.copy2(source, destination)
+
+def publish_file(source: str, destination: str):
+    """
+    Move the file to destination if nothing is there yet, raise FileExistsError otherwise.
+    Atomic, so workers in other processes or on other hosts can't overwrite each other's files.
+    """
+    try:
+        os.link(source, destination)
+    except FileExistsError:
+        raise
+    except OSError:
+        # no hard links on the filesystem, the name is taken by an empty file and replaced
+        os.close(os.open(destination, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+        os.replace(source, destination)
+        return
+    os.remove(source)
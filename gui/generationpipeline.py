@@ -0,0 +1,603 @@
+import os
+import queue
+import shutil
+import time
+import logging
+import tempfile
+import threading
+from typing import Callable
+from concurrent.futures import ThreadPoolExecutor
+
+from gui.chatbotfactory import create_generator
+from gui.exiftool import ExifTool, ExifToolError
+from gui.fileclone import clone_file, publish_file
+from gui.imagepreprocessor import downscale_image
+from gui.manifest import GenerationManifest, text_sha256
+from gui.ratelimiter import RateLimiter, is_rate_limit_error
+from gui.responsecache import ResponseCache
+from gui.schemas.config import ImgDescGenConfig, OutputMode
+from gui.tracing import tracer
+from gui.uploadregistry import UploadRegistry
+from imgdescgenlib.imgdescgen import ImgDescGen
+
+logger = logging.getLogger("imgdescgengui")
+
+class GenerationError(Exception):
+    pass
+
+class GenerationSummary():
+    def __init__(self):
+        self.done = 0
+        self.failed = 0
+        self.skipped = 0
+        self.cached = 0
+        self.cancelled = 0
+
+    def __str__(self):
+        summary = f"{self.done} images done ({self.cached} from cache), {self.failed} failed, {self.skipped} skipped as already done"
+        if self.cancelled:
+            summary += f", {self.cancelled} cancelled"
+        return summary
+
+def split_into_chunks(images: list[str], chunk_size: int) -> list[list[str]]:
+    """
+    Split images into chunks of at most chunk_size, keeping the order.
+    Images with the same filename go to different chunks, since a chunk is generated into one directory.
+    """
+    chunk_size = max(1, chunk_size)
+    chunks = []
+    open_chunks: list[tuple[list[str], set[str]]] = []
+    for image in images:
+        name = os.path.basename(image)
+        target = next((chunk for chunk in open_chunks if name not in chunk[1]), None)
+        if target is None:
+            target = ([], set())
+            open_chunks.append(target)
+        target[0].append(image)
+        target[1].add(name)
+
+        if len(target[0]) >= chunk_size:
+            open_chunks.remove(target)
+            chunks.append(target[0])
+
+    chunks.extend(chunk for chunk, _ in open_chunks)
+    return chunks
+
+class GenerationPipeline():
+    """
+    Generates descriptions for a list of images into the output directory.
+    Images are split into chunks of the chatbot's max_image_count and put into a queue, which is consumed
+    by config.concurrency threads, each with its own chatbot client. Requests go through a shared rate limiter,
+    chunks rejected by rate limit are retried with backoff, other failed chunks don't stop the following ones.
+    Each chunk is generated into an empty scratch directory and moved to the output directory,
+    outcome of its images is checkpointed in the output directory manifest.
+    Images completed before with the same content, prompt and model are skipped,
+    so a rerun retries only failed or changed images.
+    The library tags the files it's given one by one in its scratch directory. Its copies of the originals
+    are moved to the output directory as they are, descriptions of downscaled copies and of in-place outputs
+    are read back and written to the outputs in bulk, one ExifTool command per chunk.
+    With downscale_max_edge set, large images are sent as downscaled copies made on a CPU pool.
+    Generated descriptions are also kept in the response cache, images found there are written
+    to the output directory without calling the chatbot.
+    Copies made by the pipeline itself are made as reflinks in reflink output mode, writing the description
+    rewrites them anyway. In in-place mode descriptions are transferred to the originals and no copies are made.
+    Uploads of chatbots with force_upload are tracked in the upload registry, a chunk reuses
+    uploads stored by the provider only if all its files were uploaded before with the same content.
+    """
+    MAX_ATTEMPTS = 5
+
+    # progress events, passed to progress_callback with the image path
+    EVENT_SKIPPED = "skipped"
+    EVENT_STARTED = "started"
+    EVENT_UPLOADED = "uploaded" # sent to the chatbot, the library uploads and describes in one call
+    EVENT_DESCRIBED = "described"
+    EVENT_WRITTEN = "written"
+    EVENT_FAILED = "failed"
+
+    DESCRIPTION_TAG = "EXIF:ImageDescription"
+    WRITE_BATCH_SIZE = 200
+
+    # rough request size for the tokens per minute limit
+    TOKENS_PER_IMAGE = 258
+    CHARS_PER_TOKEN = 4
+
+    def __init__(self, config: ImgDescGenConfig, exiftool: ExifTool | None = None,
+                 progress_callback: Callable[[str, str], None] | None = None, rate_limiter: RateLimiter | None = None):
+        self._config = config
+        self._exiftool = exiftool
+        # a worker passes its own, so limits hold across its claims and batches
+        self._rate_limiter = rate_limiter or RateLimiter()
+        self._progress_callback = progress_callback
+        self._cancel_event = threading.Event()
+        self._lock = threading.Lock()
+
+    def cancel(self):
+        """
+        Stop after requests in flight finish, can be called from any thread.
+        Finished images are recorded, the rest is left for the next run.
+        """
+        self._cancel_event.set()
+
+    def notify(self, event: str, images):
+        if self._progress_callback is not None:
+            for image in images:
+                self._progress_callback(event, image)
+
+    def getRecord(self, image: str) -> dict | None:
+        """
+        Manifest record of the image (status, output, error), from progress callbacks it's the record just written.
+        """
+        return self._manifest.getRecord(image)
+
+    def getModelName(self, chatbot_config) -> str:
+        model_name = chatbot_config.model_name
+        return getattr(model_name, "name", str(model_name))
+
+    def estimateTokens(self, image_count: int) -> int:
+        prompt = self._chatbot_config.image_description_prompt
+        return image_count * GenerationPipeline.TOKENS_PER_IMAGE + len(prompt) // GenerationPipeline.CHARS_PER_TOKEN
+
+    def open(self):
+        """
+        Open the output directory manifest and the caches. generate() can then be called for several lists
+        of images with the same config (claims of a queued batch), close() must be called after.
+        """
+        schema = self._config.getSchema()
+        self._chatbot_config = schema.chatbots[schema.chatbot]
+        self._prompt_hash = text_sha256(self._chatbot_config.image_description_prompt)
+        self._model = self.getModelName(self._chatbot_config)
+
+        self._manifest = GenerationManifest(schema.output_dir)
+        self._owns_exiftool = self._exiftool is None
+        if self._owns_exiftool:
+            self._exiftool = ExifTool(schema.exiftool_path)
+        self._response_cache = ResponseCache(schema.response_cache_max_entries) if schema.response_cache_enabled else None
+        self._preprocess_executor = ThreadPoolExecutor(max_workers=os.cpu_count() or 1, thread_name_prefix="preprocess")
+        self._upload_registry = UploadRegistry() if hasattr(self._chatbot_config, "force_upload") else None
+        # the budget is per chatbot and API key
+        scope = text_sha256(f"{schema.chatbot}:{getattr(self._chatbot_config, 'api_key', '')}")
+        self._rate_limiter.setLimits(schema.requests_per_minute, schema.tokens_per_minute, scope)
+
+    def close(self):
+        self._preprocess_executor.shutdown(cancel_futures=True)
+        if self._upload_registry is not None:
+            self._upload_registry.close()
+        if self._response_cache is not None:
+            self._response_cache.close()
+        if self._owns_exiftool:
+            self._exiftool.close()
+            self._exiftool = None
+
+    def run(self, image_list: list[str]) -> GenerationSummary:
+        self.open()
+        try:
+            with tracer.span("generation.run", images=len(image_list)):
+                return self.generate(image_list)
+        finally:
+            self.close()
+
+    def generate(self, image_list: list[str]) -> GenerationSummary:
+        schema = self._config.getSchema()
+        self._summary = GenerationSummary()
+        self._reserved_outputs = set()
+        # records written by other processes since the manifest was read, e.g. workers of the same batch
+        self._manifest.refresh()
+
+        pending = []
+        for checked, image in enumerate(image_list):
+            if self._cancel_event.is_set():
+                self._summary.cancelled = len(image_list) - checked
+                return self._summary
+
+            try:
+                with tracer.span("generation.hash"):
+                    content_hash = self._manifest.contentHash(image)
+            except OSError as e:
+                logger.error(f"Failed to read {image}: {e}")
+                self._summary.failed += 1
+                self.notify(GenerationPipeline.EVENT_FAILED, [image])
+                continue
+
+            if self._manifest.isCompleted(image, content_hash, self._prompt_hash, self._model):
+                self._summary.skipped += 1
+                self.notify(GenerationPipeline.EVENT_SKIPPED, [image])
+            else:
+                pending.append((image, content_hash))
+
+        logger.info(f"{len(pending)} images to process, {self._summary.skipped} already done")
+        self._content_hashes = dict(pending)
+
+        self._cached_descriptions = {}
+        if self._response_cache is not None:
+            for image, content_hash in pending:
+                description = self._response_cache.get(content_hash, self._prompt_hash, self._model)
+                if description is not None:
+                    self._cached_descriptions[image] = description
+            self._response_cache.flush()
+
+            if self._cached_descriptions:
+                logger.info(f"{len(self._cached_descriptions)} descriptions found in the response cache")
+                pending = [(image, content_hash) for image, content_hash in pending if image not in self._cached_descriptions]
+
+        # cached descriptions are written in batches by the same threads, alongside the requests
+        chunk_list = [(chunk, True) for chunk in split_into_chunks(list(self._cached_descriptions), GenerationPipeline.WRITE_BATCH_SIZE)]
+        chunk_list += [(chunk, False) for chunk in split_into_chunks([image for image, _ in pending], self._chatbot_config.max_image_count)]
+        if not chunk_list:
+            return self._summary
+
+        self._chunks = queue.Queue()
+        self._chunk_count = len(chunk_list)
+        for index, (chunk, cached) in enumerate(chunk_list, 1):
+            self._chunks.put((index, chunk, cached))
+
+        concurrency = max(1, min(schema.concurrency, self._chunk_count))
+        logger.info(f"{self._chunk_count} chunks, {concurrency} requests in parallel")
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="generation") as executor:
+            for future in [executor.submit(self.processChunks) for _ in range(concurrency)]:
+                future.result()
+
+        # chunks nobody started after cancel
+        while not self._chunks.empty():
+            self._summary.cancelled += len(self._chunks.get_nowait()[1])
+
+        if self._cancel_event.is_set():
+            logger.info("Generation cancelled")
+        return self._summary
+
+    def getClient(self, clients: dict[bool, ImgDescGen], force_upload: bool) -> ImgDescGen:
+        """
+        Chatbot client of the calling thread with force_upload set as given (for chatbots that support it).
+        """
+        if force_upload not in clients:
+            chatbot_config = self._chatbot_config
+            if self._upload_registry is not None:
+                chatbot_config = chatbot_config.model_copy(update={"force_upload": force_upload})
+            clients[force_upload] = create_generator(self._config.getSchema().chatbot, chatbot_config, self._exiftool)
+        return clients[force_upload]
+
+    def processChunks(self):
+        # chatbot clients are not shared between threads
+        clients: dict[bool, ImgDescGen] = {}
+
+        while not self._cancel_event.is_set():
+            try:
+                index, chunk, cached = self._chunks.get_nowait()
+            except queue.Empty:
+                return
+
+            self.notify(GenerationPipeline.EVENT_STARTED, chunk)
+            if cached:
+                logger.info(f"Chunk {index}/{self._chunk_count}: writing {len(chunk)} cached descriptions")
+                results = self.writeCachedDescriptions({image: self._cached_descriptions[image] for image in chunk})
+                with self._lock:
+                    self._summary.cached += sum(1 for result in results.values() if not isinstance(result, Exception))
+            else:
+                logger.info(f"Chunk {index}/{self._chunk_count}: processing {len(chunk)} images")
+                results = self.generateChunk(clients, chunk)
+            self.recordResults(f"Chunk {index}/{self._chunk_count}", results)
+
+            # images of a chunk cancelled before its request have no result
+            cancelled = sum(1 for image in chunk if image not in results)
+            if cancelled:
+                with self._lock:
+                    self._summary.cancelled += cancelled
+
+    def recordResults(self, label: str, results: dict[str, str | Exception]):
+        chunk_done = 0
+        for image, result in results.items():
+            content_hash = self._content_hashes[image]
+            if isinstance(result, Exception):
+                logger.error(f"Failed to process {image}: {repr(result)}")
+                self._manifest.record(image, content_hash, self._prompt_hash, self._model, GenerationManifest.STATUS_FAILED, error=repr(result))
+                self.notify(GenerationPipeline.EVENT_FAILED, [image])
+            else:
+                self._manifest.record(image, content_hash, self._prompt_hash, self._model, GenerationManifest.STATUS_DONE, output=result)
+                self.notify(GenerationPipeline.EVENT_WRITTEN, [image])
+                chunk_done += 1
+
+        with self._lock:
+            self._summary.done += chunk_done
+            self._summary.failed += len(results) - chunk_done
+
+        logger.info(f"{label} finished: {chunk_done} done, {len(results) - chunk_done} failed")
+
+    def reserveOutputs(self, images: list[str], results: dict[str, str | Exception]) -> list[str]:
+        """
+        Reserve output filenames of the images, return images that got one, others are failed in results.
+        """
+        schema = self._config.getSchema()
+        if schema.output_mode == OutputMode.IN_PLACE:
+            return list(images) # every image is its own output
+
+        reserved = []
+        for image in images:
+            output_name = os.path.basename(image)
+            destination = os.path.join(schema.output_dir, output_name)
+            with self._lock:
+                # chunks running in parallel may contain images with the same filename
+                if output_name in self._reserved_outputs or (os.path.exists(destination) and self._manifest.getOutputSource(output_name) != image):
+                    results[image] = GenerationError(f"{output_name} already exists in the output directory")
+                    continue
+                self._reserved_outputs.add(output_name)
+            reserved.append(image)
+        return reserved
+
+    def moveOutput(self, image: str, produced: str, results: dict[str, str | Exception]):
+        output_name = os.path.basename(image)
+        destination = os.path.join(self._config.getSchema().output_dir, output_name)
+        try:
+            if self._manifest.getOutputSource(output_name) == image:
+                os.replace(produced, destination) # output of the image generated again
+            else:
+                # another worker may have published an image with the same filename since it was reserved
+                publish_file(produced, destination)
+            results[image] = output_name
+        except FileExistsError:
+            results[image] = GenerationError(f"{output_name} already exists in the output directory")
+        except OSError as e:
+            results[image] = e
+
+    def writeDescriptions(self, descriptions: dict[str, str]) -> dict[str, str | Exception]:
+        """
+        Write descriptions to copies of the images in the output directory with one ExifTool command
+        (JSON import over a persistent ExifTool process). Output filenames must be reserved.
+        """
+        schema = self._config.getSchema()
+        if schema.output_mode == OutputMode.IN_PLACE:
+            return self.writeDescriptionsInPlace(descriptions)
+
+        results: dict[str, str | Exception] = {}
+        start_time = time.perf_counter()
+        scratch_dir = tempfile.mkdtemp(prefix="tmp-", dir=self._manifest.getDirectory())
+        try:
+            copies = {}
+            for image in descriptions:
+                copy = os.path.join(scratch_dir, os.path.basename(image))
+                try:
+                    if schema.output_mode == OutputMode.REFLINK:
+                        clone_file(image, copy)
+                    else:
+                        shutil.copy2(image, copy)
+                    copies[image] = copy
+                except OSError as e:
+                    results[image] = e
+
+            try:
+                errors = self._exiftool.writeTags({copy: {GenerationPipeline.DESCRIPTION_TAG: descriptions[image]} for image, copy in copies.items()})
+            except ExifToolError as e:
+                results.update((image, e) for image in copies)
+                return results
+
+            for image, copy in copies.items():
+                if copy in errors:
+                    results[image] = GenerationError(f"ExifTool: {errors[copy]}")
+                else:
+                    self.moveOutput(image, copy, results)
+
+            tracer.addSpan("generation.write", start_time, time.perf_counter() - start_time, {"images": len(copies)})
+            logger.debug(f"Wrote {len(copies)} descriptions in {time.perf_counter() - start_time:.2f} s, {len(errors)} failed")
+            return results
+        finally:
+            shutil.rmtree(scratch_dir, ignore_errors=True)
+
+    def writeDescriptionsInPlace(self, descriptions: dict[str, str]) -> dict[str, str | Exception]:
+        """
+        Write descriptions to the images themselves, previous values are saved to the backup file first.
+        """
+        results: dict[str, str | Exception] = {}
+        start_time = time.perf_counter()
+        try:
+            if self._config.getSchema().in_place_backup:
+                metadata = self._exiftool.readMetadata(list(descriptions), [GenerationPipeline.DESCRIPTION_TAG], fast=True)
+                previous = {os.path.normpath(item.get("SourceFile", "")): item.get(GenerationPipeline.DESCRIPTION_TAG) for item in metadata}
+                self._manifest.recordBackup({
+                    image: {GenerationPipeline.DESCRIPTION_TAG: previous.get(os.path.normpath(image))}
+                    for image in descriptions
+                })
+
+            errors = self._exiftool.writeTags({image: {GenerationPipeline.DESCRIPTION_TAG: description} for image, description in descriptions.items()})
+        except (ExifToolError, ValueError, OSError) as e:
+            results.update((image, e) for image in descriptions)
+            return results
+
+        for image in descriptions:
+            results[image] = GenerationError(f"ExifTool: {errors[image]}") if image in errors else image
+
+        tracer.addSpan("generation.write", start_time, time.perf_counter() - start_time, {"images": len(descriptions)})
+        logger.debug(f"Wrote {len(descriptions)} descriptions in place in {time.perf_counter() - start_time:.2f} s, {len(errors)} failed")
+        return results
+
+    def writeCachedDescriptions(self, descriptions: dict[str, str]) -> dict[str, str | Exception]:
+        results: dict[str, str | Exception] = {}
+        images = self.reserveOutputs(list(descriptions), results)
+        if images:
+            results.update(self.writeDescriptions({image: descriptions[image] for image in images}))
+        return results
+
+    def readDescriptions(self, produced: dict[str, str]) -> dict[str, str]:
+        """
+        Read descriptions written by the library to the produced files (image -> produced file).
+        """
+        with tracer.span("generation.read_descriptions", images=len(produced)):
+            metadata = self._exiftool.readMetadata(list(produced.values()), [GenerationPipeline.DESCRIPTION_TAG], fast=True)
+        descriptions = {os.path.normpath(item.get("SourceFile", "")): item.get(GenerationPipeline.DESCRIPTION_TAG) for item in metadata}
+
+        result = {}
+        for image, path in produced.items():
+            description = descriptions.get(os.path.normpath(path))
+            if description:
+                result[image] = str(description)
+        return result
+
+    def cacheDescriptions(self, descriptions: dict[str, str]):
+        for image, description in descriptions.items():
+            self._response_cache.put(self._content_hashes[image], self._prompt_hash, self._model, description)
+
+    def getInputSettings(self) -> tuple[int, int]:
+        """
+        Max edge and JPEG quality of the copies sent instead of large images, (0, 0) if originals are sent.
+        """
+        schema = self._config.getSchema()
+        if schema.downscale_max_edge > 0:
+            return schema.downscale_max_edge, schema.downscale_quality
+        return 0, 0
+
+    def preprocessImages(self, images: list[str], input_dir: str, results: dict[str, str | Exception]) -> dict[str, str]:
+        """
+        Downscale images into input_dir on the preprocessing pool, return image -> file to send.
+        Images already small enough are sent as they are.
+        """
+        max_edge, quality = self.getInputSettings()
+        start_time = time.perf_counter()
+        futures = {
+            image: self._preprocess_executor.submit(
+                downscale_image, image, os.path.join(input_dir, os.path.basename(image)), max_edge, quality
+            )
+            for image in images
+        }
+
+        inputs = {}
+        original_size = sent_size = 0
+        for image, future in futures.items():
+            try:
+                downscaled = future.result()
+                inputs[image] = os.path.join(input_dir, os.path.basename(image)) if downscaled else image
+                original_size += os.path.getsize(image)
+                sent_size += os.path.getsize(inputs[image])
+            except OSError as e:
+                results[image] = e
+
+        tracer.addSpan("generation.preprocess", start_time, time.perf_counter() - start_time, {"images": len(images)})
+        logger.debug(f"Downscaled {len(inputs)} images from {original_size / 1024 / 1024:.1f} MB to {sent_size / 1024 / 1024:.1f} MB")
+        return inputs
+
+    def generateChunk(self, clients: dict[bool, ImgDescGen], chunk: list[str]) -> dict[str, str | Exception]:
+        """
+        Generate descriptions for one chunk, return output filename or exception for every image.
+        """
+        results: dict[str, str | Exception] = {}
+
+        images = self.reserveOutputs(chunk, results)
+        if not images:
+            return results
+
+        if self.getInputSettings()[0] <= 0:
+            results.update(self.requestDescriptions(clients, {image: image for image in images}))
+            return results
+
+        input_dir = tempfile.mkdtemp(prefix="tmp-", dir=self._manifest.getDirectory())
+        try:
+            inputs = self.preprocessImages(images, input_dir, results)
+            if inputs:
+                results.update(self.requestDescriptions(clients, inputs))
+        finally:
+            shutil.rmtree(input_dir, ignore_errors=True)
+        return results
+
+    def uploadHashes(self, inputs: dict[str, str]) -> dict[str, str]:
+        """
+        Upload name -> hash of the content sent for every input file.
+        """
+        max_edge, quality = self.getInputSettings()
+        hashes = {}
+        for image, input_path in inputs.items():
+            content_hash = self._content_hashes[image]
+            if input_path != image:
+                # downscaled copy, its content is determined by the original and the preprocessing settings
+                content_hash = text_sha256(f"{content_hash}:{max_edge}:{quality}")
+            hashes[os.path.basename(input_path)] = content_hash
+        return hashes
+
+    def requestDescriptions(self, clients: dict[bool, ImgDescGen], inputs: dict[str, str]) -> dict[str, str | Exception]:
+        """
+        Run the library on the input files (image -> file to send) with rate limiting and retries.
+        Files it produced from the originals are tagged copies, outside in-place mode they're moved
+        to the output directory as they are. Descriptions of downscaled copies, and of all files
+        in in-place mode, are read back and written to the outputs in bulk.
+        """
+        schema = self._config.getSchema()
+        results: dict[str, str | Exception] = {}
+        upload_hashes = self.uploadHashes(inputs)
+
+        for attempt in range(1, GenerationPipeline.MAX_ATTEMPTS + 1):
+            with tracer.span("generation.rate_limit_wait"):
+                acquired = self._rate_limiter.acquire(self.estimateTokens(len(inputs)), self._cancel_event)
+            if not acquired:
+                return results # cancelled while waiting, images are left without result
+
+            force_upload = False
+            if self._upload_registry is not None:
+                force_upload = self._chatbot_config.force_upload or not all(
+                    self._upload_registry.isUploaded(schema.chatbot, content_hash, name)
+                    for name, content_hash in upload_hashes.items()
+                )
+            img_desc_gen = self.getClient(clients, force_upload)
+
+            scratch_dir = tempfile.mkdtemp(prefix="tmp-", dir=self._manifest.getDirectory())
+            try:
+                self.notify(GenerationPipeline.EVENT_UPLOADED, inputs)
+                try:
+                    # includes upload, model latency and the library's own metadata writes
+                    with tracer.span("chatbot.request", images=len(inputs), attempt=attempt):
+                        img_desc_gen.generate_image_description(
+                            list(inputs.values()),
+                            scratch_dir,
+                            True,
+                            schema.exiftool_path,
+                        )
+                # library may raise anything, files it left behind may be not tagged yet so whole chunk is failed
+                except Exception as e:
+                    if is_rate_limit_error(e) and attempt < GenerationPipeline.MAX_ATTEMPTS:
+                        delay = self._rate_limiter.onRateLimited()
+                        logger.warning(f"Rate limited, retrying chunk in {delay:.1f} s (attempt {attempt + 1}/{GenerationPipeline.MAX_ATTEMPTS})")
+                        continue
+
+                    results.update((image, e) for image in inputs)
+                    return results
+
+                self._rate_limiter.onSuccess()
+                if force_upload:
+                    self._upload_registry.recordUploads(schema.chatbot, upload_hashes)
+
+                produced = {}
+                for image in inputs:
+                    path = os.path.join(scratch_dir, os.path.basename(image))
+                    if os.path.exists(path):
+                        produced[image] = path
+                    else:
+                        results[image] = GenerationError("no output file was produced")
+
+                if not produced:
+                    return results
+                self.notify(GenerationPipeline.EVENT_DESCRIBED, produced)
+
+                direct = {} if schema.output_mode == OutputMode.IN_PLACE else {
+                    image: path for image, path in produced.items() if inputs[image] == image
+                }
+                transferred = [image for image in produced if image not in direct]
+                # files moved as they are are read only for the response cache
+                read = produced if self._response_cache is not None else {image: produced[image] for image in transferred}
+                try:
+                    descriptions = self.readDescriptions(read) if read else {}
+                except (ExifToolError, ValueError) as e:
+                    if direct:
+                        logger.warning(f"Failed to read generated descriptions for the response cache: {e}")
+                    results.update((image, e) for image in transferred)
+                    descriptions, transferred = {}, []
+
+                if self._response_cache is not None:
+                    self.cacheDescriptions(descriptions)
+                for image, path in direct.items():
+                    self.moveOutput(image, path, results)
+
+                for image in transferred:
+                    if image not in descriptions:
+                        results[image] = GenerationError("no description was produced")
+                transferred = [image for image in transferred if image in descriptions]
+                if transferred:
+                    results.update(self.writeDescriptions({image: descriptions[image] for image in transferred}))
+                return results
+            finally:
+                shutil.rmtree(scratch_dir, ignore_errors=True)
+
+        return results
@@ -1,128 +1,423 @@
+import os
+import sys
+import json
+import time
+import sqlite3
 import logging
+import itertools
+import subprocess
+import collections
+import logging.handlers
 
 from PySide6.QtGui import QIcon
-from PySide6.QtCore import QObject, Signal, QThread
-from PySide6.QtWidgets import QWidget, QLabel, QVBoxLayout, QTextEdit, QApplication
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, QTimer, Signal
+from PySide6.QtWidgets import (QWidget, QLabel, QVBoxLayout, QHBoxLayout, QPlainTextEdit, QComboBox, QApplication,
+                               QProgressBar, QPushButton)
 
-from gui.chatbotfactory import create_chatbot
-from gui.schemas.config import ImgDescGenConfig
-from imgdescgenlib.imgdescgen import ImgDescGen
+from gui.jobqueue import JobQueue
+from gui.tracing import tracer
+from gui.schemas.config import ImgDescGenConfig, OutputMode
 
 class LoggingHandler(logging.Handler):
     """
-    Custom logging handler to redirect log messages to a QTextEdit widget.
-    Safe for threading.
+    Custom logging handler collecting formatted log messages into a bounded buffer shared by handlers,
+    the GenerationWindow drains it on a timer. Safe for threading, if the buffer is full the oldest messages are dropped.
     """
-    # use inner class to avoid emit() method conflict
-    class Emitter(QObject):
-        record_signal = Signal(str, str)
-
-    def __init__(self, prefix: str):
+    def __init__(self, prefix: str, buffer: collections.deque):
         super().__init__()
         self._prefix = prefix
-        self.emitter = LoggingHandler.Emitter()
+        self._buffer = buffer
 
     def emit(self, record):
         msg = self.format(record)
-        self.emitter.record_signal.emit(self._prefix, msg)    
+        self._buffer.append(f"[{self._prefix}] {msg}") # deque append is atomic
 
-class GenerationWindow(QWidget):
-    GUI_PREFIX = "GUI"
-    LIB_PREFIX = "Library"
-    CLIENT_PREFIX = "Client"
+class QueueEmitter(QObject):
+    # batch id, poll result or None, error message
+    polled = Signal(int, object, str)
+    # batch id, error message
+    cancelled = Signal(int, str)
 
-    class GenerationWorker(QObject):
-        finished = Signal(str)
+class QueuePollTask(QRunnable):
+    """
+    Reads progress, log records and spans of the batch from the job queue, finishes jobs of crashed workers.
+    The queue may be locked by workers for a while, so it's never read in the GUI thread.
+    """
+    def __init__(self, emitter: QueueEmitter, job_queue: JobQueue, batch_id: int, last_log_id: int, last_span_id: int):
+        super().__init__()
+        self._emitter = emitter
+        self._queue = job_queue
+        self._batch_id = batch_id
+        self._last_log_id = last_log_id
+        self._last_span_id = last_span_id
 
-        def __init__(self, config, image_list: list[str]):
-            super().__init__()
+    def run(self):
+        try:
+            expired = self._queue.expiredLeaseCount(self._batch_id)
+            if expired:
+                # a worker crashed, its jobs that won't be claimed again are finished here
+                self._queue.recoverExpired()
+                expired = self._queue.expiredLeaseCount(self._batch_id) # left for workers to claim again
+            result = {
+                "expired": expired,
+                "counts": self._queue.counts(self._batch_id),
+                "records": self._queue.logRecords(self._batch_id, self._last_log_id),
+                "spans": self._queue.spanRecords(self._batch_id, self._last_span_id),
+            }
+        except sqlite3.Error as e:
+            self._emitter.polled.emit(self._batch_id, None, str(e))
+            return
+        self._emitter.polled.emit(self._batch_id, result, "")
 
-            self._config = config
-            self._image_list = image_list
+class QueueCancelTask(QRunnable):
+    def __init__(self, emitter: QueueEmitter, job_queue: JobQueue, batch_id: int):
+        super().__init__()
+        self._emitter = emitter
+        self._queue = job_queue
+        self._batch_id = batch_id
 
-        def run(self):
-            client = create_chatbot(self._config.getSchema().chatbot, self._config.getSchema().chatbots[self._config.getSchema().chatbot])
+    def run(self):
+        try:
+            self._queue.cancel(self._batch_id)
+        except sqlite3.Error as e:
+            self._emitter.cancelled.emit(self._batch_id, str(e))
+            return
+        self._emitter.cancelled.emit(self._batch_id, "")
+
+class GenerationWindow(QWidget):
+    """
+    Viewer and controller of generation batches in the job queue.
+    A batch is submitted to the queue and run by worker processes: local ones started here and
+    any started with worker.py, on this host or others sharing the queue. Progress, worker logs and
+    worker tracer spans (shown in the statistics window) are polled from the queue, Cancel cancels the batch.
+    The queue is read and cancelled in a background thread, workers may hold its lock for a while.
+    Workers keep running the batch when the window is closed, jobs of workers that crash are taken over by the others.
+    """
+    GUI_PREFIX = "GUI"
+    LOG_MAX_LINES = 10000
+    LOG_DRAIN_INTERVAL_MS = 100
+    QUEUE_POLL_INTERVAL_MS = 500
+    LOG_FILE = "logs/generation.log"
+    LOG_FILE_MAX_BYTES = 10 * 1024 * 1024
+    LOG_FILE_BACKUP_COUNT = 5
+    LOG_LEVELS = [("Debug", logging.DEBUG), ("Info", logging.INFO), ("Warning", logging.WARNING), ("Error", logging.ERROR)]
+    LIB_PREFIX = "Library"
+    CLIENT_PREFIX = "Client"
+    # logger of a log record in the queue -> prefix
+    LOGGER_PREFIXES = {"imgdescgengui": GUI_PREFIX, "imgdescgenlib": LIB_PREFIX, "chatbotclient": CLIENT_PREFIX}
+    WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "worker.py")
+    WORKER_LOG_FILE = "logs/worker-{}.log" # output of a local worker, by slot
+    MAX_WORKER_FAILURES = 3 # local workers failing in a row aren't started again
 
-            finishMsg = None # in case of error, here will be exception message to print in GUI
-            self._img_desc_gen = ImgDescGen(client)
-            try:
-                self._img_desc_gen.generate_image_description(
-                    self._image_list,
-                    self._config.getSchema().output_dir,
-                    True,
-                    self._config.getSchema().exiftool_path,
-                )
-            # idk but need to handle all exceptions to emit finished signal and quit thread
-            except Exception as e:
-                finishMsg = f"Exception: {repr(e)}"
-            
-            self.finished.emit(finishMsg)
-            
     def __init__(self, config: ImgDescGenConfig, parent=None):
         super(GenerationWindow, self).__init__(parent)
 
         self.setWindowTitle("Generation")
         self.setWindowIcon(QIcon("gui/icon_1024.png"))
 
+        self._config = config
+        self._queue = None
+        self._queue_path = None
+        self._batch_id = None
+        self._last_log_id = 0
+        self._last_span_id = 0
+        self._polling = False
+        self._worker_processes: list[tuple[subprocess.Popen, str]] = [] # process, log file
+        self._worker_failures = 0
+
+        self._log_buffer = collections.deque(maxlen=self.LOG_MAX_LINES)
         self._lib_log_handler = self.createLoggingHandler(self.LIB_PREFIX)
         self._client_log_handler = self.createLoggingHandler(self.CLIENT_PREFIX)
+        self._gui_log_handler = self.createLoggingHandler(self.GUI_PREFIX)
+        logging.getLogger("imgdescgengui").addHandler(self._gui_log_handler)
+        logging.getLogger("imgdescgengui").setLevel(logging.DEBUG)
         logging.getLogger("imgdescgenlib").addHandler(self._lib_log_handler)
         logging.getLogger("imgdescgenlib").setLevel(logging.DEBUG)
         logging.getLogger("chatbotclient").addHandler(self._client_log_handler)
         logging.getLogger("chatbotclient").setLevel(logging.DEBUG)
 
-        self._config = config
+        # full log goes to the file regardless of the level shown in the window, worker logs included
+        self._file_log_handler = None
+        if self._config.getSchema().log_to_file:
+            os.makedirs(os.path.dirname(self.LOG_FILE), exist_ok=True)
+            self._file_log_handler = logging.handlers.RotatingFileHandler(
+                self.LOG_FILE, maxBytes=self.LOG_FILE_MAX_BYTES, backupCount=self.LOG_FILE_BACKUP_COUNT, encoding="utf-8"
+            )
+            self._file_log_handler.setFormatter(logging.Formatter("%(asctime)s %(name)s %(levelname)s: %(message)s"))
+            for name in ("imgdescgengui", "imgdescgenlib", "chatbotclient"):
+                logging.getLogger(name).addHandler(self._file_log_handler)
 
         layout = QVBoxLayout()
 
-        self._gen_log_label = QLabel("Here you can see the generation logs. Don't close this window until generation is not stopped.")
-        layout.addWidget(self._gen_log_label)
+        label_layout = QHBoxLayout()
+        self._gen_log_label = QLabel("Here you can see the generation logs. Generation runs in worker processes and continues if this window is closed.")
+        label_layout.addWidget(self._gen_log_label, 1)
+
+        self._log_level_combobox = QComboBox()
+        for name, level in self.LOG_LEVELS:
+            self._log_level_combobox.addItem(name, level)
+        self._log_level_combobox.setCurrentIndex(1)
+        self._log_level_combobox.currentIndexChanged.connect(self.onLogLevelChanged)
+        label_layout.addWidget(QLabel("Level"))
+        label_layout.addWidget(self._log_level_combobox)
+        layout.addLayout(label_layout)
+
+        progress_layout = QHBoxLayout()
+        self._progress_bar = QProgressBar()
+        progress_layout.addWidget(self._progress_bar, 1)
+        self._progress_label = QLabel()
+        progress_layout.addWidget(self._progress_label)
+        self._cancel_button = QPushButton("Cancel")
+        self._cancel_button.setEnabled(False)
+        self._cancel_button.clicked.connect(self.cancel)
+        progress_layout.addWidget(self._cancel_button)
+        layout.addLayout(progress_layout)
 
-        self._log_text_edit = QTextEdit()
+        # plain text with a block limit, so the oldest lines are dropped instead of growing the document
+        self._log_text_edit = QPlainTextEdit()
         self._log_text_edit.setReadOnly(True)
+        self._log_text_edit.setMaximumBlockCount(self.LOG_MAX_LINES)
         layout.addWidget(self._log_text_edit)
 
         self.setLayout(layout)
+        self.onLogLevelChanged()
+
+        self._log_timer = QTimer(self)
+        self._log_timer.setInterval(self.LOG_DRAIN_INTERVAL_MS)
+        self._log_timer.timeout.connect(self.drainLog)
+        self._log_timer.start()
+
+        self._queue_timer = QTimer(self)
+        self._queue_timer.setInterval(self.QUEUE_POLL_INTERVAL_MS)
+        self._queue_timer.timeout.connect(self.pollQueue)
+
+        # one thread, so polls and cancelling don't wait for each other's queue lock
+        self._queue_pool = QThreadPool(self)
+        self._queue_pool.setMaxThreadCount(1)
+        self._queue_emitter = QueueEmitter()
+        self._queue_emitter.polled.connect(self.onQueuePolled)
+        self._queue_emitter.cancelled.connect(self.onCancelled)
 
-    def closeEvent(self, event):
-        # wait for thread to finish
-        if self.thread:
-            self.thread.quit()
-            self.thread.wait()
-            
-        event.accept()
+    def cancel(self):
+        if self._batch_id is None or not self._cancel_button.isEnabled():
+            return
+
+        self._cancel_button.setEnabled(False)
+        self._queue_pool.start(QueueCancelTask(self._queue_emitter, self._queue, self._batch_id))
+
+    def onCancelled(self, batch_id: int, error: str):
+        if batch_id != self._batch_id:
+            return
+
+        if error:
+            self.log(self.GUI_PREFIX, f"Failed to cancel: {error}")
+            self._cancel_button.setEnabled(True)
+            return
+        self.log(self.GUI_PREFIX, "Cancelling, waiting for requests in progress to finish")
+
+    def openQueue(self) -> JobQueue:
+        path = self._config.getSchema().job_queue_path
+        if self._queue is None or path != self._queue_path:
+            if self._queue is not None:
+                self._queue.close()
+            self._queue = JobQueue(path)
+            self._queue_path = path
+        return self._queue
+
+    def startLocalWorkers(self):
+        # workers started before and still running pick the batch up as well
+        self.checkWorkers()
+        if self._worker_failures >= self.MAX_WORKER_FAILURES:
+            return
+
+        missing = self._config.getSchema().local_workers - len(self._worker_processes)
+        used = {log_path for _, log_path in self._worker_processes}
+        slots = (slot for slot in itertools.count(1) if self.WORKER_LOG_FILE.format(slot) not in used)
+        started = 0
+        for _ in range(max(0, missing)):
+            log_path = self.WORKER_LOG_FILE.format(next(slots))
+            try:
+                os.makedirs(os.path.dirname(log_path), exist_ok=True)
+                with open(log_path, "w", encoding="utf-8") as log_file:
+                    process = subprocess.Popen(
+                        [sys.executable, self.WORKER_SCRIPT, "--queue", self._queue_path, "--config", os.path.abspath(self._config.getFilename()), "--exit-when-idle"],
+                        stdout=log_file,
+                        stderr=log_file,
+                        creationflags=subprocess.CREATE_NO_WINDOW if os.name == "nt" else 0,
+                    )
+            except OSError as e:
+                self.log(self.GUI_PREFIX, f"Failed to start a local worker: {e}")
+                self._worker_failures += 1
+                break
+            self._worker_processes.append((process, log_path))
+            started += 1
+
+        if started:
+            self.log(self.GUI_PREFIX, f"Started {started} local worker processes, their output goes to {os.path.dirname(self.WORKER_LOG_FILE)}")
+
+    def checkWorkers(self):
+        """
+        Forget local workers that exited, report the ones that failed.
+        """
+        running = []
+        for process, log_path in self._worker_processes:
+            code = process.poll()
+            if code is None:
+                running.append((process, log_path))
+            elif code == 0:
+                self._worker_failures = 0
+            else:
+                self._worker_failures += 1
+                self.log(self.GUI_PREFIX, f"Local worker {process.pid} exited with code {code}: {self.lastLogLine(log_path)} (see {log_path})")
+                if self._worker_failures == self.MAX_WORKER_FAILURES:
+                    self.log(self.GUI_PREFIX, f"Local workers failed {self.MAX_WORKER_FAILURES} times in a row, they won't be started again for this batch")
+        self._worker_processes = running
+
+    def lastLogLine(self, log_path: str) -> str:
+        try:
+            with open(log_path, "rb") as f:
+                f.seek(max(0, os.path.getsize(log_path) - 4096))
+                lines = [line.strip() for line in f.read().decode("utf-8", errors="replace").splitlines() if line.strip()]
+        except OSError:
+            return "no output"
+        return lines[-1] if lines else "no output"
+
+    def pollQueue(self):
+        # a poll still waiting for the queue lock is enough, the tick is skipped
+        if self._batch_id is None or self._polling:
+            return
+
+        self._polling = True
+        self._queue_pool.start(QueuePollTask(self._queue_emitter, self._queue, self._batch_id, self._last_log_id, self._last_span_id))
+
+    def onQueuePolled(self, batch_id: int, result: dict | None, error: str):
+        self._polling = False
+        if batch_id != self._batch_id:
+            return # finished or replaced by a new batch meanwhile
+
+        if result is None:
+            self.log(self.GUI_PREFIX, f"Failed to read the job queue: {error}")
+            return
+
+        counts = result["counts"]
+        if result["records"]:
+            self.showLogRecords(result["records"])
+        if result["spans"]:
+            self.addWorkerSpans(result["spans"])
+        self.updateProgress(counts)
+
+        self.checkWorkers()
+        if counts[JobQueue.STATE_QUEUED] == 0 and counts[JobQueue.STATE_RUNNING] == 0:
+            self.finished(counts)
+        elif (counts[JobQueue.STATE_QUEUED] or result["expired"]) and not self._worker_processes:
+            # local workers exit when they find nothing to do, they may have checked just before the batch came
+            # or before a crashed worker's lease expired
+            self.startLocalWorkers()
+
+    def addWorkerSpans(self, spans: list[tuple]):
+        # wall clock start of the worker -> perf_counter() of this process, workers on other hosts are off by the clock skew
+        offset = time.perf_counter() - time.time()
+        for span_id, worker, pid, tid, name, start, duration, args in spans:
+            self._last_span_id = span_id
+            tracer.addSpan(name, start + offset, duration, {**(json.loads(args) if args else {}), "worker": worker}, pid, tid)
+
+    def updateProgress(self, counts: dict[str, int]):
+        skipped = counts[JobQueue.STATE_SKIPPED]
+        processed = counts[JobQueue.STATE_DONE] + counts[JobQueue.STATE_FAILED]
+        self._progress_bar.setValue(skipped + processed + counts[JobQueue.STATE_CANCELLED])
+
+        # throughput counts only images processed since the batch was submitted
+        elapsed = time.monotonic() - self._progress_start
+        remaining = counts[JobQueue.STATE_QUEUED] + counts[JobQueue.STATE_RUNNING]
+        if processed == 0 or elapsed <= 0:
+            return
+
+        per_minute = processed / elapsed * 60
+        eta = int(remaining / per_minute * 60)
+        self._progress_label.setText(
+            f"{per_minute:.1f} images/min, {counts[JobQueue.STATE_FAILED]} failed, "
+            f"ETA {eta // 3600}:{eta // 60 % 60:02}:{eta % 60:02}"
+        )
 
     def log(self, prefix: str, message: str):
-        self._log_text_edit.append(f"[{prefix}] {message}")
+        self.drainLog() # keep order with buffered messages
+        self._log_text_edit.appendPlainText(f"[{prefix}] {message}")
+
+    def drainLog(self):
+        if not self._log_buffer:
+            return
+
+        lines = []
+        while self._log_buffer:
+            lines.append(self._log_buffer.popleft())
+        self._log_text_edit.appendPlainText("\n".join(lines))
+
+    def onLogLevelChanged(self):
+        level = self._log_level_combobox.currentData()
+        for handler in (self._lib_log_handler, self._client_log_handler, self._gui_log_handler):
+            handler.setLevel(level)
 
     def createLoggingHandler(self, prefix: str) -> LoggingHandler:
-        handler = LoggingHandler(prefix)
-        handler.emitter.record_signal.connect(self.log)
-        return handler
+        return LoggingHandler(prefix, self._log_buffer)
 
-    def finished(self, message: str = None):
-        if message:
-            self.log(self.GUI_PREFIX, message)
+    def finished(self, counts: dict[str, int]):
+        summary = (f"{counts[JobQueue.STATE_DONE]} images done, {counts[JobQueue.STATE_FAILED]} failed, "
+                   f"{counts[JobQueue.STATE_SKIPPED]} skipped as already done")
+        if counts[JobQueue.STATE_CANCELLED]:
+            summary += f", {counts[JobQueue.STATE_CANCELLED]} cancelled"
+        self.log(self.GUI_PREFIX, f"Generation finished: {summary}")
 
-        self.log(self.GUI_PREFIX, f"Working thread finished. Now you can close this window.")
-        
-        self.thread.wait()
-        self.thread = None
+        self._queue_timer.stop()
+        self._batch_id = None
+        self._cancel_button.setEnabled(False)
 
         QApplication.beep()
 
-    def run(self, image_list: list[str]):
-        self.worker = GenerationWindow.GenerationWorker(self._config, image_list)
+    def findDuplicateOutputs(self, image_list: list[str]) -> dict[str, str]:
+        """
+        Images whose output filename is taken by an earlier image of the list -> error.
+        They're failed at submit, so it's always the first one that's generated and workers don't race for the name.
+        """
+        if self._config.getSchema().output_mode == OutputMode.IN_PLACE:
+            return {} # every image is its own output
 
-        self.thread = QThread()
-        self.worker.moveToThread(self.thread)
-        self.worker.finished.connect(self.thread.quit)
-        self.worker.finished.connect(self.worker.deleteLater)
-        self.thread.finished.connect(self.thread.deleteLater)
+        names = set()
+        duplicates = {}
+        for image in image_list:
+            name = os.path.basename(image)
+            if name in names:
+                duplicates[image] = f"{name} is also the filename of another image in the batch"
+            names.add(name)
+        return duplicates
 
-        self.thread.started.connect(self.worker.run)
-        self.thread.start()
+    def run(self, image_list: list[str]):
+        schema = self._config.getSchema()
+        chatbot_config = schema.chatbots[schema.chatbot]
+        try:
+            job_queue = self.openQueue()
+            # a claim is as many images as one worker has requests in parallel
+            # API keys stay out of the queue, workers take them from their own config
+            config_json = schema.model_dump_json(exclude={"chatbots": {name: {"api_key"} for name in schema.chatbots}})
+            self._batch_id = job_queue.submit(image_list, config_json, chatbot_config.max_image_count * max(1, schema.concurrency),
+                                              self.findDuplicateOutputs(image_list))
+        except sqlite3.Error as e:
+            self.log(self.GUI_PREFIX, f"Failed to submit the batch to the job queue: {e}")
+            return
 
-        self.worker.finished.connect(self.finished)
+        self._last_log_id = 0
+        self._last_span_id = 0
+        self._progress_start = time.monotonic()
+        self._progress_bar.setRange(0, len(image_list))
+        self._progress_bar.setValue(0)
+        self._progress_label.clear()
+        self._cancel_button.setEnabled(True)
+        self.log(self.GUI_PREFIX, f"Batch {self._batch_id} of {len(image_list)} images submitted to {self._queue_path}")
 
-        self.log(self.GUI_PREFIX, f"Working thread started")
\ No newline at end of file
+        # local workers read API keys from the config file
+        if not self._config.saveConfig():
+            self.log(self.GUI_PREFIX, "Failed to save the config, local workers may use an outdated API key")
+        self._worker_failures = 0
+        self.startLocalWorkers()
+        if schema.local_workers == 0:
+            self.log(self.GUI_PREFIX, "No local workers, start worker.py with the same job queue to run the batch")
+        self._queue_timer.start()
@@ -1,18 +1,48 @@
+import time
 from PySide6.QtWidgets import QWidget, QGroupBox, QFormLayout, QLabel, QVBoxLayout, QScrollArea, QTextEdit, QLineEdit
 from PySide6.QtGui import QPixmap
-from PySide6.QtCore import Qt
+from PySide6.QtCore import Qt, QSize, QObject, QRunnable, QThreadPool, Signal
 
-from imgdescgenlib.image import Image
+from gui.exiftool import ExifTool, ExifToolError
+from gui.thumbnailloader import ThumbnailLoader
+from gui.tracing import tracer
 
 class ImageDetailsWidget(QWidget):
+    class MetadataTask(QRunnable):
+        class Emitter(QObject):
+            finished = Signal(str, dict)
+
+        def __init__(self, emitter, exiftool: ExifTool, image_fullpath: str):
+            super().__init__()
+            self._emitter = emitter
+            self._exiftool = exiftool
+            self._image_fullpath = image_fullpath
+
+        def run(self):
+            try:
+                with tracer.span("details.metadata"):
+                    metadata = self._exiftool.readMetadata([self._image_fullpath], ["EXIF:ImageDescription"])
+            # ValueError for paths ExifTool can't take (newlines)
+            except (ExifToolError, ValueError) as e:
+                metadata = [{"Error": str(e)}]
+            self._emitter.finished.emit(self._image_fullpath, metadata[0] if metadata else {})
+
     MAX_THUMBNAIL_WIDTH = 300
     MAX_THUMBNAIL_HEIGHT = 300
+    THUMBNAIL_PRIORITY = 10 # before grid thumbnails, user waits for this one
 
-    def __init__(self):
+    def __init__(self, thumbnail_loader: ThumbnailLoader, exiftool: ExifTool):
         super().__init__()
 
         self.setMaximumWidth(512)
 
+        self._exiftool = exiftool
+        self._metadata_emitter = ImageDetailsWidget.MetadataTask.Emitter()
+        self._metadata_emitter.finished.connect(self.onMetadataReady)
+
+        self._thumbnail_loader = thumbnail_loader
+        self._thumbnail_loader.thumbnailReady.connect(self.onThumbnailReady)
+
         self._image_fullpath = None
         self._image_desc_box = QGroupBox("Image details")
 
@@ -49,29 +79,61 @@ class ImageDetailsWidget(QWidget):
         main_layout.addWidget(self._image_desc_box)
         self.setLayout(main_layout)
 
+    def thumbnailSize(self) -> int:
+        return max(ImageDetailsWidget.MAX_THUMBNAIL_WIDTH, ImageDetailsWidget.MAX_THUMBNAIL_HEIGHT)
+
     def setImage(self, image_filename: str, image_fullpath: str):
+        if self._image_fullpath:
+            self._thumbnail_loader.cancel(self._image_fullpath, self.thumbnailSize())
+
         self._image_fullpath = image_fullpath
+        self._thumbnail_requested = time.perf_counter()
 
         self._image_filename_label.setText(image_filename)
         self._image_fullpath_label.setText(image_fullpath)
 
-        pixmap = QPixmap(image_fullpath)
-        image_resoulution = pixmap.size()
-        self._image_resolution.setText(f"{image_resoulution.width()} x {image_resoulution.height()}")
-
-        # scale pixmap to fit bounds with keeping aspect ratio
-        scaled_pixmap = pixmap.scaled(
-            ImageDetailsWidget.MAX_THUMBNAIL_WIDTH,
-            ImageDetailsWidget.MAX_THUMBNAIL_HEIGHT,
-            Qt.KeepAspectRatio
-        )
-        self._image_widget.setPixmap(scaled_pixmap)
-
-        image = Image(image_fullpath)
-        metadata = image.read_metadata()
-
-        if "EXIF:ImageDescription" in metadata[0]:
-            self._image_exif_description.setText(metadata[0]["EXIF:ImageDescription"])
+        # thumbnail is decoded in the background, onThumbnailReady() shows it
+        self._image_widget.clear()
+        self._image_resolution.setText("Loading...")
+        cached = self._thumbnail_loader.request(image_fullpath, self.thumbnailSize(), ImageDetailsWidget.THUMBNAIL_PRIORITY)
+        if cached:
+            self.showThumbnail(*cached)
+
+        # metadata is read by the shared ExifTool process, in the background
+        self._image_exif_description.setText("Loading...")
+        task = ImageDetailsWidget.MetadataTask(self._metadata_emitter, self._exiftool, image_fullpath)
+        QThreadPool.globalInstance().start(task)
+
+    def onMetadataReady(self, image_fullpath: str, metadata: dict):
+        if image_fullpath != self._image_fullpath:
+            return
+
+        if "Error" in metadata:
+            self._image_exif_description.setText(f"Failed to read metadata: {metadata['Error']}")
+        else:
+            self._image_exif_description.setText(metadata.get("EXIF:ImageDescription", "(null)"))
+
+    def onThumbnailReady(self, image_fullpath: str, size: int, pixmap: QPixmap, original_size: QSize):
+        if image_fullpath == self._image_fullpath and size == self.thumbnailSize():
+            # from selecting the image to showing its thumbnail
+            tracer.addSpan("details.thumbnail", self._thumbnail_requested, time.perf_counter() - self._thumbnail_requested)
+            self.showThumbnail(pixmap, original_size)
+
+    def showThumbnail(self, pixmap: QPixmap, original_size: QSize):
+        if pixmap.isNull():
+            self._image_resolution.setText("Failed to load image")
+            return
+
+        self._image_resolution.setText(f"{original_size.width()} x {original_size.height()}")
+
+        # thumbnail fits bounds already, scale only if bounds are not square
+        if pixmap.width() > ImageDetailsWidget.MAX_THUMBNAIL_WIDTH or pixmap.height() > ImageDetailsWidget.MAX_THUMBNAIL_HEIGHT:
+            pixmap = pixmap.scaled(
+                ImageDetailsWidget.MAX_THUMBNAIL_WIDTH,
+                ImageDetailsWidget.MAX_THUMBNAIL_HEIGHT,
+                Qt.KeepAspectRatio
+            )
+        self._image_widget.setPixmap(pixmap)
 
     def getImageFullpath(self):
         return self._image_fullpath
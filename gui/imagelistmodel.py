@@ -0,0 +1,180 @@
+import os
+from PySide6.QtCore import QAbstractListModel, QModelIndex, Qt, Signal
+from PySide6.QtGui import QBrush, QColor
+
+from gui.selectionstore import SelectionStore
+
+class ImageListModel(QAbstractListModel):
+    """
+    List model for image paths.
+    Rows are stored as plain path strings, so no per-row Qt objects are created
+    and views only query rows they actually paint.
+    If selection store is given, rows are checkable and their check state is looked up in the store.
+    """
+    # emitted when the user toggles a checkbox in the view, the store itself is not changed
+    checkStateChanged = Signal(str, bool)
+
+    # whether the image already has EXIF:ImageDescription, one byte per row
+    DescriptionStatusRole = Qt.ItemDataRole.UserRole + 1
+    STATUS_UNKNOWN = 0
+    STATUS_DESCRIBED = 1
+    STATUS_UNDESCRIBED = 2
+
+    def __init__(self, selection: SelectionStore | None = None, show_filename: bool = True, parent=None):
+        super().__init__(parent)
+
+        self._selection = selection
+        self._show_filename = show_filename
+        self._paths: list[str] = []
+        self._statuses = bytearray()
+        self._rows: dict[str, int] = {} # path -> row
+
+        if self._selection:
+            self._selection.imagesSelected.connect(self.onSelectionChanged)
+            self._selection.imagesDeselected.connect(self.onSelectionChanged)
+
+    def rowCount(self, parent=QModelIndex()) -> int:
+        if parent.isValid():
+            return 0
+        return len(self._paths)
+
+    def flags(self, index):
+        if not index.isValid():
+            return Qt.ItemFlag.NoItemFlags
+
+        flags = Qt.ItemFlag.ItemIsEnabled | Qt.ItemFlag.ItemIsSelectable
+        if self._selection:
+            flags |= Qt.ItemFlag.ItemIsUserCheckable
+        return flags
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+
+        row = index.row()
+        if role == Qt.ItemDataRole.DisplayRole:
+            path = self._paths[row]
+            # basename is computed on demand, only for painted rows
+            return os.path.basename(path) if self._show_filename else path
+        if role == Qt.ItemDataRole.UserRole:
+            return self._paths[row]
+        if role == Qt.ItemDataRole.ToolTipRole:
+            if self._statuses[row] == ImageListModel.STATUS_DESCRIBED:
+                return f"{self._paths[row]}\nAlready has a description"
+            return self._paths[row]
+        if role == Qt.ItemDataRole.ForegroundRole and self._statuses[row] == ImageListModel.STATUS_DESCRIBED:
+            return QBrush(QColor(Qt.GlobalColor.darkGreen))
+        if role == ImageListModel.DescriptionStatusRole:
+            return self._statuses[row]
+        if role == Qt.ItemDataRole.CheckStateRole and self._selection:
+            return Qt.CheckState.Checked if self._selection.contains(self._paths[row]) else Qt.CheckState.Unchecked
+
+        return None
+
+    def setData(self, index, value, role=Qt.ItemDataRole.EditRole) -> bool:
+        if not index.isValid() or role != Qt.ItemDataRole.CheckStateRole or not self._selection:
+            return False
+
+        path = self._paths[index.row()]
+        checked = Qt.CheckState(value) == Qt.CheckState.Checked
+        if self._selection.contains(path) != checked:
+            self.checkStateChanged.emit(path, checked)
+        return True
+
+    def onSelectionChanged(self, paths: list[str]):
+        rows = [self._rows[path] for path in paths if path in self._rows]
+        if rows:
+            # one notification covering all affected rows
+            self.dataChanged.emit(self.index(min(rows)), self.index(max(rows)), [Qt.ItemDataRole.CheckStateRole])
+
+    def setImages(self, paths: list[str]):
+        self.beginResetModel()
+        self._paths = list(paths)
+        self._statuses = bytearray(len(self._paths))
+        self._rows = {path: row for row, path in enumerate(self._paths)}
+        self.endResetModel()
+
+    def appendImages(self, paths: list[str]):
+        paths = [path for path in paths if path not in self._rows]
+        if not paths:
+            return
+
+        first = len(self._paths)
+        self.beginInsertRows(QModelIndex(), first, first + len(paths) - 1)
+        for row, path in enumerate(paths, first):
+            self._paths.append(path)
+            self._rows[path] = row
+        self._statuses.extend(bytes(len(paths)))
+        self.endInsertRows()
+
+    def removeRows(self, row: int, count: int, parent=QModelIndex()) -> bool:
+        if parent.isValid() or row < 0 or count <= 0 or row + count > len(self._paths):
+            return False
+
+        self.beginRemoveRows(parent, row, row + count - 1)
+        for path in self._paths[row:row + count]:
+            del self._rows[path]
+        del self._paths[row:row + count]
+        del self._statuses[row:row + count]
+        # shift row index of the following paths
+        for i in range(row, len(self._paths)):
+            self._rows[self._paths[i]] = i
+        self.endRemoveRows()
+        return True
+
+    def removeImages(self, paths: list[str]):
+        rows = sorted({self._rows[path] for path in paths if path in self._rows}, reverse=True)
+        if not rows:
+            return
+
+        # remove contiguous ranges from the end, then reindex once
+        end = 0
+        while end < len(rows):
+            start = end
+            while end + 1 < len(rows) and rows[end + 1] == rows[end] - 1:
+                end += 1
+
+            first, last = rows[end], rows[start]
+            self.beginRemoveRows(QModelIndex(), first, last)
+            for path in self._paths[first:last + 1]:
+                del self._rows[path]
+            del self._paths[first:last + 1]
+            del self._statuses[first:last + 1]
+            self.endRemoveRows()
+            end += 1
+
+        for i in range(rows[-1], len(self._paths)):
+            self._rows[self._paths[i]] = i
+
+    def clear(self):
+        self.setImages([])
+
+    def path(self, row: int) -> str:
+        return self._paths[row]
+
+    def paths(self, statuses: tuple[int, ...] | None = None) -> list[str]:
+        """
+        Return all paths, or only paths with one of the given description statuses.
+        """
+        if statuses is None:
+            return list(self._paths)
+        return [path for path, status in zip(self._paths, self._statuses) if status in statuses]
+
+    def setDescriptionStatuses(self, statuses: dict[str, bool]):
+        rows = []
+        for path, described in statuses.items():
+            row = self._rows.get(path)
+            if row is not None:
+                self._statuses[row] = ImageListModel.STATUS_DESCRIBED if described else ImageListModel.STATUS_UNDESCRIBED
+                rows.append(row)
+
+        if rows:
+            self.dataChanged.emit(self.index(min(rows)), self.index(max(rows)), [
+                ImageListModel.DescriptionStatusRole, Qt.ItemDataRole.ForegroundRole, Qt.ItemDataRole.ToolTipRole
+            ])
+
+    def rowOf(self, path: str) -> int:
+        return self._rows.get(path, -1)
+
+    def contains(self, path: str) -> bool:
+        return path in self._rows
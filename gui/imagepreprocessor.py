@@ -0,0 +1,35 @@
+from PySide6.QtCore import Qt
+from PySide6.QtGui import QImageReader, QImageWriter
+
+from gui.tracing import tracer
+
+def downscale_image(path: str, destination: str, max_edge: int, quality: int) -> bool:
+    """
+    Write a JPEG copy of the image with the longer edge scaled down to max_edge.
+    Returns False without writing anything if the image is already small enough to be sent as is.
+    Uses only QImageReader/QImageWriter, so it can run in worker threads.
+    """
+    with tracer.span("preprocess.downscale"):
+        return scale_image(path, destination, max_edge, quality)
+
+def scale_image(path: str, destination: str, max_edge: int, quality: int) -> bool:
+    reader = QImageReader(path)
+    reader.setAutoTransform(True)
+    size = reader.size()
+    if not size.isValid():
+        raise OSError(f"Failed to read {path}: {reader.errorString()}")
+
+    if max(size.width(), size.height()) <= max_edge:
+        return False
+
+    # decoder scales while reading, full resolution image is never held in memory
+    reader.setScaledSize(size.scaled(max_edge, max_edge, Qt.AspectRatioMode.KeepAspectRatio))
+    image = reader.read()
+    if image.isNull():
+        raise OSError(f"Failed to read {path}: {reader.errorString()}")
+
+    writer = QImageWriter(destination, b"jpeg")
+    writer.setQuality(quality)
+    if not writer.write(image):
+        raise OSError(f"Failed to write {destination}: {writer.errorString()}")
+    return True
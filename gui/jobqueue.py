@@ -0,0 +1,302 @@
+import os
+import time
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+class JobQueue():
+    """
+    Durable queue of generation jobs in SQLite, one row per image with state, attempts, lease and result.
+    A batch keeps the config it was submitted with, so workers in other processes or on other hosts
+    generate with the same settings. Workers claim a few jobs of the oldest batch at a time and hold
+    a lease on them, which they keep renewing. Jobs of a worker that crashed or lost the database
+    are claimed again when the lease expires, after MAX_ATTEMPTS claims they're failed.
+    Rollback journal is used instead of WAL, which doesn't work when the file is shared over network.
+    """
+    DEFAULT_PATH = "cache/jobs.sqlite3"
+    LEASE_SECONDS = 120
+    MAX_ATTEMPTS = 3
+    BATCH_TTL_SECONDS = 7 * 24 * 60 * 60 # finished batches are pruned after a week
+
+    STATE_QUEUED = "queued"
+    STATE_RUNNING = "running"
+    STATE_DONE = "done"
+    STATE_SKIPPED = "skipped" # already done in the output directory
+    STATE_FAILED = "failed"
+    STATE_CANCELLED = "cancelled"
+    STATES = [STATE_QUEUED, STATE_RUNNING, STATE_DONE, STATE_SKIPPED, STATE_FAILED, STATE_CANCELLED]
+    FINISHED_STATES = [STATE_DONE, STATE_SKIPPED, STATE_FAILED, STATE_CANCELLED]
+
+    def __init__(self, path: str = DEFAULT_PATH):
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        # transactions are started explicitly, claims take the write lock up front
+        self._connection = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        with self.transaction() as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS batches ("
+                "id INTEGER PRIMARY KEY, config TEXT NOT NULL, claim_size INTEGER NOT NULL, "
+                "cancelled INTEGER NOT NULL DEFAULT 0, created_at REAL NOT NULL)"
+            )
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id INTEGER PRIMARY KEY, batch_id INTEGER NOT NULL, path TEXT NOT NULL, state TEXT NOT NULL, "
+                "attempts INTEGER NOT NULL DEFAULT 0, lease_owner TEXT, lease_expires REAL, result TEXT, updated_at REAL NOT NULL)"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS jobs_batch_state ON jobs (batch_id, state, id)")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS log ("
+                "id INTEGER PRIMARY KEY, batch_id INTEGER NOT NULL, time REAL NOT NULL, worker TEXT NOT NULL, "
+                "logger TEXT NOT NULL, level INTEGER NOT NULL, message TEXT NOT NULL)"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS log_batch ON log (batch_id, id)")
+            # tracer spans of workers, start is wall clock time
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS spans ("
+                "id INTEGER PRIMARY KEY, batch_id INTEGER NOT NULL, worker TEXT NOT NULL, pid INTEGER NOT NULL, tid INTEGER NOT NULL, "
+                "name TEXT NOT NULL, start REAL NOT NULL, duration REAL NOT NULL, args TEXT)"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS spans_batch ON spans (batch_id, id)")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS rate_limits ("
+                "name TEXT PRIMARY KEY, tokens REAL NOT NULL DEFAULT 0, updated REAL NOT NULL, paused_until REAL NOT NULL DEFAULT 0)"
+            )
+
+    @contextmanager
+    def transaction(self):
+        with self._lock:
+            self._connection.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._connection
+            except BaseException:
+                self._connection.execute("ROLLBACK")
+                raise
+            self._connection.execute("COMMIT")
+
+    def submit(self, images: list[str], config_json: str, claim_size: int, failed: dict[str, str] | None = None) -> int:
+        """
+        Add a batch of images generated with the config (ImgDescGenConfigSchema JSON), return its id.
+        Workers claim at most claim_size jobs of it at a time. Images in failed (path -> error)
+        are added as failed jobs right away.
+        """
+        failed = failed or {}
+        now = time.time()
+        with self.transaction() as connection:
+            self.prune(connection, now)
+            batch_id = connection.execute(
+                "INSERT INTO batches (config, claim_size, created_at) VALUES (?, ?, ?)", (config_json, max(1, claim_size), now)
+            ).lastrowid
+            connection.executemany(
+                "INSERT INTO jobs (batch_id, path, state, result, updated_at) VALUES (?, ?, ?, ?, ?)",
+                [
+                    (batch_id, path, JobQueue.STATE_FAILED, failed[path], now) if path in failed else (batch_id, path, JobQueue.STATE_QUEUED, None, now)
+                    for path in images
+                ]
+            )
+        return batch_id
+
+    def prune(self, connection, now: float):
+        # batches with nothing left to do, not touched for BATCH_TTL_SECONDS
+        old_batches = [row[0] for row in connection.execute(
+            "SELECT id FROM batches WHERE created_at < ? AND NOT EXISTS ("
+            "SELECT 1 FROM jobs WHERE jobs.batch_id = batches.id AND (state IN (?, ?) OR updated_at >= ?))",
+            (now - JobQueue.BATCH_TTL_SECONDS, JobQueue.STATE_QUEUED, JobQueue.STATE_RUNNING, now - JobQueue.BATCH_TTL_SECONDS)
+        )]
+        for table, column in (("log", "batch_id"), ("spans", "batch_id"), ("jobs", "batch_id"), ("batches", "id")):
+            connection.executemany(f"DELETE FROM {table} WHERE {column} = ?", [(batch_id,) for batch_id in old_batches])
+
+    def expireLeases(self, connection, now: float):
+        # jobs of workers that stopped renewing their lease and won't be claimed again:
+        # claimed too many times or of a cancelled batch, the rest is claimed by other workers
+        connection.execute(
+            "UPDATE jobs SET state = ?, result = ?, lease_owner = NULL, lease_expires = NULL, updated_at = ? "
+            "WHERE state = ? AND lease_expires < ? AND attempts >= ?",
+            (JobQueue.STATE_FAILED, "Worker stopped while processing the image", now,
+             JobQueue.STATE_RUNNING, now, JobQueue.MAX_ATTEMPTS)
+        )
+        connection.execute(
+            "UPDATE jobs SET state = ?, lease_owner = NULL, lease_expires = NULL, updated_at = ? "
+            "WHERE state = ? AND lease_expires < ? AND batch_id IN (SELECT id FROM batches WHERE cancelled = 1)",
+            (JobQueue.STATE_CANCELLED, now, JobQueue.STATE_RUNNING, now)
+        )
+
+    def recoverExpired(self):
+        """
+        Finish jobs with an expired lease that no worker would claim again, see expireLeases().
+        """
+        with self.transaction() as connection:
+            self.expireLeases(connection, time.time())
+
+    def claim(self, worker: str) -> tuple[int, str, dict[int, str]] | None:
+        """
+        Lease jobs of the oldest batch that has any left, return (batch id, config JSON, job id -> image path),
+        None if there is nothing to do.
+        """
+        now = time.time()
+        with self.transaction() as connection:
+            self.expireLeases(connection, now)
+
+            row = connection.execute(
+                "SELECT batches.id, batches.config, batches.claim_size FROM batches WHERE cancelled = 0 AND EXISTS ("
+                "SELECT 1 FROM jobs WHERE jobs.batch_id = batches.id AND (state = ? OR (state = ? AND lease_expires < ?))) "
+                "ORDER BY batches.id LIMIT 1",
+                (JobQueue.STATE_QUEUED, JobQueue.STATE_RUNNING, now)
+            ).fetchone()
+            if row is None:
+                return None
+
+            batch_id, config_json, claim_size = row
+            jobs = dict(connection.execute(
+                "SELECT id, path FROM jobs WHERE batch_id = ? AND (state = ? OR (state = ? AND lease_expires < ?)) ORDER BY id LIMIT ?",
+                (batch_id, JobQueue.STATE_QUEUED, JobQueue.STATE_RUNNING, now, claim_size)
+            ).fetchall())
+            connection.executemany(
+                "UPDATE jobs SET state = ?, attempts = attempts + 1, lease_owner = ?, lease_expires = ?, updated_at = ? WHERE id = ?",
+                [(JobQueue.STATE_RUNNING, worker, now + JobQueue.LEASE_SECONDS, now, job_id) for job_id in jobs]
+            )
+        return batch_id, config_json, jobs
+
+    def heartbeat(self, worker: str, batch_id: int, job_ids: list[int],
+                  finished: dict[int, tuple[str, str | None]], log_records: list[tuple], spans: list[tuple] | None = None) -> bool:
+        """
+        Record finished jobs of the worker (job id -> (state, result)), its log records
+        (time, logger, level, message) and tracer spans (pid, tid, name, start, duration, args JSON),
+        extend the lease of its other jobs.
+        Results of jobs the worker lost the lease on are dropped. Returns True if the batch was cancelled.
+        """
+        now = time.time()
+        with self.transaction() as connection:
+            connection.executemany(
+                "UPDATE jobs SET state = ?, result = ?, lease_owner = NULL, lease_expires = NULL, updated_at = ? "
+                "WHERE id = ? AND state = ? AND lease_owner = ?",
+                [(state, result, now, job_id, JobQueue.STATE_RUNNING, worker) for job_id, (state, result) in finished.items()]
+            )
+            connection.executemany(
+                "UPDATE jobs SET lease_expires = ? WHERE id = ? AND state = ? AND lease_owner = ?",
+                [(now + JobQueue.LEASE_SECONDS, job_id, JobQueue.STATE_RUNNING, worker) for job_id in job_ids]
+            )
+            connection.executemany(
+                "INSERT INTO log (batch_id, time, worker, logger, level, message) VALUES (?, ?, ?, ?, ?, ?)",
+                [(batch_id, record_time, worker, logger, level, message) for record_time, logger, level, message in log_records]
+            )
+            connection.executemany(
+                "INSERT INTO spans (batch_id, worker, pid, tid, name, start, duration, args) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [(batch_id, worker, *span) for span in spans or []]
+            )
+            row = connection.execute("SELECT cancelled FROM batches WHERE id = ?", (batch_id,)).fetchone()
+        return row is None or bool(row[0])
+
+    def release(self, worker: str, job_ids: list[int]):
+        """
+        Put jobs the worker didn't get to back into the queue, it doesn't count as an attempt.
+        """
+        with self.transaction() as connection:
+            connection.executemany(
+                "UPDATE jobs SET state = ?, attempts = attempts - 1, lease_owner = NULL, lease_expires = NULL, updated_at = ? "
+                "WHERE id = ? AND state = ? AND lease_owner = ?",
+                [(JobQueue.STATE_QUEUED, time.time(), job_id, JobQueue.STATE_RUNNING, worker) for job_id in job_ids]
+            )
+
+    def cancel(self, batch_id: int):
+        """
+        Cancel queued jobs of the batch, workers stop the running ones after requests in flight finish.
+        """
+        with self.transaction() as connection:
+            connection.execute("UPDATE batches SET cancelled = 1 WHERE id = ?", (batch_id,))
+            connection.execute(
+                "UPDATE jobs SET state = ?, updated_at = ? WHERE batch_id = ? AND state = ?",
+                (JobQueue.STATE_CANCELLED, time.time(), batch_id, JobQueue.STATE_QUEUED)
+            )
+
+    def takeRateTokens(self, scope: str, buckets: list[tuple[str, float, float, float]]) -> float:
+        """
+        Take amounts from rate limit buckets shared by all workers: (name, rate per minute, capacity, amount),
+        refilled at the rate given by the caller. Returns 0 if all were taken, otherwise seconds to wait
+        (also while requests of the scope are paused) and nothing is taken.
+        """
+        now = time.time()
+        with self.transaction() as connection:
+            row = connection.execute("SELECT paused_until FROM rate_limits WHERE name = ?", (scope,)).fetchone()
+            wait = row[0] - now if row is not None else 0.0
+
+            levels = {}
+            for name, rate, capacity, amount in buckets:
+                row = connection.execute("SELECT tokens, updated FROM rate_limits WHERE name = ?", (name,)).fetchone()
+                tokens, updated = row if row is not None else (capacity, now)
+                levels[name] = min(capacity, tokens + max(0.0, now - updated) * rate / 60)
+                # amounts bigger than capacity are allowed once the bucket is full
+                missing = min(amount, capacity) - levels[name]
+                if missing > 0:
+                    wait = max(wait, missing * 60 / rate)
+
+            if wait <= 0:
+                for name, _, _, amount in buckets:
+                    levels[name] -= amount
+            connection.executemany(
+                "INSERT INTO rate_limits (name, tokens, updated) VALUES (?, ?, ?) "
+                "ON CONFLICT (name) DO UPDATE SET tokens = excluded.tokens, updated = excluded.updated",
+                [(name, tokens, now) for name, tokens in levels.items()]
+            )
+        return max(0.0, wait)
+
+    def pauseRateLimits(self, scope: str, until: float):
+        """
+        Pause requests of all workers in the scope until the time (time.time()), after a rate limit response.
+        """
+        with self.transaction() as connection:
+            connection.execute(
+                "INSERT INTO rate_limits (name, updated, paused_until) VALUES (?, ?, ?) "
+                "ON CONFLICT (name) DO UPDATE SET paused_until = MAX(paused_until, excluded.paused_until)",
+                (scope, time.time(), until)
+            )
+
+    def counts(self, batch_id: int) -> dict[str, int]:
+        counts = dict.fromkeys(JobQueue.STATES, 0)
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT state, COUNT(*) FROM jobs WHERE batch_id = ? GROUP BY state", (batch_id,)
+            ).fetchall()
+        counts.update(rows)
+        return counts
+
+    def logRecords(self, batch_id: int, after_id: int = 0, limit: int = 1000) -> list[tuple]:
+        """
+        Log records of the batch newer than after_id: (id, time, worker, logger, level, message).
+        """
+        with self._lock:
+            return self._connection.execute(
+                "SELECT id, time, worker, logger, level, message FROM log WHERE batch_id = ? AND id > ? ORDER BY id LIMIT ?",
+                (batch_id, after_id, limit)
+            ).fetchall()
+
+    def spanRecords(self, batch_id: int, after_id: int = 0, limit: int = 10000) -> list[tuple]:
+        """
+        Tracer spans of the batch newer than after_id: (id, worker, pid, tid, name, start, duration, args JSON).
+        """
+        with self._lock:
+            return self._connection.execute(
+                "SELECT id, worker, pid, tid, name, start, duration, args FROM spans WHERE batch_id = ? AND id > ? ORDER BY id LIMIT ?",
+                (batch_id, after_id, limit)
+            ).fetchall()
+
+    def expiredLeaseCount(self, batch_id: int) -> int:
+        # running jobs of workers that stopped renewing their lease, e.g. after a crash
+        with self._lock:
+            return self._connection.execute(
+                "SELECT COUNT(*) FROM jobs WHERE batch_id = ? AND state = ? AND lease_expires < ?",
+                (batch_id, JobQueue.STATE_RUNNING, time.time())
+            ).fetchone()[0]
+
+    def activeWorkers(self) -> list[str]:
+        # workers holding a valid lease, idle workers aren't known to the queue
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT DISTINCT lease_owner FROM jobs WHERE state = ? AND lease_expires >= ?",
+                (JobQueue.STATE_RUNNING, time.time())
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
@@ -1,23 +1,44 @@
 import os
-from PySide6.QtCore import QFileInfo, QDir, Qt
+import time
+import fnmatch
+from PySide6.QtCore import QFileInfo, Qt, QModelIndex, QPersistentModelIndex, QSortFilterProxyModel, QTimer, Signal
 from PySide6.QtGui import QIcon, QKeySequence, QAction
 from PySide6.QtWidgets import (QApplication, QFileDialog, QMainWindow, 
-                               QMessageBox, QListWidget, QListWidgetItem, QHBoxLayout, QVBoxLayout, QWidget,
-                               QPushButton, QGroupBox, QLabel, QLineEdit, QMenu, QFormLayout)
-
-from gui.imagedetails import ImageDetailsWidget
+                               QMessageBox, QListView, QHBoxLayout, QVBoxLayout, QWidget,
+                               QPushButton, QGroupBox, QLabel, QLineEdit, QMenu, QFormLayout, QCheckBox,
+                               QInputDialog, QStackedWidget, QComboBox)
+
+from gui.configsaver import ConfigSaver
+from gui.descriptionstatusloader import DescriptionStatusLoader
+from gui.directoryscanner import DirectoryScanner
+from gui.exiftool import ExifTool
+from gui.imagelistmodel import ImageListModel
 from gui.schemas.config import ImgDescGenConfig
-from gui.settingsdialog import SettingsDialog
-from gui.generationwindow import GenerationWindow
+from gui.selectionstore import SelectionStore
+from gui.thumbnailgridview import ThumbnailGridView
+from gui.thumbnailloader import ThumbnailLoader
+from gui.tracing import tracer
+# settings, generation, image details and stats windows are imported on first use, they pull in
+# the chatbot library and aren't needed to show the main window
 
 class MainWindow(QMainWindow):
     CONFIG_FILENAME = "config.json"
+    INITIAL_LOAD_FALLBACK_MS = 500
+
+    firstPainted = Signal()
+    initialLoadFinished = Signal() # selection restored and saved input directory listed
 
     def __init__(self):
         super(MainWindow, self).__init__()
 
         self._image_details_widget = None
         self._generation_window = None
+        self._stats_window = None
+        self._model_list_loader = None
+        self._scan_started = None
+        self._initial_load_scheduled = False
+        self._initial_scan_pending = False
+        self._first_painted = False
 
         self.setWindowIcon(QIcon("gui/icon_1024.png"))
 
@@ -34,6 +55,25 @@ class MainWindow(QMainWindow):
         self.setWindowTitle("Image description generator")
 
         self._config = ImgDescGenConfig(MainWindow.CONFIG_FILENAME)
+        self._config_saver = ConfigSaver(self._config, self)
+        self._config_saver.aboutToSave.connect(self.onAboutToSaveConfig)
+        self._config_saver.saveFailed.connect(self.onConfigSaveFailed)
+        self._selection = SelectionStore(self)
+        self._selection_changed = False
+
+        self._thumbnail_loader = ThumbnailLoader(self)
+
+        # one ExifTool session for the whole application
+        self._exiftool = ExifTool(self._config.getSchema().exiftool_path)
+        QApplication.instance().aboutToQuit.connect(self._exiftool.close)
+
+        self._description_status_loader = DescriptionStatusLoader(self._exiftool, self)
+        self._description_status_loader.statusesReady.connect(self.onDescriptionStatusesReady)
+
+        self._directory_scanner = DirectoryScanner(self)
+        self._directory_scanner.imagesAdded.connect(self.onImagesAdded)
+        self._directory_scanner.imagesRemoved.connect(self.onImagesRemoved)
+        self._directory_scanner.scanFinished.connect(self.onScanFinished)
 
         self.createFooterButtons()
         self.createImageLists()
@@ -41,37 +81,126 @@ class MainWindow(QMainWindow):
         self.createMenus()
         self.createStatusBar()
 
+    def showEvent(self, event):
+        super().showEvent(event)
+        # in case the first paint isn't delivered to the main window itself
+        QTimer.singleShot(MainWindow.INITIAL_LOAD_FALLBACK_MS, self.scheduleInitialLoad)
+
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        # emitted even if the fallback timer scheduled the initial load first
+        if not self._first_painted:
+            self._first_painted = True
+            self.firstPainted.emit()
+        self.scheduleInitialLoad()
+
+    def scheduleInitialLoad(self):
+        # window is on screen first, saved selection and input directory are loaded in the next event loop iteration
+        if not self._initial_load_scheduled:
+            self._initial_load_scheduled = True
+            QTimer.singleShot(0, self.loadInitialState)
+
+    def loadInitialState(self):
         self.restoreSelectedImages()
+
+        input_dir = self._config.getSchema().input_dir
+        if input_dir:
+            self._initial_scan_pending = True
+            self.fillImageList(input_dir)
+        else:
+            self.initialLoadFinished.emit()
+
+    def closeEvent(self, event):
+        self._directory_scanner.stop()
+        self._thumbnail_loader.stop()
+        self._description_status_loader.stop()
+        if self._model_list_loader:
+            self._model_list_loader.stop()
+        self._config_saver.flush()
+        event.accept()
     
     def saveConfig(self):
-        if self._config.saveConfig(MainWindow.CONFIG_FILENAME) == False:
-            QMessageBox.critical(self, self.tr("Error"), self.tr("Failed to save configuration"))
-
-    def createImageItem(self, filename: str, fullpath: str, flag: Qt.ItemFlag):
-        item = QListWidgetItem(filename if filename else fullpath)
-        item.setFlags(flag)
-        if filename:
-            item.setData(Qt.ItemDataRole.UserRole, fullpath)
-        return item
+        # written later in one go, see ConfigSaver
+        self._config_saver.scheduleSave()
+
+    def onAboutToSaveConfig(self):
+        # selected image list is copied into the schema only when it's really written
+        if self._selection_changed:
+            self._config.getSchema().selected_images = self._selection.paths()
+            self._config.markDirty()
+            self._selection_changed = False
+
+    def onConfigSaveFailed(self):
+        QMessageBox.critical(self, self.tr("Error"), self.tr("Failed to save configuration"))
+
+    def createImageListView(self, model) -> QListView:
+        view = QListView()
+        view.setModel(model)
+        # all rows have the same height, so the view doesn't need to measure every row
+        view.setUniformItemSizes(True)
+        view.setLayoutMode(QListView.LayoutMode.Batched)
+        return view
 
     def fillImageList(self, dir):
-        self.image_list_widget.clear()
+        # images are streamed to onImagesAdded() by the background scanner
+        self.image_list_model.clear()
+        self.image_count_label.setText("0")
+        self._description_status_loader.reset()
+
+        self.statusBar().showMessage("Scanning directory...")
+        self._scan_started = time.perf_counter()
+        self._directory_scanner.scan(dir, self._config.getSchema().recursive_scan)
+
+    def onImagesAdded(self, images: list[str]):
+        self.image_list_model.appendImages(images)
+        self.image_count_label.setText(str(self.image_list_model.rowCount()))
 
-        directory = QDir(dir)
-        images = directory.entryList(["*.jpg", "*.JPG"], QDir.Files)
-        for image_filename in images:
-            image_fullpath = directory.absoluteFilePath(image_filename)
+        self._description_status_loader.request(images)
 
-            item = self.createImageItem(
-                image_filename, 
-                image_fullpath,
-                Qt.ItemFlag.ItemIsUserCheckable | Qt.ItemFlag.ItemIsEnabled | Qt.ItemFlag.ItemIsSelectable
-            )
-            item.setCheckState(Qt.CheckState.Checked if self.getSelectedImage(image_fullpath) else Qt.CheckState.Unchecked)
+    def onDescriptionStatusesReady(self, statuses: dict):
+        self.image_list_model.setDescriptionStatuses(statuses)
 
-            self.image_list_widget.addItem(item)
+    def onStatusFilterChanged(self, index: int):
+        statuses = self._status_filter_combobox.itemData(index)
+        # filter on the string form of the status role value
+        pattern = "^(" + "|".join(str(status) for status in statuses) + ")$" if statuses else ""
+        self.image_list_proxy_model.setFilterRegularExpression(pattern)
 
-        self.image_count_label.setText(str(self.image_list_widget.count()))
+    def getVisibleImages(self) -> list[str]:
+        return self.image_list_model.paths(self._status_filter_combobox.currentData())
+
+    def onImagesRemoved(self, images: list[str]):
+        self.image_list_model.removeImages(images)
+        for image_fullpath in images:
+            self._thumbnail_loader.invalidate(image_fullpath)
+        self.image_count_label.setText(str(self.image_list_model.rowCount()))
+
+    def onScanFinished(self):
+        self.statusBar().showMessage("Ready")
+
+        # from choosing the directory until the whole list is filled
+        if self._scan_started is not None:
+            tracer.addSpan("mainwindow.fill_image_list", self._scan_started, time.perf_counter() - self._scan_started,
+                           {"images": self.image_list_model.rowCount()})
+            self._scan_started = None
+
+        if self._initial_scan_pending:
+            self._initial_scan_pending = False
+            self.initialLoadFinished.emit()
+
+    def onThumbnailGridToggled(self, checked: bool):
+        self._config.getSchema().thumbnail_grid = checked
+        self.saveConfig()
+
+        self._image_views.setCurrentWidget(self.image_grid_view if checked else self.image_list_view)
+
+    def onRecursiveScanToggled(self, checked: bool):
+        self._config.getSchema().recursive_scan = checked
+        self.saveConfig()
+
+        input_dir = self._config.getSchema().input_dir
+        if input_dir:
+            self.fillImageList(input_dir)
 
     def selectImageDirectory(self):
         dir = QFileDialog.getExistingDirectory(self)
@@ -86,84 +215,96 @@ class MainWindow(QMainWindow):
         self.fillImageList(dir)
 
     def setImagesCheckState(self, state: Qt.CheckState):
-        for i in range(self.image_list_widget.count()):
-            item = self.image_list_widget.item(i)
-            item.setCheckState(state)
-
-    def imageClicked(self, item: QListWidgetItem):        
-        if item.isSelected():
-            image_filename = item.text()
-            image_fullpath = item.data(Qt.ItemDataRole.UserRole)
-            if image_fullpath == None:
-                image_fullpath = item.text()
-                image_filename = os.path.basename(image_fullpath)
+        # check or uncheck every shown image of the input list in one operation
+        if state == Qt.CheckState.Checked:
+            self.selectImages(self.getVisibleImages())
+        else:
+            self.deselectImages(self.getVisibleImages())
+
+    def imageClicked(self, index: QModelIndex):
+        if index.isValid():
+            image_fullpath = index.data(Qt.ItemDataRole.UserRole)
+            image_filename = os.path.basename(image_fullpath)
 
             self.createImageDetails(image_filename, image_fullpath)
 
-    def getSelectedImage(self, image_fullpath: str) -> QListWidgetItem | None:
-        for i in range(self.selected_image_list_widget.count()):
-            item = self.selected_image_list_widget.item(i)
-            if image_fullpath == item.text():
-                return item
+    def getSelectedImage(self, image_fullpath: str) -> bool:
+        return self._selection.contains(image_fullpath)
             
     def saveSelectedImages(self):
-        selected_images = []
-        for i in range(self.selected_image_list_widget.count()):
-            item = self.selected_image_list_widget.item(i)
-            selected_images.append(item.text())
-
-        self._config.getSchema().selected_images = selected_images
+        self._selection_changed = True
         self.saveConfig()
 
-    def imageChanged(self, item: QListWidgetItem):
-        if item.checkState() == Qt.CheckState.Checked:
-            if self.canSelectImage() == False:
-                item.setCheckState(Qt.CheckState.Unchecked)
-                return
-
-            image_fullpath = item.data(Qt.ItemDataRole.UserRole)
-            self.addSelectedImage(image_fullpath)
-        elif item.checkState() == Qt.CheckState.Unchecked:
-            image_item = self.getSelectedImage(item.data(Qt.ItemDataRole.UserRole))
-            if image_item:
-                self.removeSelectedItem(image_item)
-
-        self.saveSelectedImages()
-
-    def addSelectedImage(self, image_fullpath: str):
-        if self.getSelectedImage(image_fullpath) == None:
-            item = self.createImageItem(
-                None,
-                image_fullpath,
-                Qt.ItemFlag.ItemIsEnabled | Qt.ItemFlag.ItemIsSelectable
-            )
-            self.selected_image_list_widget.addItem(item)
-            self.selected_image_count_label.setText(str(self.selected_image_list_widget.count()))
+    def imageChanged(self, image_fullpath: str, checked: bool):
+        if checked:
+            self.selectImages([image_fullpath])
+        else:
+            self.deselectImages([image_fullpath])
+
+    def selectImages(self, images: list[str]):
+        if self._selection.add(images):
+            self.saveSelectedImages()
+
+    def deselectImages(self, images: list[str]):
+        if self._selection.remove(images):
+            self.saveSelectedImages()
+
+    def invertSelection(self):
+        images = self.getVisibleImages()
+        selected = [image for image in images if self._selection.contains(image)]
+        unselected = [image for image in images if not self._selection.contains(image)]
+
+        removed = self._selection.remove(selected)
+        added = self._selection.add(unselected)
+        if removed or added:
+            self.saveSelectedImages()
+
+    def selectImagesByPattern(self):
+        pattern, ok = QInputDialog.getText(self, "Select by pattern", "Filename pattern (for example IMG_1*.jpg):")
+        if not ok or not pattern:
+            return
+
+        pattern = pattern.lower()
+        self.selectImages([
+            image for image in self.getVisibleImages()
+            if fnmatch.fnmatchcase(os.path.basename(image).lower(), pattern)
+        ])
+
+    def selectOnlyUndescribedImages(self):
+        # replace selection of the input directory with images that have no description yet,
+        # images whose status isn't loaded yet count as undescribed
+        undescribed = self.image_list_model.paths((ImageListModel.STATUS_UNDESCRIBED, ImageListModel.STATUS_UNKNOWN))
+        undescribed_set = set(undescribed)
+        unknown = len(self.image_list_model.paths((ImageListModel.STATUS_UNKNOWN,)))
+        if unknown:
+            self.statusBar().showMessage(f"Description status of {unknown} images is still loading, they were selected as undescribed", 10000)
+
+        removed = self._selection.remove([image for image in self.image_list_model.paths() if image not in undescribed_set])
+        added = self._selection.add(undescribed)
+        if removed or added:
+            self.saveSelectedImages()
+
+    def onImagesSelected(self, images: list[str]):
+        self.selected_image_list_model.appendImages(images)
+        self.selected_image_count_label.setText(str(self.selected_image_list_model.rowCount()))
+
+    def onImagesDeselected(self, images: list[str]):
+        self.selected_image_list_model.removeImages(images)
+        self.selected_image_count_label.setText(str(self.selected_image_list_model.rowCount()))
 
     def restoreSelectedImages(self):
         # restore selected images from the config
+        # selected image may be not in the image list, it's added to the selected image list anyway
         if self._config.getSchema().selected_images == None:
             return
-        
-        for image_fullpath in self._config.getSchema().selected_images:
-            # find the item in the image list widget and set it to checked
-            # it should add also to the selected image list widget (imageChanged() will do that)
-            for i in range(self.image_list_widget.count()):
-                item = self.image_list_widget.item(i)
-                if image_fullpath == item.data(Qt.ItemDataRole.UserRole):
-                    item.setCheckState(Qt.CheckState.Checked)
-                    break
-
-            # if selected image not found in image list, add it to the selected image list manually
-            self.addSelectedImage(image_fullpath)
+
+        self._selection.add(self._config.getSchema().selected_images)
 
     def generateImageDesc(self):
-        image_list = []
-        for i in range(self.selected_image_list_widget.count()):
-            item = self.selected_image_list_widget.item(i)
-            image_list.append(item.text())
+        image_list = self.selected_image_list_model.paths()
 
         if not self._generation_window:
+            from gui.generationwindow import GenerationWindow
             self._generation_window = GenerationWindow(self._config)
         self._generation_window.setWindowModality(Qt.WindowModality.ApplicationModal)
         self._generation_window.show()
@@ -182,54 +323,63 @@ class MainWindow(QMainWindow):
         
         self._output_path_line_edit.setText(dir)
 
+    def openStatsWindow(self):
+        if not self._stats_window:
+            from gui.statswindow import StatsWindow
+            self._stats_window = StatsWindow()
+        self._stats_window.show()
+        self._stats_window.raise_()
+
     def about(self):
         QMessageBox.about(self, "About Application",
                 "The <b>Image description generator application</b> designed to easy use of the <b><a href=\"https://github.com/JusicP/imgdescgen\">imgdescgen</a></b> library "
                 "with using Qt GUI library.")
 
     def openSettingsDialog(self):
-        dlg = SettingsDialog(self._config)
-        dlg.exec()
+        from gui.settingsdialog import SettingsDialog
+        if not self._model_list_loader:
+            from gui.modellistloader import ModelListLoader
+            self._model_list_loader = ModelListLoader(self)
+        dlg = SettingsDialog(self._config, self._model_list_loader)
+        if dlg.exec():
+            self._exiftool.setExecutable(self._config.getSchema().exiftool_path)
 
     def openSelectedImageContextMenu(self, position):
-        item = self.selected_image_list_widget.itemAt(position)
-        if item is None:
+        index = self.selected_image_list_view.indexAt(position)
+        if not index.isValid():
             return
 
+        # row may shift if the list changes while the menu is open
+        persistent_index = QPersistentModelIndex(index)
+
         menu = QMenu(self)
         remove_action = QAction("Remove from list", self)
-        remove_action.triggered.connect(lambda: self.removeSelectedItem(item))
+        remove_action.triggered.connect(lambda: persistent_index.isValid() and self.removeSelectedItem(persistent_index.row()))
         menu.addAction(remove_action)
 
-        menu.exec(self.selected_image_list_widget.viewport().mapToGlobal(position))
-
-    def canSelectImage(self) -> bool:
-        max_image_count = self._config.getSchema().chatbots[self._config.getSchema().chatbot].max_image_count
-        if self.selected_image_list_widget.count() >= max_image_count:
-            QMessageBox.warning(self, "Warning", f"You can select only {max_image_count} images")
-            return False
-        
-        return True
+        menu.exec(self.selected_image_list_view.viewport().mapToGlobal(position))
 
-    def removeSelectedItem(self, item):
-        row = self.selected_image_list_widget.row(item)
-        self.selected_image_list_widget.takeItem(row)
-        self.selected_image_count_label.setText(str(self.selected_image_list_widget.count()))
+    def openImageListContextMenu(self, position):
+        menu = QMenu(self)
+        menu.addAction(self.selectAllAct)
+        menu.addAction(self.selectNoneAct)
+        menu.addAction(self.invertSelectionAct)
+        menu.addAction(self.selectByPatternAct)
+        menu.addAction(self.selectUndescribedAct)
 
-        # uncheck the item in the image list widget, if exists
-        for i in range(self.image_list_widget.count()):
-            image_item = self.image_list_widget.item(i)
-            if image_item.data(Qt.ItemDataRole.UserRole) == item.text():
-                image_item.setCheckState(Qt.CheckState.Unchecked)
-                break
+        menu.exec(self._image_views.currentWidget().viewport().mapToGlobal(position))
 
-        self.saveSelectedImages()
+    def removeSelectedItem(self, row: int):
+        # image list checkbox is unchecked by the selection store notification
+        self.deselectImages([self.selected_image_list_model.path(row)])
 
     def selectedImageListKeyPressEvent(self, event):
         if event.key() == Qt.Key_Delete:
-            item = self.selected_image_list_widget.currentItem()
-            if item:
-                self.removeSelectedItem(item)
+            index = self.selected_image_list_view.currentIndex()
+            if index.isValid():
+                self.removeSelectedItem(index.row())
+        else:
+            QListView.keyPressEvent(self.selected_image_list_view, event)
 
     def createFooterButtons(self):
         layout = QHBoxLayout()
@@ -264,7 +414,8 @@ class MainWindow(QMainWindow):
 
     def createImageDetails(self, image_filename: str, image_fullpath: str):
         if self._image_details_widget == None:
-            self._image_details_widget = ImageDetailsWidget()
+            from gui.imagedetails import ImageDetailsWidget
+            self._image_details_widget = ImageDetailsWidget(self._thumbnail_loader, self._exiftool)
             self.hLayout.addWidget(self._image_details_widget)
 
         # don't set the same image
@@ -296,16 +447,49 @@ class MainWindow(QMainWindow):
         browse_input_directory.setText("Browse")
         input_directory_layout.addWidget(browse_input_directory)
 
-        # create image list
-        self.image_list_widget = QListWidget()
-        self.image_list_widget.itemClicked.connect(self.imageClicked)
-        layout.addWidget(self.image_list_widget)
+        view_options_layout = QHBoxLayout()
+        layout.addLayout(view_options_layout)
+
+        self._recursive_scan_checkbox = QCheckBox("Include subdirectories")
+        self._recursive_scan_checkbox.setChecked(self._config.getSchema().recursive_scan)
+        self._recursive_scan_checkbox.toggled.connect(self.onRecursiveScanToggled)
+        view_options_layout.addWidget(self._recursive_scan_checkbox)
+
+        self._thumbnail_grid_checkbox = QCheckBox("Show thumbnails")
+        self._thumbnail_grid_checkbox.setChecked(self._config.getSchema().thumbnail_grid)
+        self._thumbnail_grid_checkbox.toggled.connect(self.onThumbnailGridToggled)
+        view_options_layout.addWidget(self._thumbnail_grid_checkbox)
+
+        self._status_filter_combobox = QComboBox()
+        self._status_filter_combobox.addItem("All images", None)
+        self._status_filter_combobox.addItem("Undescribed", (ImageListModel.STATUS_UNDESCRIBED,))
+        self._status_filter_combobox.addItem("Already described", (ImageListModel.STATUS_DESCRIBED,))
+        self._status_filter_combobox.currentIndexChanged.connect(self.onStatusFilterChanged)
+        view_options_layout.addWidget(self._status_filter_combobox)
+
+        # create image list, it can be shown as a plain list or as a thumbnail grid
+        self.image_list_model = ImageListModel(self._selection, show_filename=True, parent=self)
+        self.image_list_proxy_model = QSortFilterProxyModel(self)
+        self.image_list_proxy_model.setSourceModel(self.image_list_model)
+        self.image_list_proxy_model.setFilterRole(ImageListModel.DescriptionStatusRole)
+        self.image_list_view = self.createImageListView(self.image_list_proxy_model)
+        self.image_grid_view = ThumbnailGridView(self._thumbnail_loader)
+        self.image_grid_view.setModel(self.image_list_proxy_model)
+
+        self._image_views = QStackedWidget()
+        for view in (self.image_list_view, self.image_grid_view):
+            view.clicked.connect(self.imageClicked)
+            view.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
+            view.customContextMenuRequested.connect(self.openImageListContextMenu)
+            self._image_views.addWidget(view)
+        self._image_views.setCurrentWidget(self.image_grid_view if self._config.getSchema().thumbnail_grid else self.image_list_view)
+        layout.addWidget(self._image_views)
         image_count_layout = QFormLayout()
         self.image_count_label = QLabel("0")
         image_count_layout.addRow(QLabel("Images: "), self.image_count_label)
         layout.addLayout(image_count_layout)
 
-        self.image_list_widget.itemChanged.connect(self.imageChanged)
+        self.image_list_model.checkStateChanged.connect(self.imageChanged)
         self.hLayout.addWidget(image_list_box)
 
         # create selected image list
@@ -316,12 +500,15 @@ class MainWindow(QMainWindow):
         layout = QVBoxLayout()
         layout.addWidget(selected_images_label)
 
-        self.selected_image_list_widget = QListWidget()
-        self.selected_image_list_widget.itemClicked.connect(self.imageClicked)
-        self.selected_image_list_widget.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
-        self.selected_image_list_widget.customContextMenuRequested.connect(self.openSelectedImageContextMenu)
-        self.selected_image_list_widget.keyPressEvent = self.selectedImageListKeyPressEvent
-        layout.addWidget(self.selected_image_list_widget)
+        self.selected_image_list_model = ImageListModel(show_filename=False, parent=self)
+        self._selection.imagesSelected.connect(self.onImagesSelected)
+        self._selection.imagesDeselected.connect(self.onImagesDeselected)
+        self.selected_image_list_view = self.createImageListView(self.selected_image_list_model)
+        self.selected_image_list_view.clicked.connect(self.imageClicked)
+        self.selected_image_list_view.setContextMenuPolicy(Qt.ContextMenuPolicy.CustomContextMenu)
+        self.selected_image_list_view.customContextMenuRequested.connect(self.openSelectedImageContextMenu)
+        self.selected_image_list_view.keyPressEvent = self.selectedImageListKeyPressEvent
+        layout.addWidget(self.selected_image_list_view)
         image_count_layout = QFormLayout()
         self.selected_image_count_label = QLabel("0")
         image_count_layout.addRow(QLabel("Images: "), self.selected_image_count_label)
@@ -331,10 +518,6 @@ class MainWindow(QMainWindow):
 
         self.hLayout.addWidget(selected_image_list_box)
 
-        # load images from input dir
-        if input_dir:
-            self.fillImageList(input_dir)
-
     def createActions(self):
         root = QFileInfo(__file__).absolutePath()
 
@@ -344,6 +527,30 @@ class MainWindow(QMainWindow):
         self.settingsAct = QAction("Settings", self,
                 statusTip="Open settings dialog", triggered=self.openSettingsDialog)
 
+        self.selectAllAct = QAction("Select &all", self,
+                statusTip="Check all images in the input directory",
+                triggered=lambda: self.setImagesCheckState(Qt.CheckState.Checked))
+
+        self.selectNoneAct = QAction("Select &none", self,
+                statusTip="Uncheck all images in the input directory",
+                triggered=lambda: self.setImagesCheckState(Qt.CheckState.Unchecked))
+
+        self.invertSelectionAct = QAction("&Invert selection", self,
+                statusTip="Invert check state of images in the input directory",
+                triggered=self.invertSelection)
+
+        self.selectByPatternAct = QAction("Select by &pattern...", self,
+                statusTip="Check images which filename matches a pattern",
+                triggered=self.selectImagesByPattern)
+
+        self.selectUndescribedAct = QAction("Select only &undescribed", self,
+                statusTip="Check only images without EXIF:ImageDescription in the input directory",
+                triggered=self.selectOnlyUndescribedImages)
+
+        self.statsAct = QAction("Performance &statistics", self,
+                statusTip="Show timing statistics of application stages",
+                triggered=self.openStatsWindow)
+
         self.aboutAct = QAction("&About", self,
                 statusTip="Show the application's About box",
                 triggered=self.about)
@@ -358,6 +565,16 @@ class MainWindow(QMainWindow):
         self.fileMenu.addSeparator()
         self.fileMenu.addAction(self.exitAct)
 
+        self.selectionMenu = self.menuBar().addMenu("&Selection")
+        self.selectionMenu.addAction(self.selectAllAct)
+        self.selectionMenu.addAction(self.selectNoneAct)
+        self.selectionMenu.addAction(self.invertSelectionAct)
+        self.selectionMenu.addAction(self.selectByPatternAct)
+        self.selectionMenu.addAction(self.selectUndescribedAct)
+
+        self.viewMenu = self.menuBar().addMenu("&View")
+        self.viewMenu.addAction(self.statsAct)
+
         self.menuBar().addSeparator()
 
         self.helpMenu = self.menuBar().addMenu("&Help")
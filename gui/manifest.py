@@ -0,0 +1,175 @@
+import os
+import json
+import time
+import hashlib
+import threading
+
+from gui.filelock import file_lock
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def text_sha256(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+class GenerationManifest():
+    """
+    Per-output-directory record of processed images: content hash, prompt hash, model and outcome.
+    Records are appended as JSON lines as soon as an image finishes, the last record of an image wins,
+    so an interrupted run loses nothing that was already completed.
+    Workers in other processes may write to the same manifest, appends and compaction hold a lock file.
+    """
+    DIRNAME = ".imgdescgen"
+    FILENAME = "manifest.jsonl"
+    BACKUP_FILENAME = "backup.jsonl"
+    LOCK_FILENAME = "manifest.lock"
+
+    STATUS_DONE = "done"
+    STATUS_FAILED = "failed"
+
+    def __init__(self, output_dir: str):
+        self._dir = os.path.join(output_dir, GenerationManifest.DIRNAME)
+        self._path = os.path.join(self._dir, GenerationManifest.FILENAME)
+        self._lock_path = os.path.join(self._dir, GenerationManifest.LOCK_FILENAME)
+        self._lock = threading.Lock()
+        self._records: dict[str, dict] = {} # source image path -> last record
+        self._outputs: dict[str, str] = {} # output filename -> source image path
+        self._file_id = None # (device, inode) of the file read
+        self._offset = 0 # end of the last complete line read
+
+        os.makedirs(self._dir, exist_ok=True)
+        self.load()
+
+    def getDirectory(self) -> str:
+        return self._dir
+
+    def load(self):
+        with self._lock, file_lock(self._lock_path):
+            line_count = self.readRecords()
+
+            # rewrite the file if it's mostly superseded records, other processes wait with their appends
+            if line_count > 2 * len(self._records) + 100:
+                self.compact()
+
+    def refresh(self):
+        """
+        Read records appended by other processes since the file was read, the whole file again if it was rewritten.
+        """
+        with self._lock:
+            self.readRecords()
+
+    def readRecords(self) -> int:
+        # continues at the last offset, unless the file was replaced (compacted) or truncated
+        try:
+            with open(self._path, "rb") as f:
+                stat = os.fstat(f.fileno())
+                if (stat.st_dev, stat.st_ino) != self._file_id or stat.st_size < self._offset:
+                    self._records, self._outputs = {}, {}
+                    self._file_id = (stat.st_dev, stat.st_ino)
+                    self._offset = 0
+
+                f.seek(self._offset)
+                line_count = 0
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break # being appended, read with the next refresh
+                    self._offset += len(line)
+                    line_count += 1
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue # line cut by a crash
+                    self.addRecord(record)
+                return line_count
+        except FileNotFoundError:
+            return 0
+
+    def addRecord(self, record: dict):
+        self._records[record["path"]] = record
+        if record.get("output"):
+            self._outputs[record["output"]] = record["path"]
+
+    def compact(self):
+        # called with both locks held and all records read
+        tmp_path = self._path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for record in self._records.values():
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        os.replace(tmp_path, self._path)
+        stat = os.stat(self._path)
+        self._file_id = (stat.st_dev, stat.st_ino)
+        self._offset = stat.st_size
+
+    def contentHash(self, path: str) -> str:
+        """
+        Hash of the image content, reused from the manifest if file size and modification time didn't change.
+        """
+        stat = os.stat(path)
+        with self._lock:
+            record = self._records.get(path)
+        if record and record.get("size") == stat.st_size and record.get("mtime_ns") == stat.st_mtime_ns:
+            return record["content_hash"]
+        return file_sha256(path)
+
+    def isCompleted(self, path: str, content_hash: str, prompt_hash: str, model: str) -> bool:
+        with self._lock:
+            record = self._records.get(path)
+        return (
+            record is not None
+            and record["status"] == GenerationManifest.STATUS_DONE
+            and record["content_hash"] == content_hash
+            and record["prompt_hash"] == prompt_hash
+            and record["model"] == model
+        )
+
+    def getRecord(self, path: str) -> dict | None:
+        with self._lock:
+            return self._records.get(path)
+
+    def getOutputSource(self, output_name: str) -> str | None:
+        with self._lock:
+            return self._outputs.get(output_name)
+
+    def recordBackup(self, tags: dict[str, dict]):
+        """
+        Append tag values of images (path -> tags) before they are changed in place.
+        """
+        now = time.time()
+        with self._lock, file_lock(self._lock_path):
+            with open(os.path.join(self._dir, GenerationManifest.BACKUP_FILENAME), "a", encoding="utf-8") as f:
+                for path, values in tags.items():
+                    f.write(json.dumps({"path": path, "tags": values, "time": now}, ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+    def record(self, path: str, content_hash: str, prompt_hash: str, model: str, status: str,
+               output: str | None = None, error: str | None = None):
+        try:
+            stat = os.stat(path)
+            size, mtime_ns = stat.st_size, stat.st_mtime_ns
+        except OSError:
+            size, mtime_ns = None, None
+
+        record = {
+            "path": path,
+            "content_hash": content_hash,
+            "size": size,
+            "mtime_ns": mtime_ns,
+            "prompt_hash": prompt_hash,
+            "model": model,
+            "status": status,
+            "output": output,
+            "error": error,
+            "time": time.time(),
+        }
+
+        with self._lock, file_lock(self._lock_path):
+            self.addRecord(record)
+            with open(self._path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
@@ -0,0 +1,181 @@
+import os
+import time
+import random
+import shutil
+import sqlite3
+import hashlib
+import threading
+from typing import Literal
+from pydantic import BaseModel
+
+from gui.exiftool import ExifTool
+
+class MockChatbotConfig(BaseModel):
+    """
+    Built-in offline chatbot for load testing, nothing is sent over the network.
+    Request latency is latency_ms + per_image_latency_ms * images, multiplied by a random factor
+    from latency_distribution (fixed: 1, uniform: 1 +- latency_spread, lognormal: median 1, sigma latency_spread).
+    """
+    image_description_prompt: str = "Describe the image."
+    model_name: str = "mock"
+    max_image_count: int = 10
+    latency_distribution: Literal["fixed", "uniform", "lognormal"] = "lognormal"
+    latency_ms: int = 1000
+    per_image_latency_ms: int = 100
+    latency_spread: float = 0.5
+    rate_limit_probability: float = 0.0 # share of requests answered with 429
+    error_probability: float = 0.0 # share of requests failing with 500
+    max_requests_per_minute: int = 0 # server side throughput cap, requests above it get 429, 0 means no cap
+    seed: int | None = None # makes the injected latencies and failures repeatable
+    write_metadata: bool = True # tag outputs with ExifTool like the real library, needs ExifTool
+
+class MockChatbotError(Exception):
+    def __init__(self, message: str, status_code: int):
+        super().__init__(message)
+        self.status_code = status_code
+
+class MockServer():
+    """
+    State of the mock provider shared by all its clients: random generator and throughput cap.
+    With a cap or a seed the state is kept in SQLite (STATE_PATH), so worker processes of the host
+    (or of hosts sharing the cache directory) get one cap and one sequence of requests, like clients of a real server.
+    Seeded requests draw from a generator seeded by the seed and the request number, a run started
+    after the state was idle for IDLE_RESET_SECONDS starts the sequence over.
+    """
+    STATE_PATH = "cache/mockserver.sqlite3"
+    IDLE_RESET_SECONDS = 60
+
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    @classmethod
+    def get(cls, config: MockChatbotConfig) -> "MockServer":
+        # settings changed between runs, start over with a fresh server
+        with cls._instance_lock:
+            if cls._instance is None or cls._instance.config != config:
+                if cls._instance is not None:
+                    cls._instance.close()
+                cls._instance = MockServer(config)
+            return cls._instance
+
+    def __init__(self, config: MockChatbotConfig, path: str = STATE_PATH):
+        self.config = config.model_copy()
+        self._lock = threading.Lock()
+        self._random = random.Random()
+        self._requests = 0
+        # token bucket of the cap, holding a second of requests
+        self._capacity = max(1.0, config.max_requests_per_minute / 60)
+
+        self._connection = None
+        if config.max_requests_per_minute > 0 or config.seed is not None:
+            # one state per settings, servers of other processes with the same settings share it
+            self._key = hashlib.sha256(self.config.model_dump_json().encode("utf-8")).hexdigest()
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._connection = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+            # losing the last requests on power loss doesn't matter for a mock
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS servers ("
+                "key TEXT PRIMARY KEY, tokens REAL NOT NULL, requests INTEGER NOT NULL, updated REAL NOT NULL)"
+            )
+
+    def acceptRequest(self) -> int | None:
+        """
+        Admit a request under the throughput cap, return its number or None if it's rejected.
+        """
+        with self._lock:
+            if self._connection is None:
+                self._requests += 1
+                return self._requests - 1
+
+            rate_per_minute = self.config.max_requests_per_minute
+            now = time.time()
+            self._connection.execute("BEGIN IMMEDIATE")
+            try:
+                self._connection.execute("DELETE FROM servers WHERE updated < ?", (now - MockServer.IDLE_RESET_SECONDS,))
+                row = self._connection.execute("SELECT tokens, requests, updated FROM servers WHERE key = ?", (self._key,)).fetchone()
+                tokens, requests, updated = row if row is not None else (self._capacity, 0, now)
+
+                number = requests
+                if rate_per_minute > 0:
+                    tokens = min(self._capacity, tokens + (now - updated) * rate_per_minute / 60)
+                    if tokens < 1:
+                        number = None
+                    else:
+                        tokens -= 1
+
+                self._connection.execute(
+                    "INSERT OR REPLACE INTO servers (key, tokens, requests, updated) VALUES (?, ?, ?, ?)",
+                    (self._key, tokens, requests + (number is not None), now)
+                )
+            except BaseException:
+                self._connection.execute("ROLLBACK")
+                raise
+            self._connection.execute("COMMIT")
+            return number
+
+    def sampleRequest(self, number: int, image_count: int) -> tuple[float, str | None]:
+        """
+        Latency in seconds and injected failure ("rate_limit", "error" or None) of the request with the number.
+        """
+        config = self.config
+        with self._lock:
+            generator = random.Random(f"{config.seed}:{number}") if config.seed is not None else self._random
+            if config.latency_distribution == "uniform":
+                factor = generator.uniform(max(0.0, 1 - config.latency_spread), 1 + config.latency_spread)
+            elif config.latency_distribution == "lognormal":
+                factor = generator.lognormvariate(0, config.latency_spread)
+            else:
+                factor = 1.0
+
+            roll = generator.random()
+
+        failure = None
+        if roll < config.rate_limit_probability:
+            failure = "rate_limit"
+        elif roll < config.rate_limit_probability + config.error_probability:
+            failure = "error"
+
+        return (config.latency_ms + config.per_image_latency_ms * image_count) * factor / 1000, failure
+
+    def close(self):
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+class MockImgDescGen():
+    """
+    Mock counterpart of ImgDescGen: same generate_image_description() call, outputs are copies of the images
+    tagged with a generated description.
+    """
+    def __init__(self, config: MockChatbotConfig, exiftool: ExifTool):
+        self._config = config
+        self._exiftool = exiftool
+        self._server = MockServer.get(config)
+
+    def generate_image_description(self, images: list[str], output_dir: str, *args):
+        # throughput cap rejects at once, like a real server
+        number = self._server.acceptRequest()
+        if number is None:
+            time.sleep(0.05)
+            raise MockChatbotError("429 RESOURCE_EXHAUSTED: mock throughput cap exceeded", 429)
+
+        latency, failure = self._server.sampleRequest(number, len(images))
+        time.sleep(latency)
+        if failure == "rate_limit":
+            raise MockChatbotError("429 RESOURCE_EXHAUSTED: injected rate limit", 429)
+        if failure == "error":
+            raise MockChatbotError("500 INTERNAL: injected error", 500)
+
+        outputs = {}
+        for image in images:
+            output = os.path.join(output_dir, os.path.basename(image))
+            shutil.copyfile(image, output)
+            outputs[output] = {"EXIF:ImageDescription": f"Mock description of {os.path.basename(image)} by {self._config.model_name}"}
+
+        if self._config.write_metadata:
+            errors = self._exiftool.writeTags(outputs)
+            for output in errors:
+                os.remove(output) # no output means failed image, like in the library
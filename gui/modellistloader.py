@@ -0,0 +1,156 @@
+import os
+import json
+import time
+import queue
+import hashlib
+import tempfile
+import threading
+from PySide6.QtCore import QObject, Signal
+
+from gui.chatbotfactory import create_chatbot
+from gui.schemas.config import ChatbotName
+from gui.tracing import tracer
+from imgdescgenlib.chatbot.gemini.gemini import GeminiConfig
+from imgdescgenlib.chatbot.exceptions import ChatbotHttpRequestFailed
+
+class ModelListLoader(QObject):
+    """
+    Lists models available for the Gemini API key.
+    Lists are kept on disk per API key (by its hash), so they're shown right away and fetched again
+    only when older than CACHE_TTL_SECONDS or on refresh. Fetching runs in one background thread
+    with one client, which is created again only when the API key changes. The thread is a daemon
+    that's never waited for, so a request hanging on a dead link doesn't block closing the application.
+    """
+    CACHE_PATH = "cache/models.json"
+    CACHE_TTL_SECONDS = 24 * 60 * 60
+
+    # API key, models
+    modelsReady = Signal(str, list)
+    # API key, error message
+    refreshFailed = Signal(str, str)
+
+    class Emitter(QObject):
+        finished = Signal(int, str, object, str)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+
+        # only touched from the loader thread
+        self._client = None
+        self._client_key = None
+
+        self._cache_lock = threading.Lock()
+        self._model_type = type(GeminiConfig().model_name)
+        self._pending: set[str] = set()
+
+        # results of requests started before the last stop() are ignored
+        self._generation = 0
+        self._tasks = queue.Queue()
+        self._thread = None
+        self._emitter = ModelListLoader.Emitter()
+        self._emitter.finished.connect(self.onTaskFinished)
+
+    def cacheKey(self, api_key: str) -> str:
+        return hashlib.sha256(api_key.encode("utf-8")).hexdigest()
+
+    def readCache(self) -> dict:
+        try:
+            with open(ModelListLoader.CACHE_PATH, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def cachedModels(self, api_key: str) -> tuple[list, bool]:
+        """
+        Return cached models for the API key and whether they're still fresh, ([], False) if there are none.
+        """
+        with self._cache_lock:
+            entry = self.readCache().get(self.cacheKey(api_key))
+        if not entry:
+            return [], False
+
+        try:
+            models = [self._model_type.model_validate(model) for model in entry["models"]]
+        except (KeyError, TypeError, ValueError):
+            return [], False
+        return models, time.time() - entry.get("fetched_at", 0) < ModelListLoader.CACHE_TTL_SECONDS
+
+    def storeModels(self, api_key: str, models: list):
+        with self._cache_lock:
+            cache = self.readCache()
+            cache[self.cacheKey(api_key)] = {
+                "fetched_at": time.time(),
+                "models": [model.model_dump(mode="json") for model in models],
+            }
+
+            tmp_path = None
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(ModelListLoader.CACHE_PATH)), exist_ok=True)
+                fd, tmp_path = tempfile.mkstemp(suffix=".tmp", dir=os.path.dirname(os.path.abspath(ModelListLoader.CACHE_PATH)))
+                with os.fdopen(fd, "w", encoding="utf-8") as f:
+                    json.dump(cache, f)
+                os.replace(tmp_path, ModelListLoader.CACHE_PATH)
+            except OSError:
+                if tmp_path and os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+
+    def client(self, config: GeminiConfig):
+        if self._client is None or self._client_key != config.api_key:
+            self._client = create_chatbot(ChatbotName.GEMINI, config)
+            self._client_key = config.api_key
+        return self._client
+
+    def refresh(self, config: GeminiConfig):
+        """
+        Fetch models in the background, modelsReady or refreshFailed is emitted when it's done.
+        Does nothing if the same API key is already being fetched.
+        """
+        if config.api_key in self._pending:
+            return
+
+        self._pending.add(config.api_key)
+        if self._thread is None:
+            self._thread = threading.Thread(target=self.runTasks, name="model-list-loader", daemon=True)
+            self._thread.start()
+        self._tasks.put((self._generation, config))
+
+    def runTasks(self):
+        while True:
+            generation, config = self._tasks.get()
+            if generation != self._generation:
+                continue # stopped before it started
+
+            models, error = None, ""
+            try:
+                with tracer.span("settings.list_models"):
+                    models = list(self.client(config).get_available_models().models)
+            except ChatbotHttpRequestFailed:
+                error = "Failed to fetch models from Gemini API. Please check your API key and internet connection."
+            except Exception as e:
+                error = f"Failed to fetch models from Gemini API: {e}"
+
+            if models is not None:
+                self.storeModels(config.api_key, models)
+            try:
+                self._emitter.finished.emit(generation, config.api_key, models, error)
+            except RuntimeError:
+                return # the loader was deleted while the request was in flight
+
+    def isRefreshing(self, api_key: str) -> bool:
+        return api_key in self._pending
+
+    def onTaskFinished(self, generation: int, api_key: str, models: list | None, error: str):
+        if generation != self._generation:
+            return
+        self._pending.discard(api_key)
+        if models is None:
+            self.refreshFailed.emit(api_key, error)
+        else:
+            self.modelsReady.emit(api_key, models)
+
+    def stop(self):
+        """
+        Drop queued requests and ignore results of the one in flight, doesn't wait for it.
+        """
+        self._generation += 1
+        self._pending.clear()
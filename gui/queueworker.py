@@ -0,0 +1,267 @@
+import os
+import json
+import time
+import socket
+import sqlite3
+import logging
+import threading
+
+from gui.exiftool import ExifTool
+from gui.generationpipeline import GenerationPipeline
+from gui.jobqueue import JobQueue
+from gui.ratelimiter import RateLimiter
+from gui.schemas.config import ImgDescGenConfig
+from gui.tracing import tracer
+
+logger = logging.getLogger("imgdescgengui")
+
+class QueueLogHandler(logging.Handler):
+    """
+    Collects log records of the worker for the job queue, they're sent with the next heartbeat.
+    """
+    def __init__(self, worker: "QueueWorker"):
+        super().__init__()
+        self._worker = worker
+
+    def emit(self, record):
+        self._worker.addLogRecord(record.created, record.name, record.levelno, self.format(record))
+
+class QueueWorker():
+    """
+    Runs jobs of the job queue until stopped, or with exit_when_idle until the queue is empty
+    and no other worker holds a lease.
+    Claims of one batch are generated by one pipeline with the config of the batch, kept open while
+    the worker keeps claiming jobs of the batch, so the output directory manifest is read once.
+    Results, log records and tracer spans are sent to the queue every HEARTBEAT_SECONDS together with the lease renewal,
+    that's also when cancelling of the batch is noticed. Results are already in the output directory
+    manifest when they're sent, so jobs claimed again after a crash are skipped by the pipeline.
+    """
+    HEARTBEAT_SECONDS = 1.0
+    IDLE_POLL_SECONDS = 2.0
+    LOGGERS = ("imgdescgengui", "imgdescgenlib", "chatbotclient")
+
+    def __init__(self, job_queue: JobQueue, worker_id: str | None = None, exiftool_path: str | None = None,
+                 log_level: int = logging.INFO, local_config: ImgDescGenConfig | None = None):
+        self._queue = job_queue
+        self._local_config = local_config
+        self._worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+        self._exiftool_path = exiftool_path
+        self._exiftool = ExifTool(exiftool_path or "")
+        # kept for the worker's whole life, the budget itself is shared with other workers through the queue
+        self._rate_limiter = RateLimiter(shared=job_queue)
+        self._stop_event = threading.Event()
+
+        self._lock = threading.RLock() # stop() may be called by a signal handler while the lock is held
+        self._pipeline = None
+        self._pipeline_batch_id = None
+        self._batch_id = None
+        self._pending: dict[str, int] = {} # image path -> job id, jobs without result
+        self._finished: dict[int, tuple[str, str | None]] = {}
+        self._log_records: list[tuple] = []
+        self._spans: list[tuple] = []
+
+        self._log_handler = QueueLogHandler(self)
+        self._log_handler.setLevel(log_level)
+        self._log_handler.setFormatter(logging.Formatter("%(message)s"))
+
+    def getWorkerId(self) -> str:
+        return self._worker_id
+
+    def stop(self):
+        """
+        Stop after requests in flight finish, can be called from any thread (or a signal handler).
+        Jobs that weren't started go back to the queue.
+        """
+        self._stop_event.set()
+        with self._lock:
+            if self._pipeline is not None:
+                self._pipeline.cancel()
+
+    def run(self, exit_when_idle: bool = False) -> int:
+        """
+        Process claims until stopped, return the number of jobs processed.
+        """
+        for name in QueueWorker.LOGGERS:
+            logging.getLogger(name).addHandler(self._log_handler)
+        tracer.addListener(self.addSpan)
+
+        processed = 0
+        try:
+            while not self._stop_event.is_set():
+                try:
+                    claim = self._queue.claim(self._worker_id)
+                except sqlite3.Error as e:
+                    logger.error(f"Failed to claim jobs: {e}")
+                    claim = None
+
+                if claim is None:
+                    self.closePipeline()
+                    if exit_when_idle and not self.othersHoldLeases():
+                        break
+                    self._stop_event.wait(QueueWorker.IDLE_POLL_SECONDS)
+                    continue
+
+                processed += self.runClaim(*claim)
+        finally:
+            self.closePipeline()
+            for name in QueueWorker.LOGGERS:
+                logging.getLogger(name).removeHandler(self._log_handler)
+            tracer.removeListener(self.addSpan)
+            self._exiftool.close()
+        return processed
+
+    def othersHoldLeases(self) -> bool:
+        # their jobs come back to the queue if they crash, so idle workers wait for them to finish
+        try:
+            return bool(self._queue.activeWorkers())
+        except sqlite3.Error as e:
+            logger.error(f"Failed to read the job queue: {e}")
+            return True
+
+    def addApiKey(self, data: dict):
+        """
+        Put the API key of the batch's chatbot from the worker's own config into the batch config,
+        batches are queued without API keys.
+        """
+        name = data.get("chatbot")
+        chatbot_data = data.get("chatbots", {}).get(name)
+        if self._local_config is None or not isinstance(chatbot_data, dict):
+            return
+
+        local_chatbot_config = self._local_config.getSchema().chatbots.get(name)
+        api_key = getattr(local_chatbot_config, "api_key", None)
+        if api_key:
+            chatbot_data["api_key"] = api_key
+        elif api_key is not None:
+            logger.warning(f"No API key for {name} in {self._local_config.getFilename()} of worker {self._worker_id}")
+
+    def openPipeline(self, batch_id: int, config_json: str):
+        data = json.loads(config_json)
+        self.addApiKey(data)
+        config = ImgDescGenConfig("", data)
+        if self._exiftool_path:
+            config.getSchema().exiftool_path = self._exiftool_path
+        self._exiftool.setExecutable(config.getSchema().exiftool_path)
+
+        pipeline = GenerationPipeline(config, self._exiftool, self.onProgress, self._rate_limiter)
+        pipeline.open()
+        with self._lock:
+            self._pipeline = pipeline
+            self._pipeline_batch_id = batch_id
+            if self._stop_event.is_set():
+                self._pipeline.cancel()
+
+    def closePipeline(self):
+        with self._lock:
+            pipeline, self._pipeline, self._pipeline_batch_id = self._pipeline, None, None
+        if pipeline is not None:
+            pipeline.close()
+
+    def runClaim(self, batch_id: int, config_json: str, jobs: dict[int, str]) -> int:
+        with self._lock:
+            self._batch_id = batch_id
+            self._pending = {path: job_id for job_id, path in jobs.items()}
+
+        logger.info(f"Worker {self._worker_id} claimed {len(jobs)} images")
+        done_event = threading.Event()
+        heartbeat_thread = threading.Thread(target=self.heartbeatLoop, args=(done_event,), daemon=True)
+        heartbeat_thread.start()
+
+        error = None
+        try:
+            if batch_id != self._pipeline_batch_id:
+                self.closePipeline()
+                self.openPipeline(batch_id, config_json)
+            with tracer.span("generation.run", images=len(jobs)):
+                self._pipeline.generate(list(jobs.values()))
+        except Exception as e:
+            logger.error(f"Generation failed: {repr(e)}")
+            error = repr(e)
+
+        done_event.set()
+        heartbeat_thread.join()
+        cancelled = self.heartbeat()
+
+        # images the pipeline didn't get to
+        with self._lock:
+            unfinished = list(self._pending.values())
+            self._pending = {}
+            if error is not None:
+                self._finished.update((job_id, (JobQueue.STATE_FAILED, error)) for job_id in unfinished)
+            elif cancelled:
+                self._finished.update((job_id, (JobQueue.STATE_CANCELLED, None)) for job_id in unfinished)
+        if unfinished and error is None and not cancelled:
+            try:
+                self._queue.release(self._worker_id, unfinished)
+            except sqlite3.Error as e:
+                # they're claimed again when the lease expires
+                logger.warning(f"Failed to release jobs: {e}")
+
+        # results, log records and spans of the claim left since the last heartbeat
+        self.heartbeat()
+        with self._lock:
+            self._batch_id = None
+            self._log_records = []
+            self._spans = []
+
+        # a cancelled pipeline stays cancelled, after an error its state is unknown
+        if error is not None or cancelled:
+            self.closePipeline()
+        return len(jobs) - len(unfinished)
+
+    def onProgress(self, event: str, image: str):
+        states = {
+            GenerationPipeline.EVENT_WRITTEN: JobQueue.STATE_DONE,
+            GenerationPipeline.EVENT_SKIPPED: JobQueue.STATE_SKIPPED,
+            GenerationPipeline.EVENT_FAILED: JobQueue.STATE_FAILED,
+        }
+        if event not in states:
+            return
+
+        record = self._pipeline.getRecord(image) or {}
+        result = record.get("output") if event != GenerationPipeline.EVENT_FAILED else record.get("error")
+        with self._lock:
+            job_id = self._pending.pop(image, None)
+            if job_id is not None:
+                self._finished[job_id] = (states[event], result)
+
+    def addLogRecord(self, time: float, name: str, level: int, message: str):
+        with self._lock:
+            if self._batch_id is not None:
+                self._log_records.append((time, name, level, message))
+
+    def addSpan(self, name: str, start: float, duration: float, args: dict | None):
+        # start goes to the queue as wall clock time, perf_counter() values of processes can't be compared
+        wall_start = time.time() - (time.perf_counter() - start)
+        with self._lock:
+            if self._batch_id is not None:
+                self._spans.append((os.getpid(), threading.get_ident(), name, wall_start, duration, json.dumps(args, default=str) if args else None))
+
+    def heartbeatLoop(self, done_event: threading.Event):
+        while not done_event.wait(QueueWorker.HEARTBEAT_SECONDS):
+            if self.heartbeat():
+                with self._lock:
+                    if self._pipeline is not None:
+                        self._pipeline.cancel()
+
+    def heartbeat(self) -> bool:
+        """
+        Send results, log records and spans collected since the last heartbeat, return True if the batch was cancelled.
+        """
+        with self._lock:
+            batch_id = self._batch_id
+            job_ids = list(self._pending.values())
+            finished, self._finished = self._finished, {}
+            log_records, self._log_records = self._log_records, []
+            spans, self._spans = self._spans, []
+
+        try:
+            return self._queue.heartbeat(self._worker_id, batch_id, job_ids, finished, log_records, spans)
+        except sqlite3.Error as e:
+            # queue is busy or unreachable, keep everything for the next heartbeat
+            with self._lock:
+                self._finished = {**finished, **self._finished}
+                self._log_records = log_records + self._log_records
+                self._spans = spans + self._spans
+            logging.getLogger("imgdescgengui.queue").warning(f"Failed to update the job queue: {e}")
+            return False
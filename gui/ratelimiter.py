@@ -0,0 +1,177 @@
+import re
+import time
+import random
+import sqlite3
+import logging
+import threading
+
+logger = logging.getLogger("imgdescgengui")
+
+# status tokens in error messages of clients that don't keep the HTTP status, "429" only as a standalone number
+# and not a part of a path or filename like IMG_4290.jpg, IMG-429.jpg or /photos/429/
+RATE_LIMIT_MESSAGE = re.compile(r"(?<![\w./\\-])429(?![\w/\\-]|\.\w)|\bRESOURCE_EXHAUSTED\b|\brate limit exceeded\b", re.IGNORECASE)
+
+def is_rate_limit_error(e: Exception) -> bool:
+    """
+    Best effort check whether a chatbot error is a rate limit (HTTP 429) response: status code or status
+    of the exception or an exception it was raised from, otherwise a status token in the message.
+    """
+    error, seen = e, set()
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        for status in (getattr(error, "status_code", None), getattr(error, "code", None), getattr(error, "status", None),
+                       getattr(getattr(error, "response", None), "status_code", None)):
+            if status == 429 or status == "RESOURCE_EXHAUSTED":
+                return True
+        error = error.__cause__ or error.__context__
+
+    # OSError messages name files, they're never rate limits
+    return not isinstance(e, OSError) and RATE_LIMIT_MESSAGE.search(str(e)) is not None
+
+class TokenBucket():
+    """
+    Token bucket refilled at rate_per_minute, holding at most capacity tokens.
+    Not thread-safe, RateLimiter guards it.
+    """
+    def __init__(self, rate_per_minute: float, capacity: float):
+        self.rate_per_minute = rate_per_minute
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+
+    def refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate_per_minute / 60)
+        self._updated = now
+
+    def waitTime(self, amount: float) -> float:
+        """
+        Seconds until amount can be taken, amounts bigger than capacity are allowed once the bucket is full.
+        """
+        self.refill()
+        missing = min(amount, self.capacity) - self._tokens
+        return max(0.0, missing * 60 / self.rate_per_minute) if missing > 0 else 0.0
+
+    def take(self, amount: float):
+        self._tokens -= amount
+
+class RateLimiter():
+    """
+    Requests-per-minute and tokens-per-minute limiter shared by generation threads (0 means no limit).
+    Rate limit responses halve the allowed rate and pause all requests with exponential backoff,
+    successful requests restore the rate step by step.
+    With a shared store (JobQueue) the buckets and pauses of a scope are kept there, so all worker
+    processes using the queue share one budget, each refilling at its own rate factor.
+    If the store can't be reached, the local buckets are used meanwhile.
+    """
+    BURST_SECONDS = 10
+    MIN_RATE_FACTOR = 0.1
+    RECOVERY_STEP = 0.05
+    BACKOFF_BASE = 2.0
+    BACKOFF_MAX = 60.0
+
+    def __init__(self, requests_per_minute: int = 0, tokens_per_minute: int = 0, shared=None):
+        self._lock = threading.Lock()
+        self._shared = shared
+        self._limits = None
+        self._scope = ""
+        self._buckets: list[tuple[TokenBucket, float, bool]] = [] # bucket, configured rate, counts tokens
+
+        self._rate_factor = 1.0
+        self._paused_until = 0.0
+        self._consecutive_rate_limits = 0
+        self.setLimits(requests_per_minute, tokens_per_minute)
+
+    def setLimits(self, requests_per_minute: int, tokens_per_minute: int, scope: str = ""):
+        """
+        Set the configured limits, scope names the shared budget (chatbot and API key).
+        Nothing changes if they're the same as before, so a limiter can be reused across runs.
+        """
+        with self._lock:
+            if self._limits == (requests_per_minute, tokens_per_minute, scope):
+                return
+
+            self._limits = (requests_per_minute, tokens_per_minute, scope)
+            self._scope = scope
+            self._buckets = []
+            for rate, counts_tokens in ((requests_per_minute, False), (tokens_per_minute, True)):
+                if rate > 0:
+                    self._buckets.append((TokenBucket(rate, max(1.0, rate * RateLimiter.BURST_SECONDS / 60)), rate, counts_tokens))
+            self.setRateFactor(self._rate_factor)
+
+    def acquire(self, tokens: int, cancel_event: threading.Event | None = None) -> bool:
+        """
+        Block until a request of the given token count is allowed.
+        Returns False without taking anything if cancel_event is set while waiting.
+        """
+        while True:
+            if cancel_event is not None and cancel_event.is_set():
+                return False
+
+            with self._lock:
+                wait = self._paused_until - time.monotonic()
+                if wait <= 0:
+                    wait = self.takeShared(tokens) if self._shared is not None else None
+                    if wait is None:
+                        wait = self.takeLocal(tokens)
+                if wait <= 0:
+                    return True
+
+            if cancel_event is not None:
+                cancel_event.wait(min(wait, 1.0))
+            else:
+                time.sleep(min(wait, 1.0))
+
+    def takeLocal(self, tokens: int) -> float:
+        wait = 0.0
+        for bucket, _, counts_tokens in self._buckets:
+            wait = max(wait, bucket.waitTime(tokens if counts_tokens else 1))
+
+        if wait <= 0:
+            for bucket, _, counts_tokens in self._buckets:
+                bucket.take(tokens if counts_tokens else 1)
+        return wait
+
+    def takeShared(self, tokens: int) -> float | None:
+        # None if the store failed
+        buckets = [
+            (f"{self._scope}:{'tokens' if counts_tokens else 'requests'}", bucket.rate_per_minute, bucket.capacity, tokens if counts_tokens else 1)
+            for bucket, _, counts_tokens in self._buckets
+        ]
+        try:
+            return self._shared.takeRateTokens(self._scope, buckets)
+        except sqlite3.Error as e:
+            logger.warning(f"Shared rate limits are not available, limiting this worker only: {e}")
+            return None
+
+    def onSuccess(self):
+        with self._lock:
+            self._consecutive_rate_limits = 0
+            if self._rate_factor < 1.0:
+                self.setRateFactor(min(1.0, self._rate_factor + RateLimiter.RECOVERY_STEP))
+
+    def onRateLimited(self) -> float:
+        """
+        Slow down after a rate limit response, return the backoff delay in seconds.
+        """
+        with self._lock:
+            self._consecutive_rate_limits += 1
+            self.setRateFactor(max(RateLimiter.MIN_RATE_FACTOR, self._rate_factor / 2))
+
+            delay = min(RateLimiter.BACKOFF_MAX, RateLimiter.BACKOFF_BASE ** self._consecutive_rate_limits)
+            delay *= random.uniform(0.8, 1.2) # jitter, so threads don't retry all at once
+            self._paused_until = max(self._paused_until, time.monotonic() + delay)
+
+            # other workers of the scope pause as well
+            if self._shared is not None:
+                try:
+                    self._shared.pauseRateLimits(self._scope, time.time() + delay)
+                except sqlite3.Error as e:
+                    logger.warning(f"Failed to pause shared rate limits: {e}")
+            return delay
+
+    def setRateFactor(self, factor: float):
+        self._rate_factor = factor
+        for bucket, rate, _ in self._buckets:
+            bucket.refill()
+            bucket.rate_per_minute = rate * factor
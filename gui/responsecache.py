@@ -0,0 +1,77 @@
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+
+class ResponseCache():
+    """
+    Local cache of generated descriptions keyed by image content hash, prompt hash and model name.
+    Stored in SQLite, least recently used entries are evicted above max_entries.
+    Use times of hits are kept in memory and written by flush() (or the next put), one commit for many lookups.
+    """
+    DEFAULT_PATH = "cache/responses.sqlite3"
+
+    def __init__(self, max_entries: int, path: str = DEFAULT_PATH):
+        self._max_entries = max_entries
+        self._lock = threading.Lock()
+        self._touched: dict[str, float] = {} # key -> last use not written yet
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, description TEXT NOT NULL, model TEXT NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._connection.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses(last_used)")
+        self._connection.commit()
+
+    def makeKey(self, content_hash: str, prompt_hash: str, model: str) -> str:
+        return hashlib.sha256(f"{content_hash}|{prompt_hash}|{model}".encode("utf-8")).hexdigest()
+
+    def get(self, content_hash: str, prompt_hash: str, model: str) -> str | None:
+        key = self.makeKey(content_hash, prompt_hash, model)
+        with self._lock:
+            row = self._connection.execute("SELECT description FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+
+            self._touched[key] = time.time()
+            return row[0]
+
+    def flush(self):
+        """
+        Write use times of the entries found since the last flush.
+        """
+        with self._lock:
+            self.writeTouched()
+            self._connection.commit()
+
+    def writeTouched(self):
+        if self._touched:
+            self._connection.executemany(
+                "UPDATE responses SET last_used = ? WHERE key = ?", [(used, key) for key, used in self._touched.items()]
+            )
+            self._touched = {}
+
+    def put(self, content_hash: str, prompt_hash: str, model: str, description: str):
+        key = self.makeKey(content_hash, prompt_hash, model)
+        with self._lock:
+            self.writeTouched() # before eviction, so entries just used aren't evicted
+            self._connection.execute(
+                "INSERT OR REPLACE INTO responses (key, description, model, last_used) VALUES (?, ?, ?, ?)",
+                (key, description, model, time.time())
+            )
+            self._connection.execute(
+                "DELETE FROM responses WHERE key IN ("
+                "SELECT key FROM responses ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self._max_entries,)
+            )
+            self._connection.commit()
+
+    def close(self):
+        with self._lock:
+            self.writeTouched()
+            self._connection.commit()
+            self._connection.close()
@@ -1,33 +1,110 @@
+import os
 import json
-from pydantic import BaseModel, Field
+import tempfile
+from typing import Any
+from pydantic import BaseModel, Field, field_validator
 from enum import Enum
 
-from imgdescgenlib.chatbot.gemini.gemini import GeminiConfig
+from gui.mockchatbot import MockChatbotConfig
 
 class ChatbotName(str, Enum):
     GEMINI = "gemini"
+    MOCK = "mock" # offline load testing
+
+class OutputMode(str, Enum):
+    COPY = "copy" # tagged copies in the output directory
+    REFLINK = "reflink" # copies start as clones where the filesystem supports it, saves only the initial copy
+    IN_PLACE = "in_place" # originals are tagged, previous values are backed up in the output directory
+
+def chatbot_config_model(name: str) -> type[BaseModel] | None:
+    """
+    Config model of the chatbot, the Gemini one is imported on first use since its library is slow to import.
+    """
+    if name == ChatbotName.GEMINI:
+        from imgdescgenlib.chatbot.gemini.gemini import GeminiConfig
+        return GeminiConfig
+    if name == ChatbotName.MOCK:
+        return MockChatbotConfig
+    return None
+
+class ChatbotConfigs(dict):
+    """
+    Chatbot name -> config. Values are kept as loaded and validated into the chatbot's config model
+    on first access, so loading the config doesn't import chatbot libraries. Invalid values raise
+    pydantic ValidationError on that access.
+    """
+    def __getitem__(self, name):
+        value = super().__getitem__(name)
+        model = chatbot_config_model(name)
+        if model is not None and not isinstance(value, model):
+            value = model.model_validate(value)
+            super().__setitem__(name, value)
+        return value
+
+    def get(self, name, default=None):
+        return self[name] if name in self else default
+
+    def values(self):
+        return [self[name] for name in self]
+
+    def items(self):
+        return [(name, self[name]) for name in self]
 
 class ImgDescGenConfigSchema(BaseModel):
     input_dir: str = ""
+    recursive_scan: bool = False
+    thumbnail_grid: bool = False
     output_dir: str = ""
     selected_images: list[str] | None = None
     exiftool_path: str = ""
+    concurrency: int = 1 # chunks generated in parallel
+    requests_per_minute: int = 0 # 0 means no limit
+    tokens_per_minute: int = 0 # 0 means no limit
+    response_cache_enabled: bool = True
+    response_cache_max_entries: int = 100000
+    downscale_max_edge: int = 0 # 0 sends original images
+    downscale_quality: int = 85
+    output_mode: OutputMode = OutputMode.COPY
+    in_place_backup: bool = True
+    log_to_file: bool = False
+    job_queue_path: str = "cache/jobs.sqlite3" # shared by the GUI and the workers
+    local_workers: int = 1 # worker processes started by the GUI, 0 if only workers started separately run the queue
     chatbot: str = ChatbotName.GEMINI
-    chatbots: dict[str, GeminiConfig] = Field(default_factory=lambda: {
-        ChatbotName.GEMINI: GeminiConfig(),
-    })
+    chatbots: dict[str, Any] = Field(default_factory=dict, validate_default=True) # ChatbotConfigs
+
+    @field_validator("chatbots", mode="before")
+    @classmethod
+    def validateChatbots(cls, chatbots):
+        # chatbots missing in older configs get defaults, unknown ones are dropped
+        result = {name.value: {} for name in ChatbotName}
+        for name, value in (chatbots or {}).items():
+            if name in result:
+                result[name] = value
+        return result
+
+    @field_validator("chatbots", mode="after")
+    @classmethod
+    def wrapChatbots(cls, chatbots):
+        return ChatbotConfigs(chatbots)
 
 class ImgDescGenConfig():
-    def __init__(self, filename):
-        self.loadConfig(filename)
+    def __init__(self, filename, data: dict | None = None):
+        self.loadConfig(filename, data)
         
-    def loadConfig(self, filename):
-        try:
-            with open(filename, "r", encoding="utf-8") as f:
-                data = json.load(f)
-                self._filename = filename
-        except FileNotFoundError:
-            ...
+    def loadConfig(self, filename, data: dict | None = None):
+        """
+        Load configuration from the file, or from already parsed data (config of a queued batch),
+        filename is then only where saveConfig() writes it.
+        """
+        self._filename = filename
+        self._dirty = False
+
+        if data is None:
+            try:
+                with open(filename, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+            except FileNotFoundError:
+                ...
             
         if data:
             self._config = ImgDescGenConfigSchema.model_validate(data)
@@ -36,12 +113,47 @@ class ImgDescGenConfig():
 
     def getSchema(self) -> ImgDescGenConfigSchema:
         return self._config
+
+    def getFilename(self) -> str:
+        return self._filename
+
+    def markDirty(self):
+        """
+        Mark configuration as changed, schema fields are plain attributes so callers must do it after changing them.
+        """
+        self._dirty = True
+
+    def isDirty(self) -> bool:
+        return self._dirty
     
     def saveConfig(self, filename = None) -> bool:
+        """
+        Save configuration if it was changed since the last save.
+        File is written to a temporary file next to it and then renamed over it,
+        so the config is never left half-written.
+        """
+        if filename is None or filename == self._filename:
+            if not self._dirty:
+                return True
+            filename = self._filename
+
+        tmp_path = None
         try:
-            with open(filename if filename else self._filename, "w", encoding="utf-8") as f:
-                json.dump(self._config.model_dump(), f, ensure_ascii=False, indent=4)
-        except FileNotFoundError:
+            fd, tmp_path = tempfile.mkstemp(
+                prefix=os.path.basename(filename) + ".",
+                suffix=".tmp",
+                dir=os.path.dirname(os.path.abspath(filename))
+            )
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(self._config.model_dump_json(indent=4))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, filename)
+        except OSError:
+            if tmp_path and os.path.exists(tmp_path):
+                os.remove(tmp_path)
             return False
-        
+
+        if filename == self._filename:
+            self._dirty = False
         return True
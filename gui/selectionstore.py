@@ -0,0 +1,48 @@
+from PySide6.QtCore import QObject, Signal
+
+class SelectionStore(QObject):
+    """
+    Ordered set of selected image paths with constant time membership checks.
+    Change signals are emitted once per operation, with all affected paths.
+    """
+    imagesSelected = Signal(list)
+    imagesDeselected = Signal(list)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+
+        # dict keeps insertion order, values are unused
+        self._paths: dict[str, None] = {}
+
+    def contains(self, path: str) -> bool:
+        return path in self._paths
+
+    def count(self) -> int:
+        return len(self._paths)
+
+    def paths(self) -> list[str]:
+        return list(self._paths)
+
+    def add(self, paths: list[str]) -> list[str]:
+        """
+        Select paths, return the ones that were not selected before.
+        """
+        added = [path for path in dict.fromkeys(paths) if path not in self._paths]
+        if added:
+            self._paths.update(dict.fromkeys(added))
+            self.imagesSelected.emit(added)
+        return added
+
+    def remove(self, paths: list[str]) -> list[str]:
+        """
+        Deselect paths, return the ones that were selected before.
+        """
+        removed = [path for path in dict.fromkeys(paths) if path in self._paths]
+        if removed:
+            for path in removed:
+                del self._paths[path]
+            self.imagesDeselected.emit(removed)
+        return removed
+
+    def clear(self) -> list[str]:
+        return self.remove(list(self._paths))
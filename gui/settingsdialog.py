@@ -1,21 +1,27 @@
 from PySide6.QtGui import QIcon
 from PySide6.QtWidgets import (QDialog, QVBoxLayout, QLabel, QComboBox, QHBoxLayout, QDialogButtonBox,
                                QFormLayout, QLineEdit, QTextEdit, QGroupBox, QPushButton, QFileDialog,
-                               QMessageBox, QCheckBox)
+                               QMessageBox, QCheckBox, QSpinBox, QDoubleSpinBox)
 
-from gui.chatbotfactory import create_chatbot
-from gui.schemas.config import ChatbotName, ImgDescGenConfig
+from gui.mockchatbot import MockChatbotConfig
+from gui.modellistloader import ModelListLoader
+from gui.schemas.config import ChatbotName, ImgDescGenConfig, OutputMode
 from imgdescgenlib.chatbot.gemini.gemini import GeminiConfig
-from imgdescgenlib.chatbot.exceptions import ChatbotHttpRequestFailed
 
 class SettingsDialog(QDialog):
-    def __init__(self, config: ImgDescGenConfig, parent=None):
+    def __init__(self, config: ImgDescGenConfig, model_list_loader: ModelListLoader | None = None, parent=None):
         super(SettingsDialog, self).__init__(parent)
         self.setWindowTitle("Settings")
         self.setWindowIcon(QIcon("gui/icon_1024.png"))
 
         self._config = config
 
+        # loader is usually shared with the main window, so the list and the client outlive the dialog
+        self._model_list_loader = model_list_loader or ModelListLoader(self)
+        self._model_list_loader.modelsReady.connect(self.onGeminiModelsReady)
+        self._model_list_loader.refreshFailed.connect(self.onGeminiModelsRefreshFailed)
+        self._gemini_refresh_by_user = False
+
         self.layout = QVBoxLayout()
         self.layout.setSizeConstraint(QVBoxLayout.SizeConstraint.SetFixedSize) # disable resizing
         self.setLayout(self.layout)
@@ -34,14 +40,45 @@ class SettingsDialog(QDialog):
         config_schema.chatbots[ChatbotName.GEMINI].model_name = self.gemini_model_combobox.itemData(self.gemini_model_combobox.currentIndex())
         config_schema.chatbots[ChatbotName.GEMINI].force_upload = self.gemini_force_upload_checkbox.isChecked()
 
+        if hasattr(self, "mock_latency_spinbox"):
+            mock_config: MockChatbotConfig = config_schema.chatbots[ChatbotName.MOCK]
+            mock_config.max_image_count = self.mock_max_image_count_spinbox.value()
+            mock_config.latency_ms = self.mock_latency_spinbox.value()
+            mock_config.per_image_latency_ms = self.mock_per_image_latency_spinbox.value()
+            mock_config.latency_distribution = self.mock_latency_distribution_combobox.currentText()
+            mock_config.latency_spread = self.mock_latency_spread_spinbox.value()
+            mock_config.rate_limit_probability = self.mock_rate_limit_spinbox.value() / 100
+            mock_config.error_probability = self.mock_error_spinbox.value() / 100
+            mock_config.max_requests_per_minute = self.mock_max_requests_spinbox.value()
+            mock_config.seed = self.mock_seed_spinbox.value() if self.mock_seed_spinbox.value() >= 0 else None
+            mock_config.write_metadata = self.mock_write_metadata_checkbox.isChecked()
+
         config_schema.exiftool_path = self.exiftool_path_line_edit.text()
+        config_schema.concurrency = self.concurrency_spinbox.value()
+        config_schema.requests_per_minute = self.requests_per_minute_spinbox.value()
+        config_schema.tokens_per_minute = self.tokens_per_minute_spinbox.value()
+        config_schema.response_cache_enabled = self.response_cache_checkbox.isChecked()
+        config_schema.downscale_max_edge = self.downscale_max_edge_spinbox.value()
+        config_schema.downscale_quality = self.downscale_quality_spinbox.value()
+        config_schema.output_mode = self.output_mode_combobox.currentData()
+        config_schema.in_place_backup = self.in_place_backup_checkbox.isChecked()
+        config_schema.log_to_file = self.log_to_file_checkbox.isChecked()
+        config_schema.local_workers = self.local_workers_spinbox.value()
+        config_schema.job_queue_path = self.job_queue_path_line_edit.text() or "cache/jobs.sqlite3"
 
+        self._config.markDirty()
         self._config.saveConfig()
         super(SettingsDialog, self).accept()
 
     def reject(self):
         super(SettingsDialog, self).reject()
 
+    def done(self, result):
+        # refresh may finish after the dialog is closed
+        self._model_list_loader.modelsReady.disconnect(self.onGeminiModelsReady)
+        self._model_list_loader.refreshFailed.disconnect(self.onGeminiModelsRefreshFailed)
+        super(SettingsDialog, self).done(result)
+
     def browseForExifToolPath(self):
         # Open a file dialog to select the ExifTool executable
         filepath, _ = QFileDialog.getOpenFileName(self, "Select ExifTool executable", "", "Executables (*.exe);;All Files (*)")
@@ -62,6 +99,75 @@ class SettingsDialog(QDialog):
 
         general_layout.addRow(QLabel("ExifTool path"), browse_layout)
 
+        self.concurrency_spinbox = QSpinBox()
+        self.concurrency_spinbox.setRange(1, 64)
+        self.concurrency_spinbox.setValue(self._config.getSchema().concurrency)
+        general_layout.addRow(QLabel("Parallel requests"), self.concurrency_spinbox)
+
+        self.local_workers_spinbox = QSpinBox()
+        self.local_workers_spinbox.setRange(0, 64)
+        self.local_workers_spinbox.setSpecialValueText("None")
+        self.local_workers_spinbox.setValue(self._config.getSchema().local_workers)
+        self.local_workers_spinbox.setToolTip("Worker processes started for generation, each makes the parallel requests above. "
+                                              "With none, the queue is run only by workers started with worker.py.")
+        general_layout.addRow(QLabel("Local workers"), self.local_workers_spinbox)
+
+        self.job_queue_path_line_edit = QLineEdit(self._config.getSchema().job_queue_path)
+        self.job_queue_path_line_edit.setToolTip("Job queue database, workers on other hosts must use the same file.")
+        general_layout.addRow(QLabel("Job queue"), self.job_queue_path_line_edit)
+
+        self.requests_per_minute_spinbox = QSpinBox()
+        self.requests_per_minute_spinbox.setRange(0, 100000)
+        self.requests_per_minute_spinbox.setSpecialValueText("No limit")
+        self.requests_per_minute_spinbox.setValue(self._config.getSchema().requests_per_minute)
+        general_layout.addRow(QLabel("Requests per minute"), self.requests_per_minute_spinbox)
+
+        self.tokens_per_minute_spinbox = QSpinBox()
+        self.tokens_per_minute_spinbox.setRange(0, 100000000)
+        self.tokens_per_minute_spinbox.setSingleStep(1000)
+        self.tokens_per_minute_spinbox.setSpecialValueText("No limit")
+        self.tokens_per_minute_spinbox.setValue(self._config.getSchema().tokens_per_minute)
+        general_layout.addRow(QLabel("Tokens per minute"), self.tokens_per_minute_spinbox)
+
+        self.response_cache_checkbox = QCheckBox("Reuse cached descriptions of identical images")
+        self.response_cache_checkbox.setChecked(self._config.getSchema().response_cache_enabled)
+        general_layout.addRow(self.response_cache_checkbox)
+
+        self.downscale_max_edge_spinbox = QSpinBox()
+        self.downscale_max_edge_spinbox.setRange(0, 16384)
+        self.downscale_max_edge_spinbox.setSingleStep(256)
+        self.downscale_max_edge_spinbox.setSpecialValueText("Off")
+        self.downscale_max_edge_spinbox.setSuffix(" px")
+        self.downscale_max_edge_spinbox.setValue(self._config.getSchema().downscale_max_edge)
+        self.downscale_max_edge_spinbox.setToolTip("Longer edge of the copies sent instead of larger images, when off the originals are sent.")
+        general_layout.addRow(QLabel("Downscale before upload"), self.downscale_max_edge_spinbox)
+
+        self.downscale_quality_spinbox = QSpinBox()
+        self.downscale_quality_spinbox.setRange(1, 100)
+        self.downscale_quality_spinbox.setValue(self._config.getSchema().downscale_quality)
+        general_layout.addRow(QLabel("Downscale JPEG quality"), self.downscale_quality_spinbox)
+
+        self.output_mode_combobox = QComboBox()
+        self.output_mode_combobox.addItem("Copy to output directory", OutputMode.COPY)
+        self.output_mode_combobox.addItem("Reflink to output directory", OutputMode.REFLINK)
+        self.output_mode_combobox.addItem("Tag original images", OutputMode.IN_PLACE)
+        self.output_mode_combobox.setCurrentIndex(self.output_mode_combobox.findData(self._config.getSchema().output_mode))
+        self.output_mode_combobox.setToolTip("Reflink saves only the initial copy on filesystems that support it (Btrfs, XFS), "
+                                             "writing the description rewrites the whole output file.")
+        general_layout.addRow(QLabel("Output"), self.output_mode_combobox)
+
+        self.in_place_backup_checkbox = QCheckBox("Back up previous descriptions of original images")
+        self.in_place_backup_checkbox.setChecked(self._config.getSchema().in_place_backup)
+        general_layout.addRow(self.in_place_backup_checkbox)
+        self.output_mode_combobox.currentIndexChanged.connect(
+            lambda: self.in_place_backup_checkbox.setEnabled(self.output_mode_combobox.currentData() == OutputMode.IN_PLACE)
+        )
+        self.in_place_backup_checkbox.setEnabled(self._config.getSchema().output_mode == OutputMode.IN_PLACE)
+
+        self.log_to_file_checkbox = QCheckBox("Save full generation log to logs/generation.log")
+        self.log_to_file_checkbox.setChecked(self._config.getSchema().log_to_file)
+        general_layout.addRow(self.log_to_file_checkbox)
+
         general_settings_group.setLayout(general_layout)
         self.layout.addWidget(general_settings_group)
 
@@ -73,6 +179,7 @@ class SettingsDialog(QDialog):
         self.chatbot_form_layout.addRow(QLabel("Chatbot"), self.chatbot_combobox)
         self.chatbot_combobox.currentIndexChanged.connect(self.onChatbotChanged)
         self.chatbot_combobox.addItem(ChatbotName.GEMINI)
+        self.chatbot_combobox.addItem(ChatbotName.MOCK)
         self.chatbot_combobox.setCurrentText(self._config.getSchema().chatbot)
 
         chatbot_settings_group.setLayout(self.chatbot_form_layout)
@@ -87,26 +194,57 @@ class SettingsDialog(QDialog):
         self.layout.addLayout(button_layout)
 
     def refreshGeminiModels(self):
+        # Refresh button, errors are shown
+        self._gemini_refresh_by_user = True
+        self.startGeminiModelsRefresh()
+
+    def startGeminiModelsRefresh(self):
         gemini_config: GeminiConfig = self._config.getSchema().chatbots[ChatbotName.GEMINI].model_copy()
         gemini_config.api_key = self.api_key_line_edit.text()
-        
-        # TODO: make some geminiclient methods static idk to not create client every time 
-        client = create_chatbot(ChatbotName.GEMINI, gemini_config)
-        try:
-            response = client.get_available_models()
-        except ChatbotHttpRequestFailed:
-            QMessageBox.critical(self, "Error", "Failed to fetch models from Gemini API. Please check your API key and internet connection.")
+        if not gemini_config.api_key:
             return
-        
+
+        self.gemini_refresh_button.setEnabled(False)
+        self.gemini_refresh_button.setText("Refreshing...")
+        self._model_list_loader.refresh(gemini_config)
+
+    def setGeminiModels(self, models: list):
         current_model = self.gemini_model_combobox.currentText()
 
         self.gemini_model_combobox.clear()
-        for model in response.models:
+        for model in models:
             self.gemini_model_combobox.addItem(model.name, model)
 
         # idk if needed
         self.gemini_model_combobox.setCurrentText(current_model)
 
+    def onGeminiModelsReady(self, api_key: str, models: list):
+        # a result for a key that was changed since still frees the button
+        self.updateGeminiRefreshButton()
+        if api_key != self.api_key_line_edit.text():
+            return
+
+        self.setGeminiModels(models)
+
+    def onGeminiModelsRefreshFailed(self, api_key: str, error: str):
+        by_user = self._gemini_refresh_by_user
+        self.updateGeminiRefreshButton()
+        if api_key != self.api_key_line_edit.text():
+            return
+
+        if by_user:
+            QMessageBox.critical(self, "Error", error)
+
+    def updateGeminiRefreshButton(self):
+        # stays disabled while models of the current key are being fetched
+        if not self._model_list_loader.isRefreshing(self.api_key_line_edit.text()):
+            self.resetGeminiRefreshButton()
+
+    def resetGeminiRefreshButton(self):
+        self._gemini_refresh_by_user = False
+        self.gemini_refresh_button.setEnabled(True)
+        self.gemini_refresh_button.setText("Refresh")
+
     def onChatbotChanged(self, index):
         # display settings that correspond to selected chatbot
         # TODO: remove other chatbot fields when choose another chatbot
@@ -116,9 +254,9 @@ class SettingsDialog(QDialog):
             model_layout = QHBoxLayout()
             self.gemini_model_combobox = QComboBox()
             model_layout.addWidget(self.gemini_model_combobox)
-            refresh_button = QPushButton("Refresh")
-            refresh_button.clicked.connect(self.refreshGeminiModels)
-            model_layout.addWidget(refresh_button)
+            self.gemini_refresh_button = QPushButton("Refresh")
+            self.gemini_refresh_button.clicked.connect(self.refreshGeminiModels)
+            model_layout.addWidget(self.gemini_refresh_button)
             self.chatbot_form_layout.addRow(QLabel("Model"), model_layout)
 
             self.api_key_line_edit = QLineEdit()
@@ -128,15 +266,85 @@ class SettingsDialog(QDialog):
             self.api_key_line_edit.setText(gemini_config.api_key)
             self.chatbot_form_layout.addRow(QLabel("API key"), self.api_key_line_edit)
 
-            # fill models combobox if not already filled and if api key is set
+            # models combobox is filled from the cache right away, the list is fetched in the background when it's missing or old
+            models = []
             if gemini_config.api_key:
-                self.refreshGeminiModels()
+                models, fresh = self._model_list_loader.cachedModels(gemini_config.api_key)
+                if not fresh:
+                    self.startGeminiModelsRefresh()
+            if not models:
+                models = [gemini_config.model_name]
+            self.setGeminiModels(models)
 
             self.gemini_model_combobox.setCurrentText(gemini_config.model_name.name)
 
             self.gemini_force_upload_checkbox = QCheckBox("Force upload")
             self.gemini_force_upload_checkbox.setChecked(gemini_config.force_upload)
+            self.gemini_force_upload_checkbox.setToolTip("Always upload images again. When unchecked, uploads made in the last 47 hours from the same content are reused.")
             self.chatbot_form_layout.addRow(self.gemini_force_upload_checkbox)
 
             self.prompt_text_edit = QTextEdit(gemini_config.image_description_prompt)
             self.chatbot_form_layout.addRow(QLabel("Prompt"), self.prompt_text_edit)
+        elif self.chatbot_combobox.currentText() == ChatbotName.MOCK and not hasattr(self, "mock_latency_spinbox"):
+            self.createMockChatbotSettings()
+
+    def createMockChatbotSettings(self):
+        mock_config: MockChatbotConfig = self._config.getSchema().chatbots[ChatbotName.MOCK]
+
+        self.mock_max_image_count_spinbox = QSpinBox()
+        self.mock_max_image_count_spinbox.setRange(1, 1000)
+        self.mock_max_image_count_spinbox.setValue(mock_config.max_image_count)
+        self.chatbot_form_layout.addRow(QLabel("Images per request"), self.mock_max_image_count_spinbox)
+
+        self.mock_latency_spinbox = QSpinBox()
+        self.mock_latency_spinbox.setRange(0, 600000)
+        self.mock_latency_spinbox.setSuffix(" ms")
+        self.mock_latency_spinbox.setValue(mock_config.latency_ms)
+        self.chatbot_form_layout.addRow(QLabel("Request latency"), self.mock_latency_spinbox)
+
+        self.mock_per_image_latency_spinbox = QSpinBox()
+        self.mock_per_image_latency_spinbox.setRange(0, 600000)
+        self.mock_per_image_latency_spinbox.setSuffix(" ms")
+        self.mock_per_image_latency_spinbox.setValue(mock_config.per_image_latency_ms)
+        self.chatbot_form_layout.addRow(QLabel("Latency per image"), self.mock_per_image_latency_spinbox)
+
+        self.mock_latency_distribution_combobox = QComboBox()
+        self.mock_latency_distribution_combobox.addItems(["fixed", "uniform", "lognormal"])
+        self.mock_latency_distribution_combobox.setCurrentText(mock_config.latency_distribution)
+        self.chatbot_form_layout.addRow(QLabel("Latency distribution"), self.mock_latency_distribution_combobox)
+
+        self.mock_latency_spread_spinbox = QDoubleSpinBox()
+        self.mock_latency_spread_spinbox.setRange(0, 5)
+        self.mock_latency_spread_spinbox.setSingleStep(0.1)
+        self.mock_latency_spread_spinbox.setValue(mock_config.latency_spread)
+        self.chatbot_form_layout.addRow(QLabel("Latency spread"), self.mock_latency_spread_spinbox)
+
+        self.mock_rate_limit_spinbox = QDoubleSpinBox()
+        self.mock_rate_limit_spinbox.setRange(0, 100)
+        self.mock_rate_limit_spinbox.setSuffix(" %")
+        self.mock_rate_limit_spinbox.setValue(mock_config.rate_limit_probability * 100)
+        self.chatbot_form_layout.addRow(QLabel("Rate limited requests"), self.mock_rate_limit_spinbox)
+
+        self.mock_error_spinbox = QDoubleSpinBox()
+        self.mock_error_spinbox.setRange(0, 100)
+        self.mock_error_spinbox.setSuffix(" %")
+        self.mock_error_spinbox.setValue(mock_config.error_probability * 100)
+        self.chatbot_form_layout.addRow(QLabel("Failed requests"), self.mock_error_spinbox)
+
+        self.mock_max_requests_spinbox = QSpinBox()
+        self.mock_max_requests_spinbox.setRange(0, 100000)
+        self.mock_max_requests_spinbox.setSpecialValueText("No limit")
+        self.mock_max_requests_spinbox.setValue(mock_config.max_requests_per_minute)
+        self.mock_max_requests_spinbox.setToolTip("Cap of the mock server, shared by all workers on this host.")
+        self.chatbot_form_layout.addRow(QLabel("Server requests per minute"), self.mock_max_requests_spinbox)
+
+        self.mock_seed_spinbox = QSpinBox()
+        self.mock_seed_spinbox.setRange(-1, 2147483647)
+        self.mock_seed_spinbox.setSpecialValueText("Random")
+        self.mock_seed_spinbox.setValue(mock_config.seed if mock_config.seed is not None else -1)
+        self.mock_seed_spinbox.setToolTip("Makes latencies and failures repeatable, the sequence is shared by all workers on this host.")
+        self.chatbot_form_layout.addRow(QLabel("Seed"), self.mock_seed_spinbox)
+
+        self.mock_write_metadata_checkbox = QCheckBox("Write descriptions with ExifTool")
+        self.mock_write_metadata_checkbox.setChecked(mock_config.write_metadata)
+        self.chatbot_form_layout.addRow(self.mock_write_metadata_checkbox)
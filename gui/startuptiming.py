@@ -0,0 +1,42 @@
+import sys
+import time
+
+from PySide6.QtCore import QObject, QCoreApplication
+
+from gui.tracing import tracer
+
+class StartupTiming(QObject):
+    """
+    Measures cold start of the main window from the process start time given by main.py.
+    Time to first paint is when the main window is painted the first time,
+    time to interactive is when the saved selection and input directory are loaded.
+    Both are printed to stderr and recorded as tracer spans, with quit_when_interactive
+    the application exits after that (used by --startup-timing).
+    """
+    def __init__(self, start_time: float, quit_when_interactive: bool = False, parent = None):
+        super().__init__(parent)
+        self._start_time = start_time
+        self._quit_when_interactive = quit_when_interactive
+        self._first_paint = None
+        self._interactive = None
+
+    def watch(self, window):
+        window.firstPainted.connect(self.onFirstPainted)
+        window.initialLoadFinished.connect(self.onInitialLoadFinished)
+
+    def onFirstPainted(self):
+        if self._first_paint is None:
+            self._first_paint = time.perf_counter() - self._start_time
+            tracer.addSpan("startup.first_paint", self._start_time, self._first_paint)
+            print(f"time to first paint: {self._first_paint * 1000:.0f} ms", file=sys.stderr)
+
+    def onInitialLoadFinished(self):
+        if self._interactive is not None:
+            return
+
+        self._interactive = time.perf_counter() - self._start_time
+        tracer.addSpan("startup.interactive", self._start_time, self._interactive)
+        print(f"time to interactive: {self._interactive * 1000:.0f} ms", file=sys.stderr)
+
+        if self._quit_when_interactive:
+            QCoreApplication.quit()
@@ -0,0 +1,85 @@
+from PySide6.QtCore import QTimer
+from PySide6.QtGui import QIcon
+from PySide6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QTableWidget, QTableWidgetItem, QPushButton,
+                               QFileDialog, QMessageBox, QHeaderView)
+
+from gui.tracing import tracer
+
+class StatsWindow(QWidget):
+    """
+    Timing statistics of application stages collected by the tracer, refreshed while the window is shown.
+    """
+    REFRESH_INTERVAL_MS = 1000
+    COLUMNS = [
+        ("Stage", "name"),
+        ("Count", "count"),
+        ("Total, ms", "total_ms"),
+        ("p50, ms", "p50_ms"),
+        ("p95, ms", "p95_ms"),
+        ("p99, ms", "p99_ms"),
+        ("Max, ms", "max_ms"),
+    ]
+
+    def __init__(self, parent=None):
+        super(StatsWindow, self).__init__(parent)
+
+        self.setWindowTitle("Performance statistics")
+        self.setWindowIcon(QIcon("gui/icon_1024.png"))
+        self.resize(720, 400)
+
+        layout = QVBoxLayout()
+
+        self._table = QTableWidget(0, len(StatsWindow.COLUMNS))
+        self._table.setHorizontalHeaderLabels([title for title, _ in StatsWindow.COLUMNS])
+        self._table.horizontalHeader().setSectionResizeMode(0, QHeaderView.ResizeMode.Stretch)
+        self._table.setEditTriggers(QTableWidget.EditTrigger.NoEditTriggers)
+        self._table.verticalHeader().setVisible(False)
+        layout.addWidget(self._table)
+
+        buttons_layout = QHBoxLayout()
+        buttons_layout.addStretch()
+        export_button = QPushButton("Export trace...")
+        export_button.clicked.connect(self.exportTrace)
+        buttons_layout.addWidget(export_button)
+        reset_button = QPushButton("Reset")
+        reset_button.clicked.connect(self.reset)
+        buttons_layout.addWidget(reset_button)
+        layout.addLayout(buttons_layout)
+
+        self.setLayout(layout)
+
+        self._refresh_timer = QTimer(self)
+        self._refresh_timer.setInterval(StatsWindow.REFRESH_INTERVAL_MS)
+        self._refresh_timer.timeout.connect(self.refresh)
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.refresh()
+        self._refresh_timer.start()
+
+    def hideEvent(self, event):
+        super().hideEvent(event)
+        self._refresh_timer.stop()
+
+    def refresh(self):
+        stats = tracer.stats()
+        self._table.setRowCount(len(stats))
+        for row, stat in enumerate(stats):
+            for column, (_, key) in enumerate(StatsWindow.COLUMNS):
+                value = stat[key]
+                text = f"{value:.1f}" if isinstance(value, float) else str(value)
+                self._table.setItem(row, column, QTableWidgetItem(text))
+
+    def reset(self):
+        tracer.reset()
+        self.refresh()
+
+    def exportTrace(self):
+        filename, _ = QFileDialog.getSaveFileName(self, "Export trace", "trace.json", "Trace files (*.json)")
+        if not filename:
+            return
+
+        try:
+            tracer.exportTrace(filename)
+        except OSError as e:
+            QMessageBox.critical(self, "Export trace", f"Failed to export trace: {e}")
@@ -0,0 +1,142 @@
+from PySide6.QtCore import Qt, QPoint, QSize, QTimer, QPersistentModelIndex
+from PySide6.QtGui import QIcon, QPixmap, QColor
+from PySide6.QtWidgets import QListView, QStyledItemDelegate, QStyleOptionViewItem
+
+from gui.thumbnailloader import ThumbnailLoader
+
+class ThumbnailGridView(QListView):
+    """
+    Icon view of the image list model.
+    Thumbnails are requested only for visible cells (plus one screen ahead), visible ones first,
+    and pending requests are cancelled when their cells scroll out of view.
+    Pixmaps live only in the loader's bounded cache, the view itself keeps none.
+    """
+    THUMBNAIL_SIZE = 96
+    VISIBLE_PRIORITY = 5
+    PREFETCH_PRIORITY = 0
+    UPDATE_DELAY_MS = 50
+
+    class Delegate(QStyledItemDelegate):
+        def __init__(self, view):
+            super().__init__(view)
+            self._view = view
+
+            placeholder = QPixmap(ThumbnailGridView.THUMBNAIL_SIZE, ThumbnailGridView.THUMBNAIL_SIZE)
+            placeholder.fill(QColor(Qt.GlobalColor.lightGray))
+            self._placeholder = QIcon(placeholder)
+
+        def initStyleOption(self, option, index):
+            super().initStyleOption(option, index)
+
+            cached = self._view.thumbnailLoader().thumbnail(index.data(Qt.ItemDataRole.UserRole), ThumbnailGridView.THUMBNAIL_SIZE)
+            option.icon = QIcon(cached[0]) if cached else self._placeholder
+            option.features |= QStyleOptionViewItem.ViewItemFeature.HasDecoration
+            option.decorationSize = self._view.iconSize()
+
+    def __init__(self, thumbnail_loader: ThumbnailLoader, parent=None):
+        super().__init__(parent)
+
+        self._thumbnail_loader = thumbnail_loader
+        self._thumbnail_loader.thumbnailReady.connect(self.onThumbnailReady)
+        self._requested: dict[str, QPersistentModelIndex] = {} # pending requests of this view
+
+        size = ThumbnailGridView.THUMBNAIL_SIZE
+        self.setViewMode(QListView.ViewMode.IconMode)
+        self.setMovement(QListView.Movement.Static)
+        self.setResizeMode(QListView.ResizeMode.Adjust)
+        self.setUniformItemSizes(True)
+        self.setLayoutMode(QListView.LayoutMode.Batched)
+        self.setIconSize(QSize(size, size))
+        self.setGridSize(QSize(size + 24, size + 40))
+        self.setTextElideMode(Qt.TextElideMode.ElideMiddle)
+        self.setItemDelegate(ThumbnailGridView.Delegate(self))
+
+        # scrolling fires many events, visible range is recalculated once it settles
+        self._update_timer = QTimer(self)
+        self._update_timer.setSingleShot(True)
+        self._update_timer.setInterval(ThumbnailGridView.UPDATE_DELAY_MS)
+        self._update_timer.timeout.connect(self.requestVisibleThumbnails)
+        self.verticalScrollBar().valueChanged.connect(self.scheduleUpdate)
+
+    def thumbnailLoader(self) -> ThumbnailLoader:
+        return self._thumbnail_loader
+
+    def setModel(self, model):
+        super().setModel(model)
+        model.modelReset.connect(self.scheduleUpdate)
+        model.rowsInserted.connect(self.scheduleUpdate)
+        model.rowsRemoved.connect(self.scheduleUpdate)
+        model.layoutChanged.connect(self.scheduleUpdate)
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self.scheduleUpdate()
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.scheduleUpdate()
+
+    def hideEvent(self, event):
+        super().hideEvent(event)
+        self.cancelRequests(set())
+
+    def scheduleUpdate(self):
+        if self.isVisible():
+            self._update_timer.start()
+
+    def visibleRowRange(self) -> tuple[int, int] | None:
+        # items are laid out in rows, so the first and the last hit on a grid-step lattice bound the visible range
+        grid = self.gridSize()
+        viewport = self.viewport().rect()
+        points = [
+            QPoint(x, y)
+            for y in range(viewport.top() + 1, viewport.bottom(), max(1, grid.height() // 2))
+            for x in range(viewport.left() + 1, viewport.right(), max(1, grid.width() // 2))
+        ]
+
+        first = next((index for index in map(self.indexAt, points) if index.isValid()), None)
+        last = next((index for index in map(self.indexAt, reversed(points)) if index.isValid()), None)
+        if first is None or last is None:
+            return None
+        return first.row(), last.row()
+
+    def requestVisibleThumbnails(self):
+        model = self.model()
+        visible = self.visibleRowRange()
+        if model is None or visible is None:
+            self.cancelRequests(set())
+            return
+
+        first, last = visible
+        count = last - first + 1
+        prefetch_first = max(0, first - count)
+        prefetch_last = min(model.rowCount() - 1, last + count)
+        center = (first + last) / 2
+
+        wanted = set()
+        # nearest to the middle of the screen are loaded first
+        for row in sorted(range(prefetch_first, prefetch_last + 1), key=lambda row: abs(row - center)):
+            index = model.index(row, 0)
+            path = index.data(Qt.ItemDataRole.UserRole)
+            wanted.add(path)
+            if path in self._requested:
+                continue
+
+            priority = ThumbnailGridView.VISIBLE_PRIORITY if first <= row <= last else ThumbnailGridView.PREFETCH_PRIORITY
+            if self._thumbnail_loader.request(path, ThumbnailGridView.THUMBNAIL_SIZE, priority) is None:
+                self._requested[path] = QPersistentModelIndex(index)
+
+        self.cancelRequests(wanted)
+
+    def cancelRequests(self, keep: set[str]):
+        for path in [path for path in self._requested if path not in keep]:
+            self._thumbnail_loader.cancel(path, ThumbnailGridView.THUMBNAIL_SIZE)
+            del self._requested[path]
+
+    def onThumbnailReady(self, path: str, size: int, pixmap: QPixmap, original_size: QSize):
+        if size != ThumbnailGridView.THUMBNAIL_SIZE:
+            return
+
+        index = self._requested.pop(path, None)
+        if index is not None and index.isValid():
+            self.update(self.model().index(index.row(), index.column()))
@@ -0,0 +1,187 @@
+import os
+import hashlib
+from collections import OrderedDict
+from PySide6.QtCore import QObject, QRunnable, QThreadPool, QSize, Qt, Signal
+from PySide6.QtGui import QImage, QImageReader, QImageWriter, QPixmap
+
+from gui.tracing import tracer
+
+class ThumbnailLoader(QObject):
+    """
+    Generates image thumbnails in a thread pool.
+    Images are decoded at reduced scale (JPEG decoder scales while decoding, full bitmap is never built).
+    Results are kept in a bounded in-memory LRU cache and in a persistent disk cache
+    keyed by path, modification time, file size and thumbnail size.
+    """
+    DISK_CACHE_DIR = "cache/thumbnails"
+    DISK_CACHE_MAX_BYTES = 256 * 1024 * 1024
+    MEMORY_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+    ORIGINAL_SIZE_KEY = "OriginalSize"
+
+    # path, thumbnail size, thumbnail (null if image can't be read), original image size
+    thumbnailReady = Signal(str, int, QPixmap, QSize)
+
+    class Emitter(QObject):
+        finished = Signal(str, int, QImage, QSize)
+
+    class Task(QRunnable):
+        def __init__(self, emitter, path: str, size: int, cache_dir: str):
+            super().__init__()
+            self.setAutoDelete(False) # loader keeps the task until it finishes or is cancelled
+
+            self._emitter = emitter
+            self._path = path
+            self._size = size
+            self._cache_dir = cache_dir
+
+        def run(self):
+            with tracer.span("thumbnail.load", size=self._size):
+                image, original_size = self.load()
+            self._emitter.finished.emit(self._path, self._size, image, original_size)
+
+        def load(self) -> tuple[QImage, QSize]:
+            try:
+                stat = os.stat(self._path)
+            except OSError:
+                return QImage(), QSize()
+
+            key = hashlib.sha1(f"{self._path}|{stat.st_mtime_ns}|{stat.st_size}|{self._size}".encode("utf-8")).hexdigest()
+            cache_path = os.path.join(self._cache_dir, key[:2], key + ".png")
+
+            image = QImage(cache_path)
+            if not image.isNull():
+                width, _, height = image.text(ThumbnailLoader.ORIGINAL_SIZE_KEY).partition("x")
+                if width.isdigit() and height.isdigit():
+                    return image, QSize(int(width), int(height))
+
+            reader = QImageReader(self._path)
+            original_size = reader.size()
+            if original_size.isValid() and (original_size.width() > self._size or original_size.height() > self._size):
+                reader.setScaledSize(original_size.scaled(self._size, self._size, Qt.AspectRatioMode.KeepAspectRatio))
+
+            image = reader.read()
+            if image.isNull():
+                return image, QSize()
+            if not original_size.isValid():
+                original_size = image.size()
+
+            image.setText(ThumbnailLoader.ORIGINAL_SIZE_KEY, f"{original_size.width()}x{original_size.height()}")
+            try:
+                os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+                QImageWriter(cache_path, b"png").write(image)
+            except OSError:
+                pass
+
+            return image, original_size
+
+    class PruneTask(QRunnable):
+        def __init__(self, cache_dir: str, max_bytes: int):
+            super().__init__()
+            self._cache_dir = cache_dir
+            self._max_bytes = max_bytes
+
+        def run(self):
+            # drop least recently written thumbnails until the cache is well under its limit
+            files = []
+            total = 0
+            for root, _, filenames in os.walk(self._cache_dir):
+                for filename in filenames:
+                    path = os.path.join(root, filename)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    files.append((stat.st_mtime, stat.st_size, path))
+                    total += stat.st_size
+
+            if total <= self._max_bytes:
+                return
+
+            files.sort()
+            for _, size, path in files:
+                if total <= self._max_bytes * 0.8:
+                    break
+                try:
+                    os.remove(path)
+                    total -= size
+                except OSError:
+                    pass
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+
+        self._pool = QThreadPool(self)
+        self._emitter = ThumbnailLoader.Emitter()
+        self._emitter.finished.connect(self.onTaskFinished)
+
+        self._pending: dict[tuple[str, int], ThumbnailLoader.Task] = {}
+        self._memory_cache: OrderedDict[tuple[str, int], tuple[QPixmap, QSize]] = OrderedDict()
+        self._memory_cache_bytes = 0
+
+        self._pool.start(ThumbnailLoader.PruneTask(ThumbnailLoader.DISK_CACHE_DIR, ThumbnailLoader.DISK_CACHE_MAX_BYTES), -1)
+
+    def thumbnail(self, path: str, size: int) -> tuple[QPixmap, QSize] | None:
+        """
+        Return thumbnail from the memory cache, without loading it.
+        """
+        key = (path, size)
+        cached = self._memory_cache.get(key)
+        if cached:
+            self._memory_cache.move_to_end(key)
+        return cached
+
+    def request(self, path: str, size: int, priority: int = 0) -> tuple[QPixmap, QSize] | None:
+        """
+        Return cached thumbnail or schedule its loading, thumbnailReady is emitted when it's loaded.
+        """
+        cached = self.thumbnail(path, size)
+        if cached:
+            return cached
+
+        key = (path, size)
+        if key not in self._pending:
+            task = ThumbnailLoader.Task(self._emitter, path, size, ThumbnailLoader.DISK_CACHE_DIR)
+            self._pending[key] = task
+            self._pool.start(task, priority)
+        return None
+
+    def cancel(self, path: str, size: int):
+        """
+        Cancel loading if it hasn't started yet.
+        """
+        key = (path, size)
+        task = self._pending.get(key)
+        if task and self._pool.tryTake(task):
+            del self._pending[key]
+
+    def invalidate(self, path: str):
+        for key in [key for key in self._memory_cache if key[0] == path]:
+            pixmap, _ = self._memory_cache.pop(key)
+            self._memory_cache_bytes -= self.pixmapBytes(pixmap)
+
+    def pixmapBytes(self, pixmap: QPixmap) -> int:
+        return pixmap.width() * pixmap.height() * 4
+
+    def onTaskFinished(self, path: str, size: int, image: QImage, original_size: QSize):
+        self._pending.pop((path, size), None)
+
+        pixmap = QPixmap.fromImage(image)
+        if not pixmap.isNull():
+            previous = self._memory_cache.pop((path, size), None)
+            if previous:
+                self._memory_cache_bytes -= self.pixmapBytes(previous[0])
+
+            self._memory_cache[(path, size)] = (pixmap, original_size)
+            self._memory_cache_bytes += self.pixmapBytes(pixmap)
+            while self._memory_cache_bytes > ThumbnailLoader.MEMORY_CACHE_MAX_BYTES and len(self._memory_cache) > 1:
+                evicted, _ = self._memory_cache.popitem(last=False)[1]
+                self._memory_cache_bytes -= self.pixmapBytes(evicted)
+
+        self.thumbnailReady.emit(path, size, pixmap, original_size)
+
+    def stop(self):
+        for task in self._pending.values():
+            self._pool.tryTake(task)
+        self._pending.clear()
+        self._pool.waitForDone()
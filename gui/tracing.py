@@ -0,0 +1,112 @@
+import os
+import json
+import time
+import threading
+import contextlib
+import collections
+
+class Tracer():
+    """
+    Collects timing spans of application stages (directory scan, thumbnails, ExifTool, chatbot requests...).
+    Spans are kept in a bounded buffer for trace export in Chrome trace format (chrome://tracing, Perfetto)
+    and aggregated per name into count, total and recent durations for percentiles.
+    Safe to use from any thread, doesn't depend on Qt.
+    Listeners get every span recorded in this process, e.g. queue workers send them to the GUI.
+    """
+    MAX_EVENTS = 100000
+    MAX_SAMPLES = 10000 # recent durations per span name used for percentiles
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._origin = time.perf_counter()
+        self._events = collections.deque(maxlen=Tracer.MAX_EVENTS)
+        self._counts: dict[str, int] = {}
+        self._totals: dict[str, float] = {}
+        self._samples: dict[str, collections.deque] = {}
+        self._listeners = []
+
+    @contextlib.contextmanager
+    def span(self, name: str, **args):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.addSpan(name, start, time.perf_counter() - start, args)
+
+    def addListener(self, listener):
+        """
+        Call listener(name, start, duration, args) for spans recorded by this process, in the thread recording the span.
+        """
+        with self._lock:
+            self._listeners.append(listener)
+
+    def removeListener(self, listener):
+        with self._lock:
+            self._listeners.remove(listener)
+
+    def addSpan(self, name: str, start: float, duration: float, args: dict | None = None,
+                pid: int | None = None, tid: int | None = None):
+        """
+        Record a span, start is time.perf_counter() value, duration is in seconds.
+        Spans of other processes pass their pid and tid, they aren't given to listeners.
+        """
+        event = {
+            "name": name,
+            "ph": "X",
+            "ts": (start - self._origin) * 1e6,
+            "dur": duration * 1e6,
+            "pid": os.getpid() if pid is None else pid,
+            "tid": threading.get_ident() if tid is None else tid,
+        }
+        if args:
+            event["args"] = args
+
+        with self._lock:
+            self._events.append(event)
+            self._counts[name] = self._counts.get(name, 0) + 1
+            self._totals[name] = self._totals.get(name, 0.0) + duration
+            self._samples.setdefault(name, collections.deque(maxlen=Tracer.MAX_SAMPLES)).append(duration)
+            listeners = list(self._listeners) if pid is None else []
+
+        for listener in listeners:
+            listener(name, start, duration, args)
+
+    def stats(self) -> list[dict]:
+        """
+        Per span name: count, total, p50, p95, p99 and max, durations in milliseconds.
+        """
+        with self._lock:
+            snapshot = [(name, self._counts[name], self._totals[name], sorted(samples)) for name, samples in self._samples.items()]
+
+        result = []
+        for name, count, total, samples in sorted(snapshot):
+            def percentile(p: float) -> float:
+                return samples[min(len(samples) - 1, int(len(samples) * p))] * 1000
+
+            result.append({
+                "name": name,
+                "count": count,
+                "total_ms": total * 1000,
+                "p50_ms": percentile(0.50),
+                "p95_ms": percentile(0.95),
+                "p99_ms": percentile(0.99),
+                "max_ms": samples[-1] * 1000,
+            })
+        return result
+
+    def exportTrace(self, path: str):
+        with self._lock:
+            events = list(self._events)
+
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+
+    def reset(self):
+        with self._lock:
+            self._events.clear()
+            self._counts.clear()
+            self._totals.clear()
+            self._samples.clear()
+
+# application-wide tracer
+tracer = Tracer()
@@ -0,0 +1,68 @@
+import os
+import time
+import sqlite3
+import threading
+
+class UploadRegistry():
+    """
+    Local record of files uploaded to the chatbot provider by content: content hash of the uploaded bytes,
+    upload name (the provider-side reference) and expiry. Lets reruns and retries reuse uploads that are
+    still stored by the provider, an upload is reusable only if it was made from the same content
+    under the name the file is sent with. Expired entries are pruned when the registry is opened.
+    """
+    DEFAULT_PATH = "cache/uploads.sqlite3"
+    UPLOAD_TTL_SECONDS = 47 * 60 * 60 # Gemini keeps uploaded files for 48 hours
+
+    def __init__(self, path: str = DEFAULT_PATH):
+        self._lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("DROP TABLE IF EXISTS uploads") # keyed by name, entries are just uploaded again
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS uploaded_files ("
+            "provider TEXT NOT NULL, content_hash TEXT NOT NULL, name TEXT NOT NULL, expires_at REAL NOT NULL, "
+            "PRIMARY KEY (provider, content_hash))"
+        )
+        self._connection.execute("CREATE INDEX IF NOT EXISTS uploaded_files_name ON uploaded_files (provider, name)")
+        self.prune()
+
+    def prune(self):
+        with self._lock:
+            self._connection.execute("DELETE FROM uploaded_files WHERE expires_at <= ?", (time.time(),))
+            self._connection.commit()
+
+    def uploadedName(self, provider: str, content_hash: str) -> str | None:
+        """
+        Name of an upload of the content still stored by the provider, None if there is none.
+        """
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT name FROM uploaded_files WHERE provider = ? AND content_hash = ? AND expires_at > ?",
+                (provider, content_hash, time.time())
+            ).fetchone()
+        return row[0] if row is not None else None
+
+    def isUploaded(self, provider: str, content_hash: str, name: str) -> bool:
+        return self.uploadedName(provider, content_hash) == name
+
+    def recordUploads(self, provider: str, uploads: dict[str, str]):
+        """
+        Record uploads made just now (name -> content hash). Entries of other content uploaded
+        under the same names are dropped, the provider's files now hold the new content.
+        """
+        expires_at = time.time() + UploadRegistry.UPLOAD_TTL_SECONDS
+        with self._lock:
+            self._connection.executemany(
+                "DELETE FROM uploaded_files WHERE provider = ? AND name = ?", [(provider, name) for name in uploads]
+            )
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO uploaded_files (provider, content_hash, name, expires_at) VALUES (?, ?, ?, ?)",
+                [(provider, content_hash, name, expires_at) for name, content_hash in uploads.items()]
+            )
+            self._connection.commit()
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
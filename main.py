@@ -1,11 +1,24 @@
+import time
+
+# taken before the heavy imports, startup timing includes them
+start_time = time.perf_counter()
+
 from PySide6.QtWidgets import QApplication
 
 from gui.mainwindow import MainWindow
+from gui.startuptiming import StartupTiming
 
 if __name__ == '__main__':
     import sys
 
+    # --startup-timing prints time to first paint and time to interactive, then exits
+    startup_timing_mode = "--startup-timing" in sys.argv
+    if startup_timing_mode:
+        sys.argv.remove("--startup-timing")
+
     app = QApplication(sys.argv)
     mainWin = MainWindow()
+    startup_timing = StartupTiming(start_time, startup_timing_mode)
+    startup_timing.watch(mainWin)
     mainWin.show()
-    sys.exit(app.exec())
\ No newline at end of file
+    sys.exit(app.exec())
@@ -0,0 +1,213 @@
+import sqlite3
+import threading
+
+import pytest
+
+import gui.jobqueue
+from gui.jobqueue import JobQueue
+
+class Clock():
+    # stands in for the time module of gui.jobqueue, so leases can expire without waiting
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def time(self) -> float:
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(gui.jobqueue, "time", clock)
+    return clock
+
+@pytest.fixture
+def queue_path(tmp_path):
+    return str(tmp_path / "jobs.sqlite3")
+
+@pytest.fixture
+def job_queue(queue_path):
+    job_queue = JobQueue(queue_path)
+    yield job_queue
+    job_queue.close()
+
+def job_rows(queue_path: str) -> dict[str, tuple]:
+    # image path -> (state, attempts, lease owner, result)
+    with sqlite3.connect(queue_path) as connection:
+        rows = connection.execute("SELECT path, state, attempts, lease_owner, result FROM jobs").fetchall()
+    return {path: tuple(rest) for path, *rest in rows}
+
+def test_claim_leases_jobs_of_oldest_batch(job_queue):
+    first = job_queue.submit(["a.jpg", "b.jpg", "c.jpg"], '{"first": true}', 2)
+    job_queue.submit(["d.jpg"], "{}", 2)
+
+    batch_id, config_json, jobs = job_queue.claim("worker-1")
+    assert batch_id == first
+    assert config_json == '{"first": true}'
+    assert sorted(jobs.values()) == ["a.jpg", "b.jpg"]
+    assert job_queue.counts(first)[JobQueue.STATE_RUNNING] == 2
+    assert job_queue.activeWorkers() == ["worker-1"]
+
+    _, _, jobs = job_queue.claim("worker-2")
+    assert list(jobs.values()) == ["c.jpg"]
+
+def test_claim_returns_none_without_jobs(job_queue):
+    assert job_queue.claim("worker-1") is None
+
+    job_queue.submit(["a.jpg"], "{}", 10)
+    job_queue.claim("worker-1")
+    assert job_queue.claim("worker-2") is None
+
+def test_submit_adds_failed_images(job_queue, queue_path):
+    batch_id = job_queue.submit(["a/x.jpg", "b/x.jpg"], "{}", 10, {"b/x.jpg": "duplicate"})
+
+    _, _, jobs = job_queue.claim("worker-1")
+    assert list(jobs.values()) == ["a/x.jpg"]
+    assert job_rows(queue_path)["b/x.jpg"][0] == JobQueue.STATE_FAILED
+    assert job_rows(queue_path)["b/x.jpg"][3] == "duplicate"
+    assert job_queue.counts(batch_id)[JobQueue.STATE_FAILED] == 1
+
+def test_expired_lease_is_claimed_again(job_queue, queue_path, clock):
+    batch_id = job_queue.submit(["a.jpg"], "{}", 10)
+    job_queue.claim("crashed")
+
+    clock.now += JobQueue.LEASE_SECONDS - 1
+    assert job_queue.claim("worker-2") is None
+    assert job_queue.expiredLeaseCount(batch_id) == 0
+
+    clock.now += 2
+    assert job_queue.expiredLeaseCount(batch_id) == 1
+    assert job_queue.activeWorkers() == []
+    _, _, jobs = job_queue.claim("worker-2")
+    assert list(jobs.values()) == ["a.jpg"]
+    assert job_rows(queue_path)["a.jpg"][:3] == (JobQueue.STATE_RUNNING, 2, "worker-2")
+
+def test_heartbeat_extends_lease_and_records_results(job_queue, queue_path, clock):
+    batch_id = job_queue.submit(["a.jpg", "b.jpg"], "{}", 10)
+    _, _, jobs = job_queue.claim("worker-1")
+    ids = {path: job_id for job_id, path in jobs.items()}
+
+    clock.now += JobQueue.LEASE_SECONDS - 1
+    cancelled = job_queue.heartbeat("worker-1", batch_id, [ids["b.jpg"]], {ids["a.jpg"]: (JobQueue.STATE_DONE, "a.jpg")},
+                                    [(clock.now, "imgdescgengui", 20, "message")])
+    assert not cancelled
+
+    clock.now += 2
+    assert job_queue.claim("worker-2") is None
+    assert job_rows(queue_path)["a.jpg"] == (JobQueue.STATE_DONE, 1, None, "a.jpg")
+    assert [record[2:] for record in job_queue.logRecords(batch_id)] == [("worker-1", "imgdescgengui", 20, "message")]
+
+def test_heartbeat_records_spans(job_queue):
+    batch_id = job_queue.submit(["a.jpg"], "{}", 10)
+    job_queue.claim("worker-1")
+    job_queue.heartbeat("worker-1", batch_id, [], {}, [], [(10, 11, "generation.run", 1000.0, 2.5, '{"images": 1}')])
+    spans = job_queue.spanRecords(batch_id)
+    assert [span[1:] for span in spans] == [("worker-1", 10, 11, "generation.run", 1000.0, 2.5, '{"images": 1}')]
+    assert job_queue.spanRecords(batch_id, spans[-1][0]) == []
+
+def test_heartbeat_drops_results_of_lost_lease(job_queue, queue_path, clock):
+    batch_id = job_queue.submit(["a.jpg"], "{}", 10)
+    _, _, jobs = job_queue.claim("worker-1")
+    job_id = next(iter(jobs))
+
+    clock.now += JobQueue.LEASE_SECONDS + 1
+    job_queue.claim("worker-2")
+    job_queue.heartbeat("worker-1", batch_id, [], {job_id: (JobQueue.STATE_FAILED, "late")}, [])
+    assert job_rows(queue_path)["a.jpg"][:3] == (JobQueue.STATE_RUNNING, 2, "worker-2")
+
+def test_job_fails_after_max_attempts(job_queue, queue_path, clock):
+    batch_id = job_queue.submit(["a.jpg"], "{}", 10)
+    for attempt in range(JobQueue.MAX_ATTEMPTS):
+        assert job_queue.claim(f"worker-{attempt}") is not None
+        clock.now += JobQueue.LEASE_SECONDS + 1
+
+    assert job_queue.claim("worker-last") is None
+    state, attempts, owner, result = job_rows(queue_path)["a.jpg"]
+    assert (state, attempts, owner) == (JobQueue.STATE_FAILED, JobQueue.MAX_ATTEMPTS, None)
+    assert result
+    assert job_queue.counts(batch_id)[JobQueue.STATE_RUNNING] == 0
+
+def test_recover_expired_fails_exhausted_jobs_without_claim(job_queue, clock):
+    batch_id = job_queue.submit(["a.jpg"], "{}", 10)
+    for attempt in range(JobQueue.MAX_ATTEMPTS):
+        job_queue.claim(f"worker-{attempt}")
+        clock.now += JobQueue.LEASE_SECONDS + 1
+
+    job_queue.recoverExpired()
+    assert job_queue.counts(batch_id)[JobQueue.STATE_FAILED] == 1
+    assert job_queue.expiredLeaseCount(batch_id) == 0
+
+def test_release_doesnt_count_as_attempt(job_queue, queue_path):
+    batch_id = job_queue.submit(["a.jpg", "b.jpg"], "{}", 10)
+    _, _, jobs = job_queue.claim("worker-1")
+
+    job_queue.release("worker-2", list(jobs)) # not the owner, nothing happens
+    assert job_queue.counts(batch_id)[JobQueue.STATE_RUNNING] == 2
+
+    job_queue.release("worker-1", list(jobs))
+    assert job_queue.counts(batch_id)[JobQueue.STATE_QUEUED] == 2
+    assert job_rows(queue_path)["a.jpg"] == (JobQueue.STATE_QUEUED, 0, None, None)
+
+    _, _, jobs = job_queue.claim("worker-2")
+    assert len(jobs) == 2
+    assert job_rows(queue_path)["a.jpg"][:3] == (JobQueue.STATE_RUNNING, 1, "worker-2")
+
+def test_cancel(job_queue, clock):
+    batch_id = job_queue.submit(["a.jpg", "b.jpg", "c.jpg"], "{}", 1)
+    _, _, jobs = job_queue.claim("worker-1")
+
+    job_queue.cancel(batch_id)
+    counts = job_queue.counts(batch_id)
+    assert counts[JobQueue.STATE_CANCELLED] == 2
+    assert counts[JobQueue.STATE_RUNNING] == 1
+    assert job_queue.heartbeat("worker-1", batch_id, list(jobs), {}, [])
+    assert job_queue.claim("worker-2") is None
+
+    # running job of a worker that crashed after the cancel isn't claimed again, it's cancelled
+    clock.now += JobQueue.LEASE_SECONDS + 1
+    assert job_queue.claim("worker-2") is None
+    counts = job_queue.counts(batch_id)
+    assert counts[JobQueue.STATE_CANCELLED] == 3
+    assert counts[JobQueue.STATE_RUNNING] == 0
+
+def test_concurrent_claims_dont_overlap(queue_path):
+    JobQueue(queue_path).submit([f"{i}.jpg" for i in range(60)], "{}", 2)
+    claimed: dict[str, list[int]] = {}
+
+    def work(worker: str):
+        job_queue = JobQueue(queue_path)
+        claimed[worker] = []
+        try:
+            while (claim := job_queue.claim(worker)) is not None:
+                claimed[worker].extend(claim[2])
+        finally:
+            job_queue.close()
+
+    threads = [threading.Thread(target=work, args=(f"worker-{i}",)) for i in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    first, second = claimed.values()
+    assert not set(first) & set(second)
+    assert len(first) + len(second) == 60
+    assert all(attempts == 1 for _, attempts, _, _ in job_rows(queue_path).values())
+
+def test_rate_tokens_are_shared(queue_path, clock):
+    first, second = JobQueue(queue_path), JobQueue(queue_path)
+    buckets = [("scope:requests", 60, 2, 1)]
+
+    assert first.takeRateTokens("scope", buckets) == 0
+    assert second.takeRateTokens("scope", buckets) == 0
+    assert first.takeRateTokens("scope", buckets) == pytest.approx(1.0)
+
+    clock.now += 1
+    assert second.takeRateTokens("scope", buckets) == 0
+
+    clock.now += 10
+    first.pauseRateLimits("scope", clock.now + 5)
+    assert second.takeRateTokens("scope", buckets) == pytest.approx(5.0)
+    assert second.takeRateTokens("other", []) == 0
+
+    first.close()
+    second.close()
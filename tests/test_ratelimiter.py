@@ -0,0 +1,101 @@
+import sqlite3
+import threading
+
+import pytest
+
+from gui.ratelimiter import RateLimiter, is_rate_limit_error
+
+class FailingStore():
+    def takeRateTokens(self, scope, buckets):
+        raise sqlite3.OperationalError("database is locked")
+
+    def pauseRateLimits(self, scope, until):
+        raise sqlite3.OperationalError("database is locked")
+
+class RecordingStore():
+    def __init__(self):
+        self.taken = []
+        self.paused = []
+
+    def takeRateTokens(self, scope, buckets):
+        self.taken.append((scope, buckets))
+        return 0.0
+
+    def pauseRateLimits(self, scope, until):
+        self.paused.append(scope)
+
+def test_burst_then_wait():
+    limiter = RateLimiter(requests_per_minute=60)
+    # capacity is BURST_SECONDS of requests
+    for _ in range(RateLimiter.BURST_SECONDS):
+        assert limiter.takeLocal(1) == 0
+    assert limiter.takeLocal(1) > 0
+
+def test_acquire_stops_when_cancelled():
+    limiter = RateLimiter(requests_per_minute=60)
+    cancel_event = threading.Event()
+    cancel_event.set()
+    assert not limiter.acquire(1, cancel_event)
+
+def test_same_limits_keep_state():
+    limiter = RateLimiter()
+    limiter.setLimits(60, 0, "scope")
+    for _ in range(RateLimiter.BURST_SECONDS):
+        limiter.takeLocal(1)
+
+    limiter.setLimits(60, 0, "scope")
+    assert limiter.takeLocal(1) > 0
+
+    limiter.setLimits(120, 0, "scope")
+    assert limiter.takeLocal(1) == 0
+
+def test_shared_store_gets_scope_buckets():
+    store = RecordingStore()
+    limiter = RateLimiter(shared=store)
+    limiter.setLimits(60, 1000, "scope")
+
+    assert limiter.acquire(300)
+    scope, buckets = store.taken[0]
+    assert scope == "scope"
+    assert [(name, amount) for name, _, _, amount in buckets] == [("scope:requests", 1), ("scope:tokens", 300)]
+
+    limiter.onRateLimited()
+    assert store.paused == ["scope"]
+
+def test_failing_store_falls_back_to_local_buckets():
+    limiter = RateLimiter(60, 0, shared=FailingStore())
+    for _ in range(RateLimiter.BURST_SECONDS):
+        assert limiter.acquire(1)
+    assert limiter.onRateLimited() > 0
+
+    cancel_event = threading.Event()
+    threading.Timer(0.2, cancel_event.set).start()
+    assert not limiter.acquire(1, cancel_event)
+
+class StatusError(Exception):
+    def __init__(self, message: str, status_code: int):
+        super().__init__(message)
+        self.status_code = status_code
+
+def chained(error: Exception, cause: Exception) -> Exception:
+    error.__cause__ = cause
+    return error
+
+@pytest.mark.parametrize("error, expected", [
+    (Exception("429 RESOURCE_EXHAUSTED"), True),
+    (Exception("Resource has been exhausted (e.g. check quota). status: RESOURCE_EXHAUSTED"), True),
+    (Exception("HTTP error 429."), True),
+    (Exception("Error code: (429) Too Many Requests"), True),
+    (StatusError("Too Many Requests", 429), True),
+    (chained(RuntimeError("request failed"), StatusError("quota", 429)), True),
+    (Exception("500 INTERNAL"), False),
+    (FileNotFoundError(2, "No such file or directory", "IMG_4290.jpg"), False),
+    (FileNotFoundError(2, "No such file or directory", "/photos/429/IMG-429.jpg"), False),
+    (RuntimeError("Failed to process DSC04291.jpg"), False),
+    (RuntimeError("Failed to process IMG-429.jpg"), False),
+    (RuntimeError("Failed to process 429.jpg"), False),
+    (RuntimeError("timeout after 4290 ms"), False),
+    (RuntimeError("Could not read /photos/429/beach.jpg"), False),
+])
+def test_is_rate_limit_error(error, expected):
+    assert is_rate_limit_error(error) == expected
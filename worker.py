@@ -0,0 +1,71 @@
+"""
+Generation worker, runs jobs of the job queue filled by the GUI (see job_queue_path in config.json).
+Any number of workers can run at once, on this host or on other hosts that share the queue database
+and see images and output directories under the same paths. Logs go to stderr and to the queue.
+
+    python worker.py --processes 4
+    python worker.py --queue /mnt/shared/jobs.sqlite3 --exit-when-idle
+"""
+import sys
+import signal
+import logging
+import argparse
+import multiprocessing
+
+from gui.jobqueue import JobQueue
+from gui.queueworker import QueueWorker
+from gui.schemas.config import ImgDescGenConfig
+
+CONFIG_FILENAME = "config.json"
+
+def parse_args(argv: list[str]) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Run generation jobs from the job queue.")
+    parser.add_argument("--queue", help="job queue database, default is job_queue_path of the config")
+    parser.add_argument("--config", default=CONFIG_FILENAME, help=f"config file to take the queue path and API keys from (default: {CONFIG_FILENAME})")
+    parser.add_argument("--processes", type=int, default=1, help="worker processes to run (default: 1)")
+    parser.add_argument("--exiftool", help="ExifTool executable on this host, overrides the one of the batch config")
+    parser.add_argument("--exit-when-idle", action="store_true", help="exit when the queue has no jobs left")
+    parser.add_argument("--log-level", default="INFO", choices=["DEBUG", "INFO", "WARNING", "ERROR"], help="log level")
+    return parser.parse_args(argv)
+
+def run_worker(queue_path: str, config_path: str, exiftool_path: str | None, exit_when_idle: bool, log_level: str):
+    logging.basicConfig(level=log_level, stream=sys.stderr, format="%(asctime)s %(process)d %(name)s %(levelname)s: %(message)s")
+
+    job_queue = JobQueue(queue_path)
+    # API keys come from the worker's own config, batches are queued without them
+    worker = QueueWorker(job_queue, exiftool_path=exiftool_path, log_level=logging.getLevelName(log_level),
+                         local_config=ImgDescGenConfig(config_path))
+
+    # first Ctrl+C (or termination) stops after requests in flight, unstarted jobs go back to the queue
+    signal.signal(signal.SIGINT, lambda signum, frame: worker.stop())
+    signal.signal(signal.SIGTERM, lambda signum, frame: worker.stop())
+
+    try:
+        processed = worker.run(exit_when_idle)
+    finally:
+        job_queue.close()
+    logging.getLogger("imgdescgengui").info(f"Worker {worker.getWorkerId()} stopped, {processed} images processed")
+
+def main(argv: list[str]) -> int:
+    args = parse_args(argv)
+    queue_path = args.queue or ImgDescGenConfig(args.config).getSchema().job_queue_path
+
+    if args.processes <= 1:
+        run_worker(queue_path, args.config, args.exiftool, args.exit_when_idle, args.log_level)
+        return 0
+
+    # a process per worker, the pipeline threads of one process share the GIL
+    processes = [
+        multiprocessing.Process(target=run_worker, args=(queue_path, args.config, args.exiftool, args.exit_when_idle, args.log_level))
+        for _ in range(args.processes)
+    ]
+    # workers get Ctrl+C themselves, the parent only waits for them
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    return 0 if all(process.exitcode == 0 for process in processes) else 1
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))